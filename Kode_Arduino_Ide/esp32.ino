@@ -22,6 +22,11 @@
 
 #define SERVER_IP "192.168.1.50"
 #define SERVER_PORT 5000
+#define LOCATION_SERVER_PORT 5050    // server_socketio.py (/send_locations)
+
+// ID cane di server: HARUS sama dengan CANE_ID di esp32_cam.ino (kamera cane yang sama),
+// karena tongkat hanya menerima deteksi yang dikirim kamera dengan ID ini. Kosong = MAC ESP32 ini
+#define CANE_ID "cane-01"
 
 // =======================================================
 // ULTRASONIK
@@ -128,48 +133,191 @@ void initGPS() {
   SerialGPS.begin(9600, SERIAL_8N1, 16, 17);
 }
 
-bool processAndSendGPS() {
+// Fix GPS dikumpulkan di buffer lalu dikirim sekaligus (1 request per batch, bukan per fix).
+// ESP32 tidak punya jam: setiap fix dikirim dengan umurnya (age_ms), server menghitung waktunya.
+#define GPS_SAMPLE_MS 1000           // maksimal 1 fix per detik
+#define GPS_BATCH_SIZE 30            // kirim saat buffer penuh...
+#define GPS_BATCH_INTERVAL_MS 10000  // ...atau setiap 10 detik
+
+struct GpsFix {
+  double lat;
+  double lon;
+  unsigned long capturedAt;  // millis()
+};
+
+GpsFix gpsBuffer[GPS_BATCH_SIZE];
+int gpsCount = 0;
+unsigned long lastGpsSample = 0;
+unsigned long lastGpsBatch = 0;
+String caneId = CANE_ID;
+
+// Dipanggil setiap loop supaya buffer serial GPS tidak overflow
+void readGPS() {
   while (SerialGPS.available()) gps.encode(SerialGPS.read());
-  if (gps.location.isUpdated() && gps.location.isValid()) {
-    double lat = gps.location.lat();
-    double lon = gps.location.lng();
-    String maps = "https://maps.google.com/?q=" + String(lat, 6) + "," + String(lon, 6);
-    sendTelegramText("Lokasi pengguna: " + maps);
-    return true;
+  if (!gps.location.isUpdated() || !gps.location.isValid()) return;
+  double lat = gps.location.lat();
+  double lon = gps.location.lng();
+  if (millis() - lastGpsSample < GPS_SAMPLE_MS) return;
+  lastGpsSample = millis();
+
+  if (gpsCount == GPS_BATCH_SIZE) {
+    // Server tidak terjangkau dan buffer penuh: buang fix paling lama
+    memmove(gpsBuffer, gpsBuffer + 1, sizeof(GpsFix) * (GPS_BATCH_SIZE - 1));
+    gpsCount--;
+  }
+  gpsBuffer[gpsCount++] = {lat, lon, lastGpsSample};
+}
+
+bool sendGPSBatch() {
+  if (gpsCount == 0 || WiFi.status() != WL_CONNECTED) return false;
+
+  unsigned long now = millis();
+  String body = "{\"fixes\":[";
+  body.reserve(16 + gpsCount * 64);
+  for (int i = 0; i < gpsCount; i++) {
+    if (i > 0) body += ",";
+    body += "{\"latitude\":" + String(gpsBuffer[i].lat, 6)
+          + ",\"longitude\":" + String(gpsBuffer[i].lon, 6)
+          + ",\"age_ms\":" + String(now - gpsBuffer[i].capturedAt) + "}";
+  }
+  body += "]}";
+
+  HTTPClient http;
+  http.begin("http://" + String(SERVER_IP) + ":" + String(LOCATION_SERVER_PORT) + "/send_locations");
+  http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", caneId);
+  int code = http.POST(body);
+  http.end();
+  if (code != 200) {
+    Serial.println("GPS batch failed: " + String(code));
+    return false;
   }
-  return false;
+  gpsCount = 0;
+  return true;
+}
+
+bool processAndSendGPS() {
+  if (!gps.location.isValid()) return false;
+  double lat = gps.location.lat();
+  double lon = gps.location.lng();
+  String maps = "https://maps.google.com/?q=" + String(lat, 6) + "," + String(lon, 6);
+  sendTelegramText("Lokasi pengguna: " + maps);
+  return true;
 }
 
 // =======================================================
-// SERVER QUERY
+// SERVER QUERY (long-poll: server menjawab begitu ada deteksi baru)
 // =======================================================
-void queryServerForDetection() {
-  if (WiFi.status() != WL_CONNECTED) return;
+#define DETECTION_WAIT_S 20          // harus <= DETECTION_LONGPOLL_MAX_S di server
+#define DETECTION_HTTP_TIMEOUT_MS 25000
+
+long lastDetectionSeq = -1;          // seq deteksi terakhir yang sudah diproses
+String lastDetectionEtag = "";
+volatile int pendingAudio = 0;       // diputar di loop() (DFPlayer tidak thread-safe)
+
+// Payload biner dari server (Server_Flask/compact.py), little-endian:
+//   header : version u8 | count u8 | seq u32 | alert u8 (class_id hazard kritis, 255 = tidak ada)
+//   record : class_id u8 | confidence u8 | x1 u16 | y1 u16 | x2 u16 | y2 u16
+#define COMPACT_MIMETYPE "application/vnd.smartcane.detection"
+#define COMPACT_VERSION 2
+#define COMPACT_HEADER_SIZE 7
+#define COMPACT_ALERT_NONE 255
+#define COMPACT_RECORD_SIZE 10
+#define COMPACT_MAX_RECORDS 16
+
+// class_id model -> track DFPlayer (0 = tanpa suara)
+// 0 ch, 1 do, 2 fe, 3 gb, 4 ob, 5 pl, 6 po, 7 st, 8 ta, 9 ve
+const uint8_t CLASS_AUDIO[] = {0, 0, 0, 0, 0, 3, 2, 0, 0, 1};  // ve=motor, po=lubang, pl=pohon
+
+uint8_t detectionBuf[COMPACT_HEADER_SIZE + COMPACT_RECORD_SIZE * COMPACT_MAX_RECORDS];
+
+// Alert hazard kritis datang lebih dulu, hasil lengkap menyusul beberapa ms kemudian:
+// suara yang sama tidak diputar ulang dalam AUDIO_REPEAT_MS
+#define AUDIO_REPEAT_MS 1500
+int lastAudio = 0;
+unsigned long lastAudioAt = 0;
+
+void queueAudio(int track) {
+  if (track == lastAudio && millis() - lastAudioAt < AUDIO_REPEAT_MS) return;
+  lastAudio = track;
+  lastAudioAt = millis();
+  pendingAudio = track;
+}
 
-  HTTPClient http;
-  String url = "http://" + String(SERVER_IP) + ":" + String(SERVER_PORT) + "/get_detection";
+void handleDetectionPayload(const uint8_t *buf, int count) {
+  uint8_t alertClass = buf[6];
+  if (alertClass != COMPACT_ALERT_NONE && alertClass < sizeof(CLASS_AUDIO) && CLASS_AUDIO[alertClass] > 0) {
+    Serial.printf("Critical alert class=%u\n", alertClass);
+    queueAudio(CLASS_AUDIO[alertClass]);
+    return;
+  }
+  // Record sudah urut dari confidence tertinggi: putar hazard pertama yang punya suara
+  for (int i = 0; i < count; i++) {
+    const uint8_t *rec = buf + COMPACT_HEADER_SIZE + i * COMPACT_RECORD_SIZE;
+    uint8_t classId = rec[0];
+    Serial.printf("Detection class=%u conf=%u%%\n", classId, rec[1] * 100 / 255);
+    if (classId < sizeof(CLASS_AUDIO) && CLASS_AUDIO[classId] > 0) {
+      queueAudio(CLASS_AUDIO[classId]);
+      return;
+    }
+  }
+}
+
+void queryServerForDetection(HTTPClient &http) {
+  if (WiFi.status() != WL_CONNECTED) {
+    delay(500);
+    return;
+  }
+
+  // 1 koneksi dipakai ulang (keep-alive); request ditahan server sampai ada deteksi baru
+  String url = "http://" + String(SERVER_IP) + ":" + String(SERVER_PORT) + "/get_detection?wait=" + String(DETECTION_WAIT_S);
+  if (lastDetectionSeq >= 0) url += "&since=" + String(lastDetectionSeq);
   http.begin(url);
+  http.addHeader("Accept", COMPACT_MIMETYPE);
+  // Hanya deteksi/alert cane ini (tanpa header: feed gabungan semua cane)
+  http.addHeader("X-Device-ID", caneId);
+  if (lastDetectionEtag.length() > 0) http.addHeader("If-None-Match", lastDetectionEtag);
+  const char *headerKeys[] = {"ETag"};
+  http.collectHeaders(headerKeys, 1);
   int code = http.GET();
 
   if (code == 200) {
-    String payload = http.getString();
-    Serial.println("Server response: " + payload);
-
-    if (payload.indexOf("\"motor\"") >= 0) dfPlay(1);
-    else if (payload.indexOf("\"lubang\"") >= 0) dfPlay(2);
-    else if (payload.indexOf("\"pohon\"") >= 0 || payload.indexOf("\"tiang\"") >= 0) dfPlay(3);
+    // Baca langsung ke buffer statis (tanpa String / heap)
+    int len = http.getStreamPtr()->readBytes(detectionBuf, min((int)sizeof(detectionBuf), http.getSize()));
+    lastDetectionEtag = http.header("ETag");
+    if (len >= COMPACT_HEADER_SIZE && detectionBuf[0] == COMPACT_VERSION) {
+      int count = min((int)detectionBuf[1], (len - COMPACT_HEADER_SIZE) / COMPACT_RECORD_SIZE);
+      long seq = (long)(detectionBuf[2] | (detectionBuf[3] << 8) | (detectionBuf[4] << 16) | ((uint32_t)detectionBuf[5] << 24));
+      // Server restart -> seq mulai lagi dari 0; tetap diproses sebagai deteksi baru
+      if (seq != lastDetectionSeq) handleDetectionPayload(detectionBuf, count);
+      lastDetectionSeq = seq;
+    }
+  } else if (code == 304) {
+    // Tidak ada deteksi baru selama DETECTION_WAIT_S: langsung tunggu lagi
   } else {
     Serial.println("GET failed: " + String(code));
+    http.end();
+    delay(1000);
+    return;
   }
 
   http.end();
 }
 
+// Task terpisah supaya long-poll tidak menahan loop ultrasonik/buzzer
+void detectionTask(void *param) {
+  HTTPClient http;
+  http.setReuse(true);
+  http.setTimeout(DETECTION_HTTP_TIMEOUT_MS);
+  while (true) {
+    queryServerForDetection(http);
+    delay(10);
+  }
+}
+
 // =======================================================
 // MAIN PROGRAM
 // =======================================================
-unsigned long lastDetectionCheck = 0;
-const unsigned long detectionInterval = 1500;
 unsigned long lastGpsSend = 0;
 const unsigned long gpsInterval = 15000;
 
@@ -189,6 +337,10 @@ void setup() {
     Serial.print(".");
   }
   Serial.println("\nWiFi connected");
+  if (caneId.length() == 0) caneId = WiFi.macAddress();
+  Serial.println("Cane ID: " + caneId);
+
+  xTaskCreatePinnedToCore(detectionTask, "detection", 8192, NULL, 1, NULL, 0);
 }
 
 void loop() {
@@ -203,13 +355,20 @@ void loop() {
     beepForDistance(dmin);
   }
 
+  readGPS();
+  if (gpsCount == GPS_BATCH_SIZE || (gpsCount > 0 && millis() - lastGpsBatch > GPS_BATCH_INTERVAL_MS)) {
+    // Gagal: fix tetap di buffer dan dicoba lagi di interval berikutnya
+    sendGPSBatch();
+    lastGpsBatch = millis();
+  }
+
   if (millis() - lastGpsSend > gpsInterval) {
     if (processAndSendGPS()) lastGpsSend = millis();
   }
 
-  if (millis() - lastDetectionCheck > detectionInterval) {
-    lastDetectionCheck = millis();
-    queryServerForDetection();
+  if (pendingAudio > 0) {
+    dfPlay(pendingAudio);
+    pendingAudio = 0;
   }
 
   delay(10);
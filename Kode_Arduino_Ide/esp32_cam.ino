@@ -34,6 +34,9 @@ const char* ssid = "YOUR_WIFI_SSID";
 const char* password = "YOUR_WIFI_PASSWORD";
 const char* server_url = "http://192.168.1.50:5000/upload";
 
+// ID cane di server: HARUS sama dengan CANE_ID di esp32.ino (tongkat yang sama)
+#define CANE_ID "cane-01"
+
 // =======================================================
 // SETUP
 // =======================================================
@@ -101,6 +104,7 @@ void loop() {
 
     http.begin(server_url);
     http.addHeader("Content-Type", "image/jpeg");
+    http.addHeader("X-Device-ID", CANE_ID);
 
     int httpCode = http.POST(fb->buf, fb->len);
 
@@ -0,0 +1,99 @@
+# alerts.py
+# Jalur cepat hazard kritis (lubang, tangga, kendaraan): alert dikirim langsung setelah
+# forward pass, sebelum anotasi/encode/arsip/log; device dengan hazard kritis diprioritaskan
+import threading
+import time
+
+from metrics import stage_timers
+
+
+class CriticalAlerts:
+    """
+    check() dipanggil dengan deteksi mentah (N, 6) tepat setelah inference.
+    Class kritis dengan confidence >= min_confidence menghasilkan alert ringkas,
+    maksimal 1 per (device, class) setiap cooldown_s, yang langsung dikirim lewat
+    publish_fn(alert). Latency dari frame diterima sampai alert terkirim dicatat
+    sebagai stage 'alert'. Device tersebut berprioritas tinggi selama priority_s.
+    """
+
+    def __init__(self, classes=('po', 'st', 've'), min_confidence=0.5, cooldown_s=2.0, priority_s=5.0,
+                 publish_fn=None):
+        self.classes = frozenset(classes)
+        self.min_confidence = min_confidence
+        self.cooldown_s = cooldown_s
+        self.priority_s = priority_s
+        self.publish_fn = publish_fn
+        self._last_alert = {}      # (device, class) -> waktu alert terakhir
+        self._critical_until = {}  # device -> batas waktu prioritas tinggi
+        self._lock = threading.Lock()
+        self.alerts = 0
+        self.suppressed = 0
+
+    def check(self, device, dets, names, received_at=None, scale=1.0):
+        """
+        dets: array (N, 6) x1, y1, x2, y2, confidence, class_id (piksel frame).
+        names: tabel nama class. received_at: epoch frame diterima.
+        Return list alert yang dikirim.
+        """
+        if len(dets) == 0:
+            return []
+        now = time.monotonic()
+        alerts = []
+        for det in dets:
+            confidence = float(det[4])
+            class_id = int(det[5])
+            name = str(names[class_id])
+            if name not in self.classes or confidence < self.min_confidence:
+                continue
+            with self._lock:
+                self._critical_until[device] = now + self.priority_s
+                last = self._last_alert.get((device, name))
+                if last is not None and now - last < self.cooldown_s:
+                    self.suppressed += 1
+                    continue
+                self._last_alert[(device, name)] = now
+                self.alerts += 1
+            alerts.append({
+                'device': device,
+                'class': name,
+                'class_id': class_id,
+                'confidence': round(confidence, 3),
+                'bbox': [int(v * scale) for v in det[:4]],
+                'time': time.time()
+            })
+
+        for alert in alerts:
+            if self.publish_fn:
+                self.publish_fn(alert)
+            if received_at is not None:
+                stage_timers.observe('alert', (time.time() - received_at) * 1000.0)
+        return alerts
+
+    def priority(self, device):
+        """
+        1 jika device baru saja melihat hazard kritis (dilayani lebih dulu), selain itu 0
+        """
+        with self._lock:
+            until = self._critical_until.get(device)
+            if until is None:
+                return 0
+            if until < time.monotonic():
+                del self._critical_until[device]
+                return 0
+            return 1
+
+    def forget(self, device):
+        with self._lock:
+            self._critical_until.pop(device, None)
+            for key in [key for key in self._last_alert if key[0] == device]:
+                del self._last_alert[key]
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'classes': sorted(self.classes),
+                'alerts': self.alerts,
+                'suppressed': self.suppressed,
+                'critical_devices': sorted(d for d, until in self._critical_until.items() if until >= now)
+            }
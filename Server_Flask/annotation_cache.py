@@ -0,0 +1,68 @@
+# annotation_cache.py
+# Cache LRU kecil untuk gambar anotasi yang dirender hanya saat diminta
+import collections
+import threading
+
+
+class AnnotationCache:
+    """
+    Menyimpan bytes JPEG asli + deteksi per frame_id. Gambar anotasi
+    dirender oleh render_fn(data, dets) -> bytes JPEG saat pertama kali
+    diminta, lalu disimpan di entry yang sama. Request bersamaan untuk frame
+    yang sama menunggu 1 render yang sedang berjalan (tidak dirender 2x).
+    """
+
+    def __init__(self, render_fn, maxsize=32):
+        self.render_fn = render_fn
+        self.maxsize = max(1, maxsize)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.hits = 0
+
+    def put(self, frame_id, data, dets):
+        with self._lock:
+            self._entries[frame_id] = {'data': data, 'dets': dets, 'jpeg': None, 'pending': None}
+            self._entries.move_to_end(frame_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_jpeg(self, frame_id):
+        """
+        Bytes JPEG anotasi untuk frame_id, atau None jika sudah keluar dari cache
+        """
+        with self._lock:
+            entry = self._entries.get(frame_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(frame_id)
+        while True:
+            with self._lock:
+                if entry['jpeg'] is not None:
+                    self.hits += 1
+                    return entry['jpeg']
+                pending = entry['pending']
+                if pending is None:
+                    pending = entry['pending'] = threading.Event()
+                    data, dets = entry['data'], entry['dets']
+                    break
+            # Thread lain sedang merender frame ini (entry tetap dipegang walau sudah dibuang dari cache)
+            pending.wait()
+
+        # Render di luar lock supaya request frame lain tidak menunggu
+        try:
+            jpeg = self.render_fn(data, dets)
+            with self._lock:
+                entry['jpeg'] = jpeg
+                entry['data'] = None  # bytes asli tidak diperlukan lagi
+                self.renders += 1
+            return jpeg
+        finally:
+            with self._lock:
+                entry['pending'] = None
+            pending.set()  # render gagal: thread yang menunggu mencoba render sendiri
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize,
+                    'renders': self.renders, 'hits': self.hits}
@@ -3,11 +3,34 @@ import os
 import io
 import platform
 import base64
-from flask import Flask, request, jsonify
-from PIL import Image, ImageDraw, ImageFont
-import torch
+import itertools
+import time
+import numpy as np
+from flask import Flask, request, jsonify, Response
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 from pathlib import Path
 
+from config import (BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, DECODE_MAX_WIDTH, ARCHIVE_MAX_AGE_DAYS, ARCHIVE_MAX_MB,
+                    ANNOTATION_CACHE_SIZE, MODEL_HUB_DIR, MODEL_BACKEND, MODEL_WARMUP_SIZE, MODEL_NUM_THREADS,
+                    DETECTION_LONGPOLL_MAX_S, DETECTION_SSE_KEEPALIVE_S, SIMILARITY_GATE_THRESHOLD,
+                    SIMILARITY_GATE_MAX_FRAMES, SIMILARITY_GATE_MAX_AGE_MS, INFERENCE_SIZES, LATENCY_BUDGET_MS,
+                    LATENCY_WINDOW, LATENCY_QUEUE_LIMIT, LATENCY_MIN_INTERVAL_S, DEVICE_STATE_SHARDS,
+                    DEVICE_IDLE_TIMEOUT_S, CRITICAL_CLASSES, CRITICAL_MIN_CONFIDENCE, CRITICAL_ALERT_COOLDOWN_S,
+                    CRITICAL_PRIORITY_S)
+from annotation_cache import AnnotationCache
+from archive import ArchiveWriter, sequence_start
+from batch_scheduler import BatchScheduler
+from compact import COMPACT_MIMETYPE, encode_detections, wants_compact
+from detection_feed import DetectionFeed
+from device_state import DeviceStateStore
+from alerts import CriticalAlerts
+from frame_gate import SimilarityGate
+from ingest import decode_frame
+from model_loader import ModelLoader, MODEL_ARTIFACTS
+from postprocess import filter_predictions, detections_to_list
+from metrics import stage_timers, registry, PROMETHEUS_CONTENT_TYPE
+from resolution_controller import ResolutionController
+
 # Fix PosixPath issue SEBELUM import apapun
 if platform.system() == 'Windows':
     import pathlib
@@ -26,6 +49,12 @@ UPLOAD_FOLDER = BASE_DIR / "Server_Flask" / "uploads"
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Arsip gambar upload: nama img_N monotonic (scan folder hanya sekali saat startup)
+ARCHIVE_MAX_AGE_S = ARCHIVE_MAX_AGE_DAYS * 86400 if ARCHIVE_MAX_AGE_DAYS else None
+ARCHIVE_MAX_BYTES = ARCHIVE_MAX_MB * 1024 * 1024 if ARCHIVE_MAX_MB else None
+upload_archive = ArchiveWriter(UPLOAD_FOLDER, max_age_s=ARCHIVE_MAX_AGE_S, max_bytes=ARCHIVE_MAX_BYTES)
+upload_seq = itertools.count(sequence_start(UPLOAD_FOLDER, r'img_(\d+)\.jpg'))
+
 app = Flask(__name__)
 
 print("=" * 50)
@@ -35,73 +64,63 @@ print(f"Model exists: {MODEL_PATH.exists()}")
 print(f"Platform: {platform.system()}")
 print("=" * 50)
 
-# Patch torch.load untuk handle weights_only
-_original_torch_load = torch.load
-
-def _patched_torch_load(*args, **kwargs):
-    kwargs.setdefault('weights_only', False)
-    return _original_torch_load(*args, **kwargs)
-
-torch.load = _patched_torch_load
-
-model = None
-
-# Method 1: Direct torch.hub load (paling reliable)
-try:
-    print("\n[1/3] Trying torch.hub.load...")
-    model = torch.hub.load(
-        'ultralytics/yolov5', 
-        'custom', 
-        path=str(MODEL_PATH),
-        force_reload=False,
-        trust_repo=True
-    )
-    model.conf = 0.25
-    model.iou = 0.45
-    print("✓ SUCCESS: Model loaded via torch.hub!")
-
-except Exception as e:
-    print(f"✗ FAILED: {e}")
-    
-    # Method 2: Load checkpoint manually
-    try:
-        print("\n[2/3] Trying manual checkpoint load...")
-        
-        # Load checkpoint
-        ckpt = torch.load(str(MODEL_PATH), map_location='cpu')
-        
-        # Load model dari checkpoint
-        from yolov5.models.common import DetectMultiBackend
-        model = DetectMultiBackend(str(MODEL_PATH), device='cpu')
-        model.conf = 0.25
-        model.iou = 0.45
-        print("✓ SUCCESS: Model loaded manually!")
-        
-    except Exception as e2:
-        print(f"✗ FAILED: {e2}")
-        
-        # Method 3: yolov5 package
-        try:
-            print("\n[3/3] Trying yolov5 package...")
-            import yolov5
-            model = yolov5.load(str(MODEL_PATH))
-            model.conf = 0.25
-            model.iou = 0.45
-            print("✓ SUCCESS: Model loaded via yolov5 package!")
-            
-        except Exception as e3:
-            print(f"✗ FAILED: {e3}")
-            print("\n" + "=" * 50)
-            print("ERROR: Could not load model with any method!")
-            print("Please re-export your model from Colab (see instructions)")
-            print("=" * 50)
-            import sys
-            sys.exit(1)
+# Load model di background: cache lokal torch.hub (tanpa force_reload), artifact
+# TorchScript jika sudah ada, lalu warm-up. Flask langsung bisa menjawab /health.
+model_loader = ModelLoader(str(MODEL_PATH), MODEL_HUB_DIR, MODEL_BACKEND, MODEL_ARTIFACTS,
+                           conf=0.25, iou=0.45, warmup_size=MODEL_WARMUP_SIZE,
+                           num_threads=MODEL_NUM_THREADS).start()
+
+def run_model_batch(images, size):
+    """
+    Satu forward pass untuk beberapa gambar sekaligus (dipanggil BatchScheduler)
+    """
+    return model_loader.detector.predict(images, size=size)
+
+batcher = BatchScheduler(run_model_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+
+# Frame yang hampir sama dengan frame terakhir yang di-infer (per cane) memakai deteksi sebelumnya
+similarity_gate = SimilarityGate(SIMILARITY_GATE_THRESHOLD, max_reuse_frames=SIMILARITY_GATE_MAX_FRAMES,
+                                 max_age_ms=SIMILARITY_GATE_MAX_AGE_MS)
+
+# Ukuran inference mengikuti latency budget: turun saat banyak cane mengirim bersamaan
+resolution = ResolutionController(INFERENCE_SIZES, budget_ms=LATENCY_BUDGET_MS, window=LATENCY_WINDOW,
+                                  queue_limit=LATENCY_QUEUE_LIMIT, min_interval_s=LATENCY_MIN_INTERVAL_S,
+                                  queue_depth_fn=batcher.queue_depth)
 
-print("\n✓ Model ready for inference!")
-print("=" * 50 + "\n")
+# Deteksi terakhir + seq: tongkat menunggu perubahan (long-poll/SSE) alih-alih polling.
+# detection_feed = semua cane (client lama); feed per cane ada di devices.
+detection_feed = DetectionFeed({"object": "none", "all": []})
+def publish_alert(alert):
+    # Jalur cepat: cane yang long-poll/SSE langsung dibangunkan dengan alert, sebelum hasil lengkap
+    devices.get(alert["device"], touch=False).feed.publish_alert(alert)
+    detection_feed.publish_alert(alert)
 
-last_detection = {"object": "none", "all": []}
+# Hazard kritis: cane diprioritaskan di batch; alert dikirim lewat feed sebelum hasil lengkap
+critical_alerts = CriticalAlerts(CRITICAL_CLASSES, min_confidence=CRITICAL_MIN_CONFIDENCE,
+                                 cooldown_s=CRITICAL_ALERT_COOLDOWN_S, priority_s=CRITICAL_PRIORITY_S,
+                                 publish_fn=publish_alert)
+
+def forget_device(device):
+    similarity_gate.forget(device)
+    critical_alerts.forget(device)
+
+devices = DeviceStateStore(DEVICE_STATE_SHARDS, idle_timeout_s=DEVICE_IDLE_TIMEOUT_S,
+                           feed_fn=lambda: DetectionFeed({"object": "none", "all": []}),
+                           on_evict=forget_device)
+
+def request_device():
+    # Identitas cane: header X-Device-ID, atau alamat IP jika firmware tidak mengirimnya
+    return request.headers.get("X-Device-ID") or request.remote_addr
+
+def request_feed():
+    """
+    ?device= atau header X-Device-ID: feed cane tersebut; tanpa keduanya, atau jika belum
+    pernah ada kamera yang mengirim dengan ID itu (firmware kamera lama tanpa X-Device-ID):
+    feed semua cane, supaya tongkat tidak menunggu feed yang tidak pernah diisi
+    """
+    device = request.args.get("device") or request.headers.get("X-Device-ID")
+    state = devices.peek(device) if device else None
+    return state.feed if state is not None and state.frames else detection_feed
 
 def draw_bounding_boxes(image, predictions, class_names):
     """
@@ -136,15 +155,57 @@ def draw_bounding_boxes(image, predictions, class_names):
     
     return image
 
-def image_to_base64(image):
+def image_to_jpeg(image):
     """
-    Convert PIL Image ke base64 string
+    Encode PIL Image ke bytes JPEG
     """
     buffered = io.BytesIO()
     image.save(buffered, format="JPEG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
+    return buffered.getvalue()
+
+def image_to_base64(jpeg_bytes):
+    """
+    Convert bytes JPEG ke base64 data URI
+    """
+    img_str = base64.b64encode(jpeg_bytes).decode()
     return f"data:image/jpeg;base64,{img_str}"
 
+def render_annotated(img_bytes, dets):
+    """
+    Render gambar anotasi dari bytes asli + deteksi (koordinat resolusi asli).
+    Hanya dipanggil jika client meminta gambar anotasi.
+    """
+    with stage_timers.time('annotate'):
+        img = ImageOps.exif_transpose(Image.open(io.BytesIO(img_bytes))).convert("RGB")
+        if len(dets) > 0:
+            img = draw_bounding_boxes(img, dets, model_loader.class_table)
+    with stage_timers.time('encode'):
+        return image_to_jpeg(img)
+
+annotation_cache = AnnotationCache(render_annotated, maxsize=ANNOTATION_CACHE_SIZE)
+
+# Metrics untuk /metrics (Prometheus)
+uploads_received = registry.counter('uploads_received', 'Gambar yang diterima POST /upload')
+uploads_failed = registry.counter('uploads_failed', 'Gambar /upload yang gagal diproses')
+registry.counter('inference_gate_checked', 'Gambar yang diperiksa gate kemiripan', fn=lambda: similarity_gate.checked)
+registry.counter('inference_gate_reused', 'Gambar yang memakai deteksi sebelumnya (forward pass dihemat)',
+                 fn=lambda: similarity_gate.reused)
+registry.counter('inference_gate_forced', 'Inference paksa karena batas frame/umur hasil lama',
+                 fn=lambda: similarity_gate.forced)
+registry.gauge('inference_size', 'Ukuran inference saat ini (piksel)', fn=lambda: resolution.size)
+registry.counter('inference_size_changes', 'Perubahan ukuran inference oleh latency budget',
+                 fn=lambda: resolution.changes)
+registry.gauge('model_queue_depth', 'Gambar yang menunggu batch inference', fn=batcher.queue_depth)
+registry.gauge('model_ready', '1 jika model siap', fn=lambda: int(model_loader.state == 'ready'))
+registry.gauge('archive_queue_depth', 'File arsip yang menunggu ditulis', fn=upload_archive.queue_depth)
+registry.gauge('detection_seq', 'Nomor urut deteksi terakhir', fn=lambda: detection_feed.seq)
+registry.gauge('annotation_cache_size', 'Frame di cache anotasi', fn=lambda: annotation_cache.stats()['size'])
+registry.gauge('devices_active', 'Cane dengan state di memori', fn=lambda: len(devices))
+registry.counter('critical_alerts', 'Hazard kritis yang dikirim lewat feed', fn=lambda: critical_alerts.alerts)
+registry.histogram('batch_size', 'Jumlah gambar per batch inference', batcher.batch_size_hist)
+registry.histogram('batch_queue_wait_seconds', 'Waktu tunggu gambar sebelum batch dijalankan',
+                   batcher.queue_wait_hist, scale=0.001)
+
 # ========== ROUTES ==========
 
 @app.route("/", methods=["GET"])
@@ -154,70 +215,77 @@ def index():
         "message": "Smart Cane Server is running!",
         "endpoints": {
             "health": "/health",
-            "upload": "/upload (POST)",
-            "get_detection": "/get_detection (GET)",
+            "upload": "/upload (POST, ?annotate=1 untuk gambar anotasi, Accept biner untuk payload ringkas)",
+            "annotated": "/annotated/<frame_id> (GET)",
+            "get_detection": "/get_detection (GET, ?since=<seq>&wait=<detik> untuk long-poll, ETag/304, ?device=<id>)",
+            "detection_stream": "/detections/stream (GET, Server-Sent Events, ?device=<id>)",
+            "stats": "/stats (GET)",
+            "metrics": "/metrics (GET, format Prometheus)",
             "test": "/test (GET)"
         }
     })
 
 @app.route("/health", methods=["GET"])
 def health():
+    status = model_loader.status()
+    ready = status["state"] == "ready"
     return jsonify({
-        "status": "ok", 
-        "model_loaded": model is not None,
+        "status": "ok" if ready else status["state"], 
+        "model_loaded": ready,
+        "model": status,
         "platform": platform.system()
-    })
+    }), 200 if ready else 503
 
 @app.route("/upload", methods=["POST"])
 def upload():
-    global last_detection
+    uploads_received.inc()
+    received_at = time.time()
+    detector = model_loader.detector
+    if detector is None:
+        uploads_failed.inc()
+        return jsonify({"status": "error", "error": f"Model {model_loader.state}"}), 503
     try:
         img_bytes = request.get_data()
         if not img_bytes:
+            uploads_failed.inc()
             return jsonify({"status": "error", "error": "No image data"}), 400
             
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        # Decode sekali (reduced DCT decode jika gambar jauh lebih lebar dari 640)
+        with stage_timers.time('decode'):
+            frame = decode_frame(img_bytes, max_width=DECODE_MAX_WIDTH)
         
-        # Save original image
-        idx = len(os.listdir(UPLOAD_FOLDER)) + 1
-        img_path = UPLOAD_FOLDER / f"img_{idx}.jpg"
-        img.save(img_path)
+        # Save original image (bytes JPEG asli, ditulis di background)
+        frame_id = next(upload_seq)
+        with stage_timers.time('archive'):
+            upload_archive.write(f"img_{frame_id}.jpg", img_bytes)
         
-        # Inference
-        results = model(img, size=640)
+        # Scene sama dengan frame terakhir cane ini: pakai deteksi sebelumnya tanpa inference
+        device = request_device()
+        state = devices.get(device)
+        state.accept_seq(None)
+        with stage_timers.time('gate'):
+            signature, dets = similarity_gate.check(device, frame.rgb)
         
-        # Parse results
-        if hasattr(results, 'pred'):
-            predictions = results.pred[0]
-            classes = results.names
-        else:
-            predictions = results.xyxy[0]
-            classes = model.names
+        inference_size = resolution.size
+        if dets is None:
+            # Inference (digabung dengan request lain oleh batcher), ukuran dari latency budget
+            started = time.perf_counter()
+            with stage_timers.time('detect'):
+                predictions = batcher.infer(frame.rgb, size=inference_size, priority=critical_alerts.priority(device))
+            resolution.observe((time.perf_counter() - started) * 1000.0)
+            
+            # Filter + urutkan berdasarkan confidence, lalu scale ke resolusi asli gambar
+            with stage_timers.time('postprocess'):
+                dets = filter_predictions(predictions, detector.conf, frame.scale)
+                dets = dets[np.argsort(-dets[:, 4], kind='stable')]
+            similarity_gate.store(device, signature, dets)
         
-        # Buat copy gambar untuk drawing bounding boxes
-        img_with_boxes = img.copy()
+        # Hazard kritis langsung ke feed cane, sebelum daftar deteksi/publish/anotasi
+        alerts = critical_alerts.check(device, dets, model_loader.class_table, received_at=received_at)
+        
+        with stage_timers.time('postprocess'):
+            detected_classes = detections_to_list(dets, model_loader.class_table, bbox_format='dict', confidence_digits=3)
         
-        detected_classes = []
-        if len(predictions) > 0:
-            # Draw bounding boxes
-            img_with_boxes = draw_bounding_boxes(img_with_boxes, predictions, classes)
-            
-            for pred in predictions:
-                class_id = int(pred[-1])
-                confidence = float(pred[4])
-                detected_classes.append({
-                    "class": classes[class_id],
-                    "confidence": round(confidence, 3),
-                    "bbox": {
-                        "x1": float(pred[0]),
-                        "y1": float(pred[1]),
-                        "x2": float(pred[2]),
-                        "y2": float(pred[3])
-                    }
-                })
-            
-            detected_classes.sort(key=lambda x: x['confidence'], reverse=True)
-            
         if detected_classes:
             last_detection = {
                 "object": detected_classes[0]["class"], 
@@ -226,24 +294,131 @@ def upload():
             }
         else:
             last_detection = {"object": "none", "all": []}
+        # seq hanya naik jika class yang terlihat berubah (feed cane ini + feed semua cane)
+        key = tuple(sorted(d["class"] for d in detected_classes))
+        state.feed.publish(last_detection, key=key, dets=dets)
+        detection_feed.publish(last_detection, key=key, dets=dets)
+        state.set_result({"frame_id": frame_id, "detected": bool(detected_classes), "count": len(detected_classes)})
         
-        # Convert image with boxes to base64
-        img_with_boxes_base64 = image_to_base64(img_with_boxes)
+        # Anotasi tidak dirender di sini; cukup simpan untuk /annotated/<frame_id>
+        annotation_cache.put(frame_id, img_bytes, dets)
         
         print(f"✓ Detection: {last_detection['object']}")
-        return jsonify({
+        
+        # Payload biner ringkas untuk mikrokontroler (seq = frame_id)
+        if wants_compact(request):
+            alert_class = alerts[0]["class_id"] if alerts else None
+            return Response(encode_detections(dets, frame_id, alert_class=alert_class), mimetype=COMPACT_MIMETYPE)
+        
+        response = {
             "status": "ok", 
+            "frame_id": frame_id,
             "detected": last_detection,
-            "annotated_image": img_with_boxes_base64
-        })
+            "inference_size": inference_size
+        }
+        if alerts:
+            response["alert"] = alerts[0]
+        
+        # Gambar anotasi base64 hanya jika diminta (?annotate=1); ESP32 cukup daftar class
+        if request.args.get("annotate", "").lower() in ("1", "true", "yes"):
+            # Frame bisa sudah dibuang dari cache oleh upload lain: render langsung
+            jpeg = annotation_cache.get_jpeg(frame_id) or render_annotated(img_bytes, dets)
+            with stage_timers.time('base64'):
+                response["annotated_image"] = image_to_base64(jpeg)
+        
+        return jsonify(response)
         
     except Exception as e:
+        uploads_failed.inc()
         print(f"✗ Error: {str(e)}")
         return jsonify({"status": "error", "error": str(e)}), 500
 
+@app.route("/annotated/<int:frame_id>", methods=["GET"])
+def annotated(frame_id):
+    jpeg = annotation_cache.get_jpeg(frame_id)
+    if jpeg is None:
+        return jsonify({"status": "error", "error": "Frame not in cache"}), 404
+    return Response(jpeg, mimetype="image/jpeg")
+
 @app.route("/get_detection", methods=["GET"])
 def get_detection():
-    return jsonify(last_detection)
+    """
+    Deteksi terakhir + seq.
+    ?since=<seq>&wait=<detik>: long-poll, dijawab begitu ada deteksi baru (304 jika timeout).
+    If-None-Match: 304 jika belum ada deteksi baru sejak ETag tersebut (juga bisa dengan wait).
+    Accept: application/vnd.smartcane.detection -> payload biner (compact.py).
+    ?device= / X-Device-ID: hanya deteksi cane tersebut.
+    """
+    feed = request_feed()
+    since = request.args.get("since", type=int)
+    if since is None:
+        since = feed.since_from_etags(request.if_none_match)
+    wait = min(request.args.get("wait", default=0.0, type=float), DETECTION_LONGPOLL_MAX_S)
+    compact = wants_compact(request)
+    fmt = "compact" if compact else "json"
+    
+    if since is not None and wait > 0:
+        seq, body = feed.wait(since, wait, fmt)
+    else:
+        seq, body = feed.current(fmt)
+    
+    if seq == since:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=COMPACT_MIMETYPE if compact else "application/json")
+    response.set_etag(feed.etag(seq))
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept")
+    return response
+
+@app.route("/detections/stream", methods=["GET"])
+def detection_stream():
+    """
+    Server-Sent Events: event 'detection' setiap seq berubah (Last-Event-ID didukung).
+    ?device= / X-Device-ID: hanya deteksi cane tersebut.
+    """
+    device = request.args.get("device") or request.headers.get("X-Device-ID")
+    # State cane tidak dibuang selama stream ini terbuka (feed yang sama tetap dipakai);
+    # ID yang belum pernah dipakai kamera: feed semua cane (sama dengan request_feed)
+    known = device and devices.peek(device) is not None and devices.peek(device).frames
+    state = devices.hold(device) if known else None
+    feed = state.feed if state else detection_feed
+    
+    def generate(since):
+        try:
+            while True:
+                seq, body = feed.wait(since, DETECTION_SSE_KEEPALIVE_S)
+                if seq == since:
+                    yield ": keep-alive\n\n"
+                    continue
+                since = seq
+                yield f"id: {feed.etag(seq)}\nevent: detection\ndata: {body}\n\n"
+        finally:
+            if state:
+                devices.release(state)
+    
+    # Tanpa Last-Event-ID: kirim deteksi saat ini dulu (since=-1 tidak pernah sama dengan seq)
+    since = feed.parse_etag_seq(request.headers.get("Last-Event-ID"))
+    return Response(generate(-1 if since is None else since), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "batching": batcher.stats(),
+        "archive": upload_archive.stats(),
+        "annotation_cache": annotation_cache.stats(),
+        "detection_feed": detection_feed.stats(),
+        "similarity_gate": similarity_gate.stats(),
+        "resolution": resolution.stats(),
+        "devices": devices.stats(),
+        "alerts": critical_alerts.stats(),
+        "stages": stage_timers.snapshot()
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(stage_timers), content_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.route("/test", methods=["GET"])
 def test():
@@ -427,11 +602,9 @@ def test():
                                 objectConfidence.textContent = '';
                             }
                             
-                            // Show annotated image
-                            if (result.annotated_image) {
-                                annotatedImage.src = result.annotated_image;
-                                annotatedImage.style.display = 'block';
-                            }
+                            // Show annotated image (dirender server saat diminta)
+                            annotatedImage.src = `/annotated/${result.frame_id}`;
+                            annotatedImage.style.display = 'block';
                             
                             // Show detailed data
                             detailedData.textContent = JSON.stringify(result, null, 2);
@@ -0,0 +1,129 @@
+# archive.py
+# Penyimpanan gambar di background (tanpa scan folder di jalur request)
+import collections
+import os
+import re
+import threading
+import time
+import traceback
+
+
+def sequence_start(folder, pattern):
+    """
+    Cari nomor urut berikutnya dari nama file yang sudah ada (sekali saat startup).
+    pattern: regex dengan 1 group angka, mis. r'img_(\\d+)\\.jpg'
+    """
+    regex = re.compile(pattern)
+    last = 0
+    for name in os.listdir(folder):
+        match = regex.fullmatch(name)
+        if match:
+            last = max(last, int(match.group(1)))
+    return last + 1
+
+
+class ArchiveWriter:
+    """
+    Menulis bytes ke folder arsip dari thread background secara batch,
+    lalu menjalankan retention (umur maksimal / total ukuran maksimal).
+    """
+
+    def __init__(self, folder, max_age_s=None, max_bytes=None, batch_size=16, flush_interval=0.2):
+        self.folder = str(folder)
+        self.max_age_s = max_age_s
+        self.max_bytes = max_bytes
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self.on_evict = None  # callback(name) saat file dihapus retention
+
+        os.makedirs(self.folder, exist_ok=True)
+        # Index file arsip (urut dari yang paling lama) untuk retention O(1)
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.name))
+        entries.sort()
+        self._files = collections.deque(entries)
+        self.total_bytes = sum(e[1] for e in entries)
+        self.written = 0
+        self.evicted = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(target=self._run, name=f'archive-{os.path.basename(self.folder)}', daemon=True)
+        self._thread.start()
+
+    def write(self, name, data, callback=None):
+        """
+        Antrikan file untuk ditulis; callback(name) dipanggil setelah file ada di disk
+        """
+        with self._cond:
+            self._pending.append((name, data, callback))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return name
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size, self.flush_interval)
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                continue
+
+            for name, data, callback in batch:
+                try:
+                    with open(self.path(name), 'wb') as f:
+                        f.write(data)
+                    self._files.append((time.time(), len(data), name))
+                    self.total_bytes += len(data)
+                    self.written += 1
+                    if callback:
+                        callback(name)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Archive error ({name}): {e}")
+                    traceback.print_exc()
+
+            self._enforce_retention()
+
+    def _enforce_retention(self):
+        now = time.time()
+        while self._files:
+            mtime, size, name = self._files[0]
+            too_old = self.max_age_s is not None and now - mtime > self.max_age_s
+            too_big = self.max_bytes is not None and self.total_bytes > self.max_bytes
+            if not (too_old or too_big):
+                break
+            self._files.popleft()
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(name))
+                self.evicted += 1
+                if self.on_evict:
+                    self.on_evict(name)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Archive retention error ({name}): {e}")
+
+    def stats(self):
+        return {
+            'folder': self.folder,
+            'files': len(self._files),
+            'total_bytes': self.total_bytes,
+            'queue_depth': self.queue_depth(),
+            'written': self.written,
+            'evicted': self.evicted,
+            'errors': self.errors
+        }
@@ -0,0 +1,111 @@
+# batch_scheduler.py
+# Micro-batching: kumpulkan frame dari semua device, jalankan 1 forward pass
+import collections
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+from metrics import Histogram
+
+
+class BatchScheduler:
+    """
+    Scheduler di depan model. Frame dikumpulkan sampai max_wait_ms sejak
+    frame pertama masuk atau sampai max_batch_size, lalu dijalankan dalam
+    satu batch. infer_fn(images, size) harus mengembalikan list hasil
+    dengan urutan yang sama dengan images. concurrency > 1 menjalankan
+    beberapa batch bersamaan (mis. 1 per proses worker InferencePool).
+    """
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait_ms=15, concurrency=1):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self.batch_size_hist = Histogram('batch_size', [1, 2, 3, 4, 6, 8, 12, 16])
+        self.queue_wait_hist = Histogram('queue_wait_ms', [1, 2, 5, 10, 15, 20, 30, 50, 100, 250])
+        self._threads = [threading.Thread(target=self._run, name=f'batch-scheduler-{i}', daemon=True)
+                         for i in range(max(1, concurrency))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image, size=640, priority=0):
+        """
+        Masukkan 1 gambar ke antrian batch, kembalikan Future hasilnya.
+        priority > 0: masuk batch berikutnya lebih dulu (mis. device dengan hazard kritis)
+        """
+        future = Future()
+        with self._cond:
+            item = (image, size, time.perf_counter(), future)
+            if priority > 0:
+                self._pending.appendleft(item)
+            else:
+                self._pending.append(item)
+            self._cond.notify()
+        return future
+
+    def infer(self, image, size=640, timeout=None, priority=0):
+        """
+        Versi blocking dari submit()
+        """
+        return self.submit(image, size, priority).result(timeout)
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _collect(self):
+        with self._cond:
+            while True:
+                self._cond.wait_for(lambda: self._pending)
+                # Item prioritas ada di depan: deadline tetap dari item yang paling lama menunggu
+                deadline = min(item[2] for item in self._pending) + self.max_wait
+                while self._pending and len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._pending:
+                    break  # thread lain bisa sudah mengambil semua gambar selama menunggu
+
+            # Hanya gambar dengan ukuran inference yang sama bisa di-batch
+            size = self._pending[0][1]
+            batch, rest = [], collections.deque()
+            while self._pending:
+                item = self._pending.popleft()
+                if item[1] == size and len(batch) < self.max_batch_size:
+                    batch.append(item)
+                else:
+                    rest.append(item)
+            self._pending = rest
+            return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            started = time.perf_counter()
+            self.batch_size_hist.observe(len(batch))
+            for item in batch:
+                self.queue_wait_hist.observe((started - item[2]) * 1000.0)
+
+            try:
+                results = self.infer_fn([item[0] for item in batch], size)
+                for item, result in zip(batch, results):
+                    item[3].set_result(result)
+            except Exception as e:
+                traceback.print_exc()
+                for item in batch:
+                    if not item[3].done():
+                        item[3].set_exception(e)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'concurrency': len(self._threads),
+            'queue_depth': self.queue_depth(),
+            'batch_size': self.batch_size_hist.snapshot(),
+            'queue_wait_ms': self.queue_wait_hist.snapshot()
+        }
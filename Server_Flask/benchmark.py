@@ -0,0 +1,288 @@
+# benchmark.py
+# Benchmark end-to-end: replay JPEG di uploads/ lewat detect_objects_yolov5 dan endpoint Flask.
+# Hasil (latency per stage, throughput per concurrency, peak RSS) disimpan ke JSON supaya
+# run bisa dibandingkan dari waktu ke waktu.
+#   python benchmark.py --concurrency 1 2 4 --requests 100
+#   python benchmark.py --targets detect upload --output benchmarks/backend_onnx.json
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# target -> (module server, deskripsi)
+TARGETS = {
+    'detect': ('server_socketio', 'detect_objects_yolov5() langsung (decode + deteksi + anotasi)'),
+    'stream': ('server_socketio', 'POST / (stream ESP32-CAM, diproses worker inference)'),
+    'upload_image': ('server_socketio', 'POST /upload_image (capture tunggal)'),
+    'upload': ('apps', 'POST /upload (apps.py)'),
+}
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': round(float(np.mean(values)), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3)
+    }
+
+
+def stage_summary(snapshot):
+    return {stage: {k: (round(v, 3) if isinstance(v, float) else v) for k, v in hist.items() if k != 'buckets'}
+            for stage, hist in sorted(snapshot.items()) if hist['count']}
+
+
+def load_server(module_name, workdir):
+    """
+    Import server di dalam workdir sementara supaya arsip/log benchmark
+    tidak bercampur dengan data asli
+    """
+    os.chdir(workdir)
+    sys.path.insert(0, BASE_DIR)
+    if module_name == 'apps':
+        import apps as server
+        from archive import ArchiveWriter
+        server.upload_archive = ArchiveWriter(os.path.join(workdir, 'uploads'))
+    else:
+        import server_socketio as server
+    server.model_loader.wait()
+    server.model_loader.join()  # export artifact di background jangan ikut terukur
+    if server.model_loader.state != 'ready':
+        raise RuntimeError(f"Model not ready: {server.model_loader.error}")
+    return server
+
+
+def make_request_fn(target, server):
+    """
+    Return fungsi(data) -> None yang menjalankan 1 request target (raise jika gagal)
+    """
+    from ingest import decode_frame
+    from metrics import stage_timers
+
+    if target == 'detect':
+        def run(data):
+            with stage_timers.time('decode'):
+                frame = decode_frame(data, max_width=server.DECODE_MAX_WIDTH)
+            server.detect_objects_yolov5(frame.image, frame.scale)
+        return run
+
+    clients = {}
+
+    def client():
+        # 1 test client per thread
+        key = threading.get_ident()
+        if key not in clients:
+            clients[key] = server.app.test_client()
+        return clients[key]
+
+    if target == 'upload':
+        def run(data):
+            response = client().post('/upload', data=data, content_type='image/jpeg')
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+        return run
+
+    path = '/' if target == 'stream' else '/upload_image'
+
+    def run(data):
+        response = client().post(path, data={'image': (io.BytesIO(data), 'frame.jpg')},
+                                 content_type='multipart/form-data')
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        if target == 'stream':
+            run.last_frame_id = max(run.last_frame_id, response.get_json()['frame_id'])
+    run.last_frame_id = 0
+    return run
+
+
+def wait_stream_drained(server, last_frame_id, timeout=120):
+    """
+    Frame terakhir selalu diproses (latest-wins), tunggu sampai hasilnya ada
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        # Hasil disimpan per device; frame_id global, jadi cukup cek frame_id terbesar
+        frame_ids = [(state.result() or {}).get('frame_id') for state in server.devices.devices()]
+        frame_ids = [f for f in frame_ids if f is not None]
+        if frame_ids and max(frame_ids) >= last_frame_id:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def run_level(target, server, run, frames, concurrency, requests):
+    from metrics import stage_timers
+    server.batcher.batch_size_hist.reset()
+    server.batcher.queue_wait_hist.reset()
+    stage_timers.reset()
+    dropped_before = server.frame_queue.dropped if target == 'stream' else 0
+
+    latencies, errors = [], []
+
+    def worker(index):
+        own = []
+        for i in range(index, requests, concurrency):
+            data = frames[i % len(frames)]
+            started = time.perf_counter()
+            try:
+                run(data)
+                own.append((time.perf_counter() - started) * 1000.0)
+            except Exception as e:
+                errors.append(str(e))
+        return own
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for own in pool.map(worker, range(concurrency)):
+            latencies.extend(own)
+    result = {'concurrency': concurrency, 'requests': requests, 'errors': len(errors)}
+
+    if target == 'stream':
+        # Request hanya mengantrikan frame; throughput dihitung dari frame yang selesai diproses
+        drained = wait_stream_drained(server, run.last_frame_id)
+        wall = time.perf_counter() - started
+        processed = stage_timers.snapshot().get('end_to_end', {'count': 0})['count']
+        result.update({
+            'drained': drained,
+            'processed_frames': processed,
+            'dropped_frames': server.frame_queue.dropped - dropped_before,
+            'processed_fps': round(processed / wall, 3),
+        })
+    else:
+        wall = time.perf_counter() - started
+
+    result.update({
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 3),
+        'latency_ms': summarize(latencies),
+        'stages_ms': stage_summary(stage_timers.snapshot()),
+        'batch_size': stage_summary({'batch_size': server.batcher.batch_size_hist.snapshot()}).get('batch_size'),
+        'inference_size': server.resolution.size if hasattr(server, 'resolution') else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    })
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def run_target(target, frames, args):
+    """
+    Jalankan 1 target di proses terpisah (model + memori terukur sendiri)
+    """
+    workdir = tempfile.mkdtemp(prefix=f'bench_{target}_')
+    started = time.perf_counter()
+    server = load_server(TARGETS[target][0], workdir)
+    startup_s = time.perf_counter() - started
+    run = make_request_fn(target, server)
+
+    # Warm-up (tidak dihitung)
+    for data in frames[:args.warmup]:
+        run(data)
+    if target == 'stream':
+        wait_stream_drained(server, run.last_frame_id)
+
+    levels = [run_level(target, server, run, frames, n, args.requests) for n in args.concurrency]
+    return {
+        'description': TARGETS[target][1],
+        'startup_s': round(startup_s, 3),
+        'model': server.model_loader.status(),
+        'levels': levels,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'workdir': workdir
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end Smart Cane server')
+    parser.add_argument('--images', default=os.path.join(BASE_DIR, 'uploads'), help='folder JPEG untuk replay')
+    parser.add_argument('--limit', type=int, default=100, help='jumlah gambar maksimal')
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=100, help='request per level concurrency')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--output', default=None, help='file JSON (default benchmarks/bench_<waktu>.json)')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, '*.jpg')) + glob.glob(os.path.join(args.images, '*.jpeg')))
+    frames = []
+    for path in paths[:args.limit]:
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+    if not frames:
+        parser.error(f"No JPEG images in {args.images}")
+    print(f"Replaying {len(frames)} frames from {args.images}")
+
+    from config import (MODEL_BACKEND, MODEL_NUM_THREADS, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, INFERENCE_WORKERS,
+                        LATENCY_BUDGET_MS)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'frames': len(frames),
+            'frame_bytes_mean': int(np.mean([len(f) for f in frames])),
+            'config': {
+                'MODEL_BACKEND': MODEL_BACKEND,
+                'MODEL_NUM_THREADS': MODEL_NUM_THREADS,
+                'BATCH_MAX_SIZE': BATCH_MAX_SIZE,
+                'BATCH_MAX_WAIT_MS': BATCH_MAX_WAIT_MS,
+                'INFERENCE_WORKERS': INFERENCE_WORKERS,
+                'LATENCY_BUDGET_MS': LATENCY_BUDGET_MS
+            },
+            'args': vars(args)
+        },
+        'targets': {}
+    }
+
+    for target in args.targets:
+        print(f"[{target}] {TARGETS[target][1]}")
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_target, target, frames, args).result()
+        report['targets'][target] = result
+        for level in result['levels']:
+            latency = level['latency_ms'] or {}
+            print(f"  c={level['concurrency']:<3} {level['throughput_rps']:8.2f} req/s  "
+                  f"p50={latency.get('p50')} p95={latency.get('p95')} p99={latency.get('p99')} ms  "
+                  f"errors={level['errors']}  rss={level['peak_rss_mb']} MB")
+
+    output = args.output or os.path.join(BASE_DIR, 'benchmarks', f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# compact.py
+# Payload deteksi biner ringkas untuk mikrokontroler (tanpa parsing JSON di ESP32)
+#
+# Layout (little-endian), 7 + 10 * count byte:
+#   header : version u8 | count u8 | seq u32 | alert u8 (class_id hazard kritis, 255 = tidak ada)
+#   record : class_id u8 | confidence u8 (0-255) | x1 u16 | y1 u16 | x2 u16 | y2 u16
+# Record diurutkan dari confidence tertinggi; koordinat dalam piksel gambar asli.
+import struct
+
+import numpy as np
+
+COMPACT_MIMETYPE = 'application/vnd.smartcane.detection'
+COMPACT_VERSION = 2
+ALERT_NONE = 0xFF
+MAX_RECORDS = 255
+
+_HEADER = struct.Struct('<BBIB')
+_RECORD = np.dtype([('class_id', 'u1'), ('confidence', 'u1'),
+                    ('x1', '<u2'), ('y1', '<u2'), ('x2', '<u2'), ('y2', '<u2')])
+
+
+def encode_detections(dets, seq, alert_class=None):
+    """
+    dets: array (N, 6) x1, y1, x2, y2, confidence, class_id -> bytes.
+    alert_class: class_id alert hazard kritis pada seq ini (None = tidak ada)
+    """
+    dets = np.asarray(dets, dtype=np.float64).reshape(-1, 6)[:MAX_RECORDS]
+    records = np.empty(len(dets), dtype=_RECORD)
+    records['class_id'] = dets[:, 5].astype(np.uint8)
+    records['confidence'] = np.rint(np.clip(dets[:, 4], 0, 1) * 255).astype(np.uint8)
+    boxes = np.rint(np.clip(dets[:, :4], 0, 65535)).astype(np.uint16)
+    for i, field in enumerate(('x1', 'y1', 'x2', 'y2')):
+        records[field] = boxes[:, i]
+    alert = ALERT_NONE if alert_class is None else int(alert_class)
+    return _HEADER.pack(COMPACT_VERSION, len(records), seq & 0xFFFFFFFF, alert) + records.tobytes()
+
+
+def decode_detections(data):
+    """
+    Kebalikan encode_detections (untuk test/tool). Return (seq, array (N, 6), alert_class atau None).
+    """
+    version, count, seq, alert = _HEADER.unpack_from(data)
+    if version != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact payload version: {version}")
+    records = np.frombuffer(data, dtype=_RECORD, count=count, offset=_HEADER.size)
+    dets = np.stack([records['x1'], records['y1'], records['x2'], records['y2'],
+                     records['confidence'] / 255.0, records['class_id']], axis=1).astype(np.float32)
+    return seq, dets, None if alert == ALERT_NONE else alert
+
+
+def wants_compact(request):
+    """
+    Content negotiation: client meminta COMPACT_MIMETYPE lewat header Accept
+    (atau ?format=bin untuk client yang tidak bisa mengatur header)
+    """
+    if request.args.get('format') == 'bin':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', COMPACT_MIMETYPE]) == COMPACT_MIMETYPE
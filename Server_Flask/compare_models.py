@@ -0,0 +1,191 @@
+# compare_models.py
+# Bandingkan deteksi 2 model (mis. FP32 vs INT8) pada frame yang sama:
+# kecocokan box (IoU), latency, dan memori
+#   python compare_models.py models/best.onnx models/best_int8.onnx --images uploads
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from detector import OnnxDetector, OpenVinoDetector, TorchScriptDetector, EagerDetector
+from config import MODEL_HUB_DIR
+from model_loader import load_hub_model, resolve_path
+from quantize import calibration_images
+
+
+def load_detector(path, conf, iou, num_threads=None):
+    """
+    Pilih backend dari ekstensi file artifact
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.onnx':
+        return OnnxDetector(path, conf, iou, num_threads)
+    if ext == '.xml':
+        return OpenVinoDetector(path, conf, iou, num_threads)
+    if ext == '.torchscript':
+        return TorchScriptDetector(path, conf, iou, num_threads)
+    if ext == '.pt':
+        return EagerDetector(load_hub_model(path, resolve_path(MODEL_HUB_DIR)), conf, iou)
+    raise ValueError(f"Unknown model format: {path}")
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory proses ini (MB)
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def box_iou(a, b):
+    """
+    IoU matrix antara box a (N, 4) dan b (M, 4), format xyxy
+    """
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_detections(ref, cand, iou_threshold=0.5):
+    """
+    Greedy matching per class (IoU tertinggi dulu).
+    Return list (i_ref, i_cand, iou) untuk pasangan yang cocok.
+    """
+    if not len(ref) or not len(cand):
+        return []
+    ious = box_iou(ref[:, :4], cand[:, :4])
+    ious[ref[:, 5][:, None] != cand[:, 5][None, :]] = 0
+    matches = []
+    while True:
+        i, j = np.unravel_index(ious.argmax(), ious.shape)
+        if ious[i, j] < iou_threshold:
+            return matches
+        matches.append((int(i), int(j), float(ious[i, j])))
+        ious[i, :] = 0
+        ious[:, j] = 0
+
+
+def run_model(path, image_paths, args):
+    """
+    Load model + inference semua gambar (dijalankan di proses terpisah supaya
+    memori tiap model terukur sendiri). Return (deteksi per gambar, ringkasan).
+    """
+    images = [image[..., ::-1] for image in (cv2.imread(p) for p in image_paths) if image is not None]
+    baseline_mb = peak_rss_mb()
+    started = time.perf_counter()
+    detector = load_detector(path, args.conf, args.iou, args.threads)
+    load_s = time.perf_counter() - started
+    detector.predict(images[:1], size=args.size)  # warm-up
+
+    detections, latencies = [], []
+    for image in images:
+        started = time.perf_counter()
+        detections.append(detector.predict([image], size=args.size)[0])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    summary = {
+        'path': path,
+        'backend': detector.backend,
+        'file_mb': round(sum(os.path.getsize(p) for p in _model_files(path)) / 1e6, 2),
+        'load_s': round(load_s, 3),
+        'latency_ms': {q: round(float(np.percentile(latencies, int(q[1:]))), 2) for q in ('p50', 'p95', 'p99')},
+        'latency_mean_ms': round(float(np.mean(latencies)), 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'model_rss_mb': round(peak_rss_mb() - baseline_mb, 1),
+        'detections': int(sum(len(d) for d in detections))
+    }
+    return detections, summary
+
+
+def run_isolated(path, image_paths, args):
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(run_model, path, image_paths, args).result()
+
+
+def _model_files(path):
+    # OpenVINO IR = .xml + .bin
+    if path.endswith('.xml'):
+        return [path, os.path.splitext(path)[0] + '.bin']
+    return [path]
+
+
+def compare(ref_dets, cand_dets, iou_threshold):
+    matched = missed = extra = class_mismatch = 0
+    ious, conf_diffs = [], []
+    for ref, cand in zip(ref_dets, cand_dets):
+        matches = match_detections(ref, cand, iou_threshold)
+        matched += len(matches)
+        missed += len(ref) - len(matches)
+        extra += len(cand) - len(matches)
+        for i, j, iou in matches:
+            ious.append(iou)
+            conf_diffs.append(abs(float(ref[i, 4]) - float(cand[j, 4])))
+        # Box yang posisinya sama tapi class berbeda (hazard salah label)
+        if len(ref) and len(cand):
+            ious_any = box_iou(ref[:, :4], cand[:, :4])
+            same_spot = ious_any >= iou_threshold
+            class_mismatch += int((same_spot & (ref[:, 5][:, None] != cand[:, 5][None, :])).any(1).sum())
+
+    total_ref = matched + missed
+    return {
+        'iou_threshold': iou_threshold,
+        'matched': matched,
+        'missed': missed,
+        'extra': extra,
+        'class_mismatch': class_mismatch,
+        'recall_vs_reference': round(matched / total_ref, 4) if total_ref else None,
+        'precision_vs_reference': round(matched / (matched + extra), 4) if matched + extra else None,
+        'mean_iou': round(float(np.mean(ious)), 4) if ious else None,
+        'mean_conf_diff': round(float(np.mean(conf_diffs)), 4) if conf_diffs else None,
+        'identical_frames': int(sum(len(r) == len(c) == len(match_detections(r, c, iou_threshold))
+                                    for r, c in zip(ref_dets, cand_dets)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bandingkan deteksi 2 model pada frame yang sama')
+    parser.add_argument('reference', help='model acuan, mis. models/best.onnx (FP32)')
+    parser.add_argument('candidate', help='model pembanding, mis. models/best_int8.onnx')
+    parser.add_argument('--images', default='uploads', help='folder JPEG')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--size', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.45, help='IoU NMS')
+    parser.add_argument('--match-iou', type=float, default=0.5, help='IoU minimal box dianggap sama')
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--json', help='simpan laporan ke file JSON')
+    args = parser.parse_args()
+
+    paths = calibration_images(resolve_path(args.images), args.limit)
+    if not paths:
+        parser.error(f"No images in {args.images}")
+    print(f"Comparing on {len(paths)} frames from {args.images}")
+
+    ref_dets, ref_summary = run_isolated(resolve_path(args.reference), paths, args)
+    cand_dets, cand_summary = run_isolated(resolve_path(args.candidate), paths, args)
+    report = {
+        'frames': len(ref_dets),
+        'reference': ref_summary,
+        'candidate': cand_summary,
+        'agreement': compare(ref_dets, cand_dets, args.match_iou),
+        'speedup': round(ref_summary['latency_mean_ms'] / cand_summary['latency_mean_ms'], 2),
+        'file_size_ratio': round(cand_summary['file_mb'] / ref_summary['file_mb'], 3),
+        'memory_saved_mb': round(ref_summary['peak_rss_mb'] - cand_summary['peak_rss_mb'], 1)
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
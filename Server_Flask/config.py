@@ -10,3 +10,110 @@ SERVER_PORT = 5050
 
 # Jika kamu ingin menonaktifkan pengiriman Telegram (untuk testing offline)
 ENABLE_TELEGRAM = True
+
+# Worker inference untuk stream ESP32-CAM
+INFERENCE_WORKERS = 1      # Jumlah thread worker inference
+FRAME_QUEUE_SIZE = 2       # Buffer maksimal frame (frame lama dibuang jika penuh)
+
+# Micro-batching inference (gabungkan frame dari beberapa cane jadi 1 batch)
+BATCH_MAX_SIZE = 8         # Maksimal gambar per forward pass
+BATCH_MAX_WAIT_MS = 15     # Waktu tunggu maksimal untuk mengumpulkan batch (ms)
+
+# Viewer MJPEG /video_feed: batas FPS per viewer (?fps= bisa lebih kecil) dan interval kirim ulang
+VIDEO_FEED_MAX_FPS = 20
+VIDEO_FEED_KEEPALIVE_S = 5
+
+# Frame Socket.IO (biner) ke dashboard: FPS dan kualitas JPEG diatur per client dari RTT ack
+SOCKET_FRAME_MIN_FPS = 1
+SOCKET_FRAME_MAX_FPS = 10
+SOCKET_JPEG_QUALITY_MIN = 30
+SOCKET_JPEG_QUALITY_MAX = 80
+SOCKET_TARGET_RTT_MS = 250
+
+# Log deteksi terstruktur (JSON lines), ditulis di background
+EVENT_LOG_FILE = 'log.jsonl'
+EVENT_LOG_MAX_MB = 10          # Rotasi jika file melebihi N MB
+EVENT_LOG_ROTATE_HOURS = 24    # Rotasi jika file lebih tua dari N jam (None = hanya ukuran)
+EVENT_LOG_BACKUPS = 5          # Jumlah file lama yang disimpan (log.jsonl.1 ... .N)
+EVENT_LOG_FLUSH_S = 1.0        # Tulis batch ke disk minimal setiap N detik
+EVENT_LOG_EMIT_MS = 250        # Log ke dashboard dikirim sebagai 1 batch per interval ini
+
+# Gate kemiripan frame: frame yang hampir sama dengan frame terakhir yang di-infer (per device)
+# memakai hasil deteksi sebelumnya tanpa forward pass
+SIMILARITY_GATE_THRESHOLD = 4.0    # Rata-rata selisih piksel thumbnail 32x24 (0-255); None = nonaktif
+SIMILARITY_GATE_MAX_FRAMES = 10    # Inference paksa setelah N frame berturut-turut memakai hasil lama
+SIMILARITY_GATE_MAX_AGE_MS = 1000  # Inference paksa jika hasil lama lebih tua dari ini
+
+# Tracker stream (SORT): model dijalankan setiap N frame per device, di antaranya posisi diprediksi
+TRACKER_DETECT_INTERVAL = 3        # 1 = model di setiap frame (tracker tetap memberi track_id)
+TRACKER_IOU_THRESHOLD = 0.3        # IoU minimal box deteksi dengan box prediksi track
+TRACKER_MAX_AGE_FRAMES = 6         # Track dihapus jika tidak terdeteksi lebih dari N frame
+TRACKER_MIN_HITS = 2               # Deteksi yang cocok sebelum track dianggap hazard baru
+
+# Latency budget: ukuran inference turun saat server tertinggal, naik lagi saat ada ruang
+INFERENCE_SIZES = (640, 512, 416, 320)
+LATENCY_BUDGET_MS = 150        # p90 latency inference (antrian batch + forward pass); None = selalu ukuran terbesar
+LATENCY_WINDOW = 12            # Jumlah inference terakhir yang dinilai
+LATENCY_QUEUE_LIMIT = 4        # Rata-rata antrian di atas ini = tertinggal, ukuran turun
+LATENCY_MIN_INTERVAL_S = 2.0   # Jeda minimal antar perubahan ukuran
+
+# Decode JPEG stream: frame yang lebih lebar dari ini di-decode dengan DCT scaling (1/2, 1/4, 1/8)
+DECODE_MAX_WIDTH = 640     # None = selalu full decode
+
+# Ingest stream /stream: JPEG mentah per POST (keep-alive) atau 1 koneksi chunked berisi banyak frame
+STREAM_MAX_FRAME_KB = 512      # Frame lebih besar dari ini ditolak
+
+# State per cane (deteksi, frame, lokasi, sequence): dibagi ke beberapa shard dengan lock sendiri
+DEVICE_STATE_SHARDS = 16
+DEVICE_IDLE_TIMEOUT_S = 600    # Cane yang tidak mengirim apa pun selama N detik dibuang dari memori
+
+# Hazard kritis: alert langsung setelah inference (sebelum anotasi/encode/arsip/log),
+# cane yang baru melihatnya diprioritaskan di antrian frame dan batch
+CRITICAL_CLASSES = ('po', 'st', 've')   # lubang, tangga, kendaraan
+CRITICAL_MIN_CONFIDENCE = 0.5
+CRITICAL_ALERT_COOLDOWN_S = 2.0          # Maksimal 1 alert per cane per class dalam N detik
+CRITICAL_PRIORITY_S = 5.0                # Lama cane diprioritaskan setelah hazard kritis
+
+# GPS: fix dikirim per batch (/send_locations), disimpan di ring buffer per cane (memori tetap)
+TRAJECTORY_CAPACITY = 3600     # Fix per cane (1 fix/detik = 1 jam terakhir)
+TRAJECTORY_MAX_GAP_S = 60      # Celah waktu lebih dari ini = segmen jejak baru
+LOCATION_BATCH_MAX = 500       # Fix maksimal per request
+LOCATION_EMIT_MS = 1000        # Update lokasi ke dashboard digabung per interval
+
+# Arsip gambar (uploads/ dan classified_images/): retention, None = tanpa batas
+ARCHIVE_MAX_AGE_DAYS = None    # Hapus gambar lebih tua dari N hari
+ARCHIVE_MAX_MB = 1024          # Hapus gambar paling lama jika total folder melebihi N MB
+
+# Catalog gambar terklasifikasi (/images): metadata deteksi per gambar, dibaca sekali saat startup
+IMAGE_CATALOG_INDEX = 'image_catalog.jsonl'
+IMAGES_PAGE_MAX = 100          # Batas ?limit= per halaman
+
+# Push deteksi ke tongkat (/get_detection long-poll dan /detections/stream SSE)
+DETECTION_LONGPOLL_MAX_S = 25  # Batas ?wait= long-poll (di bawah timeout HTTP firmware)
+DETECTION_SSE_KEEPALIVE_S = 15 # Komentar keep-alive SSE jika tidak ada deteksi baru
+
+# Gambar anotasi /upload dirender hanya saat diminta; jumlah frame terakhir yang disimpan
+ANNOTATION_CACHE_SIZE = 32
+
+# Model YOLOv5 (path relatif terhadap folder Server_Flask)
+MODEL_WEIGHTS = 'models/best.pt'
+MODEL_HUB_DIR = 'models/hub'                  # Cache offline kode yolov5 (torch.hub), tanpa force_reload
+MODEL_BACKEND = 'auto'                        # 'auto' (= torchscript), 'torch', 'torchscript', 'onnx', 'onnx-int8', 'openvino'
+MODEL_TORCHSCRIPT = 'models/best.torchscript' # Artifact per backend, dibuat otomatis (atau via export_model.py)
+MODEL_ONNX = 'models/best.onnx'
+MODEL_ONNX_INT8 = 'models/best_int8.onnx'     # INT8 statis, dikalibrasi dari QUANT_CALIBRATION_DIR
+MODEL_OPENVINO = 'models/best_openvino/best.xml'
+MODEL_NUM_THREADS = None                      # Thread CPU untuk inference; None = default runtime
+MODEL_WARMUP_SIZE = 640                       # Ukuran inference warm-up sebelum server "ready"
+
+# Serving multi-proses (serve.py --workers N): model di N proses worker, frame lewat shared memory.
+# 0 = model di proses server (mode dev). INFERENCE_WORKERS sebaiknya >= SERVING_WORKERS.
+SERVING_WORKERS = 0
+SERVING_FRAME_BUFFER_MB = 8   # Buffer shared memory per worker (1 batch frame decoded)
+SERVING_ACQUIRE_TIMEOUT_S = 30  # Tunggu worker idle maksimal N detik, lalu request dijawab 503
+SERVING_RESULT_TIMEOUT_S = 30   # Worker yang tidak menjawab 1 batch dalam N detik dijalankan ulang (503)
+SERVING_THREADS = 64          # Thread gunicorn (serve.py); long-poll/MJPEG memakai 1 thread per koneksi
+
+# Kalibrasi kuantisasi INT8 (frame arsip yang mirip kondisi lapangan)
+QUANT_CALIBRATION_DIR = 'uploads'
+QUANT_CALIBRATION_IMAGES = 64
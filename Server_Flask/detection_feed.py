@@ -0,0 +1,125 @@
+# detection_feed.py
+# Deteksi terakhir + nomor urut (seq) untuk long-poll, SSE, dan ETag/304
+import json
+import threading
+import time
+
+from compact import encode_detections
+
+
+class DetectionFeed:
+    """
+    Menyimpan deteksi terakhir. Body JSON dan biner (compact.py) di-encode
+    sekali per publish, bukan per request, jadi current() selalu berisi
+    bbox/confidence terbaru. seq hanya naik jika key berubah (class yang
+    terlihat), sehingga client yang menunggu tidak dibangunkan untuk hasil yang sama.
+    publish_alert() mengirim alert hazard kritis lebih dulu (seq naik, waiter langsung
+    dibangunkan); body tetap menyertakan alert (dengan alert_seq) selama alert_ttl_s,
+    karena hasil lengkap biasanya menyusul beberapa ms kemudian sebelum cane sempat membaca.
+    """
+
+    def __init__(self, initial, alert_ttl_s=2.0):
+        self._cond = threading.Condition()
+        # Epoch membedakan seq setelah server restart (ETag/since lama tidak dianggap sama)
+        self.epoch = format(int(time.time()), 'x')
+        self.seq = 0
+        self._key = None
+        self.alert_ttl_s = alert_ttl_s
+        self._alert = None  # (seq, alert, waktu monotonic) alert terakhir
+        self._last = (initial, None)
+        self._bodies = self._encode(initial, None, 0)
+        self.published = 0
+        self.changes = 0
+        self.alerts = 0
+
+    def _encode(self, detection, dets, seq):
+        alert = None
+        if self._alert and (self._alert[0] == seq or time.monotonic() - self._alert[2] <= self.alert_ttl_s):
+            alert = self._alert[1]
+        body = dict(detection, seq=seq, epoch=self.epoch)
+        if alert is not None:
+            body.update(alert=alert, alert_seq=self._alert[0])
+        return {
+            'json': json.dumps(body),
+            'compact': encode_detections(dets if dets is not None else [], seq,
+                                         alert_class=alert.get('class_id') if alert else None)
+        }
+
+    def publish(self, detection, key=None, dets=None):
+        """
+        Simpan deteksi baru. key: nilai pembanding perubahan (default: seluruh isi).
+        dets: array (N, 6) untuk payload biner. Return True jika seq naik (waiter dibangunkan).
+        """
+        key = key if key is not None else json.dumps(detection, sort_keys=True)
+        with self._cond:
+            self.published += 1
+            changed = key != self._key
+            if changed:
+                self._key = key
+                self.seq += 1
+                self.changes += 1
+            self._last = (detection, dets)
+            self._bodies = self._encode(detection, dets, self.seq)
+            if changed:
+                self._cond.notify_all()
+            return changed
+
+    def publish_alert(self, alert):
+        """
+        Alert hazard kritis (dict dari alerts.py), dikirim sebelum hasil deteksi lengkap.
+        Deteksi terakhir tetap di body; seq selalu naik.
+        """
+        with self._cond:
+            self.seq += 1
+            self.alerts += 1
+            self._alert = (self.seq, alert, time.monotonic())
+            self._bodies = self._encode(*self._last, self.seq)
+            self._cond.notify_all()
+            return self.seq
+
+    def last_alert(self):
+        with self._cond:
+            return self._alert[1] if self._alert else None
+
+    def current(self, fmt='json'):
+        """
+        Return (seq, body). fmt: 'json' atau 'compact'
+        """
+        with self._cond:
+            return self.seq, self._bodies[fmt]
+
+    def wait(self, since, timeout, fmt='json'):
+        """
+        Tunggu sampai seq > since (maksimal timeout detik). Return (seq, body).
+        since > seq berarti client memakai seq dari sebelum restart: langsung return.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != since, timeout)
+            return self.seq, self._bodies[fmt]
+
+    def etag(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def parse_etag_seq(self, etag):
+        """
+        seq dari ETag/Last-Event-ID milik epoch ini, None jika dari epoch lain
+        """
+        epoch, _, seq = (etag or '').strip('"').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since_from_etags(self, etags):
+        """
+        seq dari header If-None-Match (daftar ETag), None jika tidak ada yang cocok
+        """
+        for etag in etags:
+            seq = self.parse_etag_seq(etag)
+            if seq is not None:
+                return seq
+        return None
+
+    def stats(self):
+        with self._cond:
+            return {'seq': self.seq, 'epoch': self.epoch, 'published': self.published, 'changes': self.changes,
+                    'alerts': self.alerts}
@@ -0,0 +1,224 @@
+# detector.py
+# Interface detector YOLOv5 + pre/post-processing untuk model hasil export
+import json
+import math
+import os
+
+import cv2
+import numpy as np
+
+from metrics import stage_timers
+
+
+class Detector:
+    """
+    Interface detector yang dipakai kedua server.
+    predict(images, size) -> list array (N, 6): x1, y1, x2, y2, confidence, class_id
+    dalam koordinat masing-masing gambar input (RGB, HWC, uint8).
+    """
+    backend = 'base'
+
+    def __init__(self, names, conf=0.25, iou=0.45, stride=32):
+        self.names = names
+        self.conf = conf
+        self.iou = iou
+        self.stride = stride
+        self.max_det = 1000
+
+    def predict(self, images, size=640):
+        raise NotImplementedError
+
+
+class EagerDetector(Detector):
+    """
+    Model PyTorch eager (objek AutoShape dari torch.hub / paket yolov5)
+    """
+    backend = 'torch'
+
+    def __init__(self, model, conf=0.25, iou=0.45):
+        super().__init__(model.names, conf, iou, int(max(model.stride)) if hasattr(model.stride, '__iter__') else int(model.stride))
+        self.model = model
+
+    def predict(self, images, size=640):
+        self.model.conf = self.conf
+        self.model.iou = self.iou
+        # AutoShape menjalankan letterbox + forward + NMS sekaligus
+        with stage_timers.time('inference'):
+            return [pred.cpu().numpy() for pred in self.model(images, size=size).pred]
+
+
+class TorchScriptDetector(Detector):
+    """
+    Artifact TorchScript (hasil export DetectionModel) + letterbox/NMS sendiri
+    """
+    backend = 'torchscript'
+
+    def __init__(self, path, conf=0.25, iou=0.45, num_threads=None):
+        import torch
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        extra_files = {'config.txt': ''}
+        self.model = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        self.model.eval()
+        meta = json.loads(extra_files['config.txt'])
+        super().__init__({int(k): v for k, v in meta['names'].items()}, conf, iou, meta['stride'])
+        self._torch = torch
+
+    def predict(self, images, size=640):
+        with stage_timers.time('letterbox'):
+            batch, shape1 = letterbox_batch(images, size, self.stride)
+        with stage_timers.time('inference'), self._torch.inference_mode():
+            out = self.model(self._torch.from_numpy(batch))
+        out = out[0] if isinstance(out, (list, tuple)) else out
+        with stage_timers.time('nms'):
+            return postprocess_batch(out.numpy(), images, shape1, self.conf, self.iou, self.max_det)
+
+
+class OnnxDetector(Detector):
+    """
+    ONNX Runtime CPU (graph optimization penuh) + letterbox/NMS sendiri
+    """
+    backend = 'onnx'
+
+    def __init__(self, path, conf=0.25, iou=0.45, num_threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        meta = self.session.get_modelmeta().custom_metadata_map
+        names = json.loads(meta['names'])
+        super().__init__({int(k): v for k, v in names.items()}, conf, iou, int(meta['stride']))
+        if 'quantization' in meta:
+            self.backend = 'onnx-int8'
+
+    def predict(self, images, size=640):
+        with stage_timers.time('letterbox'):
+            batch, shape1 = letterbox_batch(images, size, self.stride)
+        with stage_timers.time('inference'):
+            out = self.session.run(None, {self.input_name: batch})[0]
+        with stage_timers.time('nms'):
+            return postprocess_batch(out, images, shape1, self.conf, self.iou, self.max_det)
+
+
+class OpenVinoDetector(Detector):
+    """
+    OpenVINO CPU (model IR .xml/.bin hasil export) + letterbox/NMS sendiri
+    """
+    backend = 'openvino'
+
+    def __init__(self, path, conf=0.25, iou=0.45, num_threads=None):
+        import openvino as ov
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if num_threads:
+            config['INFERENCE_NUM_THREADS'] = num_threads
+        self.compiled = core.compile_model(core.read_model(path), 'CPU', config)
+        # Metadata class/stride disimpan di samping file .xml
+        with open(os.path.splitext(path)[0] + '.json') as f:
+            meta = json.load(f)
+        super().__init__({int(k): v for k, v in meta['names'].items()}, conf, iou, meta['stride'])
+
+    def predict(self, images, size=640):
+        with stage_timers.time('letterbox'):
+            batch, shape1 = letterbox_batch(images, size, self.stride)
+        with stage_timers.time('inference'):
+            out = self.compiled(batch)[0]
+        with stage_timers.time('nms'):
+            return postprocess_batch(out, images, shape1, self.conf, self.iou, self.max_det)
+
+
+def letterbox(image, new_shape, color=(114, 114, 114)):
+    """
+    Resize + padding ke new_shape (h, w) dengan rasio tetap (sama seperti YOLOv5)
+    """
+    shape = image.shape[:2]
+    r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+    new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+    dw, dh = (new_shape[1] - new_unpad[0]) / 2, (new_shape[0] - new_unpad[1]) / 2
+    if shape[::-1] != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+
+
+def letterbox_batch(images, size, stride=32):
+    """
+    Letterbox semua gambar ke 1 shape bersama (kelipatan stride).
+    Return (array float32 BCHW 0-1, shape inference (h, w)).
+    """
+    shapes = []
+    for image in images:
+        gain = size / max(image.shape[:2])
+        shapes.append([int(y * gain) for y in image.shape[:2]])
+    shape1 = [int(math.ceil(x / stride) * stride) for x in np.array(shapes).max(0)]
+    batch = np.stack([letterbox(image, shape1) for image in images])
+    batch = np.ascontiguousarray(batch.transpose((0, 3, 1, 2)), dtype=np.float32)
+    batch /= 255.0
+    return batch, shape1
+
+
+def non_max_suppression(pred, conf_thres=0.25, iou_thres=0.45, max_det=1000):
+    """
+    NMS NumPy untuk output mentah YOLOv5 (N, 5 + nc) dari 1 gambar.
+    Return array (M, 6): x1, y1, x2, y2, confidence, class_id
+    """
+    pred = pred[pred[:, 4] > conf_thres]
+    if not len(pred):
+        return np.zeros((0, 6), dtype=np.float32)
+
+    scores_all = pred[:, 5:] * pred[:, 4:5]
+    class_ids = scores_all.argmax(1)
+    scores = scores_all[np.arange(len(pred)), class_ids]
+    keep = scores > conf_thres
+    pred, class_ids, scores = pred[keep], class_ids[keep], scores[keep]
+    if not len(pred):
+        return np.zeros((0, 6), dtype=np.float32)
+
+    # xywh -> xyxy
+    boxes = np.empty((len(pred), 4), dtype=np.float32)
+    boxes[:, 0] = pred[:, 0] - pred[:, 2] / 2
+    boxes[:, 1] = pred[:, 1] - pred[:, 3] / 2
+    boxes[:, 2] = pred[:, 0] + pred[:, 2] / 2
+    boxes[:, 3] = pred[:, 1] + pred[:, 3] / 2
+
+    # Offset per class supaya NMS tidak menggabungkan class berbeda
+    offset_boxes = boxes + class_ids[:, None].astype(np.float32) * 7680
+    x1, y1, x2, y2 = offset_boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    selected = []
+    while order.size and len(selected) < max_det:
+        i = order[0]
+        selected.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thres]
+
+    selected = np.array(selected)
+    return np.concatenate([boxes[selected], scores[selected, None], class_ids[selected, None]], axis=1).astype(np.float32)
+
+
+def scale_boxes(dets, shape1, shape0):
+    """
+    Kembalikan koordinat dari shape inference (letterbox) ke shape gambar asli
+    """
+    gain = min(shape1[0] / shape0[0], shape1[1] / shape0[1])
+    pad_w, pad_h = (shape1[1] - shape0[1] * gain) / 2, (shape1[0] - shape0[0] * gain) / 2
+    dets[:, [0, 2]] = ((dets[:, [0, 2]] - pad_w) / gain).clip(0, shape0[1])
+    dets[:, [1, 3]] = ((dets[:, [1, 3]] - pad_h) / gain).clip(0, shape0[0])
+    return dets
+
+
+def postprocess_batch(output, images, shape1, conf_thres, iou_thres, max_det=1000):
+    """
+    NMS + scale box untuk output batch (B, N, 5 + nc)
+    """
+    return [scale_boxes(non_max_suppression(pred, conf_thres, iou_thres, max_det), shape1, image.shape[:2])
+            for pred, image in zip(output, images)]
@@ -0,0 +1,227 @@
+# device_state.py
+# State per cane (deteksi, frame, lokasi, sequence, statistik) tanpa 1 lock global
+import threading
+import time
+import zlib
+
+
+class DeviceState:
+    """
+    State 1 device. Field diubah dengan state.lock dipegang; broadcaster/feed/trajectory
+    (jika ada) punya lock sendiri dan dibuat sekali saat device pertama kali terlihat.
+    """
+
+    def __init__(self, device_id, broadcaster=None, feed=None, trajectory=None):
+        self.device_id = device_id
+        self.lock = threading.Lock()
+        self.broadcaster = broadcaster
+        self.feed = feed
+        self.trajectory = trajectory
+        self.latest_result = None
+        self.location = None
+        self.pending_alert = None
+        self.last_seq = None
+        self.boot_id = None
+        self.restarts = 0
+        self.frames = 0
+        self.detections = 0
+        self.stale = 0
+        self.missing = 0
+        self.first_seen = time.time()
+        self.last_seen = time.monotonic()
+        self.holders = 0  # viewer/stream yang sedang memakai state ini (tidak di-evict)
+
+    def accept_seq(self, seq, boot_id=None):
+        """
+        False jika frame datang terlambat/duplikat (seq <= terakhir). boot_id berbeda
+        dari sebelumnya = device restart (counter seq mulai lagi dari 0).
+        """
+        with self.lock:
+            self._check_boot(boot_id)
+            if seq is not None:
+                last = self.last_seq
+                if last is not None and seq <= last:
+                    self.stale += 1
+                    return False
+                if last is not None and seq > last + 1:
+                    self.missing += seq - last - 1
+                self.last_seq = seq
+            self.frames += 1
+            return True
+
+    def _check_boot(self, boot_id):
+        # Dipanggil dengan self.lock dipegang
+        if boot_id is not None and boot_id != self.boot_id:
+            if self.boot_id is not None:
+                self.restarts += 1
+            self.boot_id = boot_id
+            self.last_seq = None
+
+    def reset_seq(self, boot_id=None):
+        # Sesi stream baru (koneksi /stream dibuka ulang): urutan frame lama tidak berlaku lagi
+        with self.lock:
+            self._check_boot(boot_id)
+            self.last_seq = None
+
+    def set_result(self, result):
+        with self.lock:
+            self.latest_result = result
+            if result.get('detected'):
+                self.detections += 1
+
+    def result(self):
+        with self.lock:
+            return self.latest_result
+
+    def set_alert(self, alert):
+        with self.lock:
+            self.pending_alert = alert
+
+    def take_alert(self):
+        # Alert dikirim sekali, di response berikutnya ke cane ini
+        with self.lock:
+            alert, self.pending_alert = self.pending_alert, None
+            return alert
+
+    def set_location(self, location):
+        with self.lock:
+            self.location = location
+
+    def summary(self):
+        with self.lock:
+            result = self.latest_result or {}
+            return {
+                'device': self.device_id,
+                'first_seen': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.first_seen)),
+                'idle_s': round(time.monotonic() - self.last_seen, 1),
+                'frames': self.frames,
+                'detections': self.detections,
+                'stale': self.stale,
+                'missing': self.missing,
+                'last_seq': self.last_seq,
+                'restarts': self.restarts,
+                'count': result.get('count', 0),
+                'location': self.location,
+                'trajectory_points': len(self.trajectory) if self.trajectory is not None else None
+            }
+
+
+class DeviceStateStore:
+    """
+    Device dibagi ke `shards` dict, masing-masing dengan lock sendiri (lock striping),
+    jadi cane yang berbeda hampir tidak pernah menunggu lock yang sama. Device yang
+    tidak mengirim apa pun selama idle_timeout_s dibuang (dicek paling sering setiap
+    sweep_interval_s saat ada akses), kecuali masih ada viewer; on_evict(device_id)
+    dipanggil supaya state per device di modul lain (tracker, gate) ikut dibuang.
+    """
+
+    def __init__(self, shards=16, idle_timeout_s=600, sweep_interval_s=30, broadcaster_fn=None, feed_fn=None,
+                 trajectory_fn=None, on_evict=None):
+        self._shards = [(threading.Lock(), {}) for _ in range(max(1, shards))]
+        self.idle_timeout_s = idle_timeout_s
+        self.sweep_interval_s = sweep_interval_s
+        self.broadcaster_fn = broadcaster_fn
+        self.feed_fn = feed_fn
+        self.trajectory_fn = trajectory_fn
+        self.on_evict = on_evict
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval_s
+        self.created = 0
+        self.evicted = 0
+
+    def _shard(self, device_id):
+        # crc32: stabil dan murah (hash() string diacak per proses)
+        return self._shards[zlib.crc32(device_id.encode('utf-8', 'replace')) % len(self._shards)]
+
+    def get(self, device_id, touch=True):
+        """
+        State device (dibuat jika belum ada). touch=True: device dianggap aktif sekarang.
+        """
+        device_id = str(device_id)
+        lock, states = self._shard(device_id)
+        with lock:
+            state = states.get(device_id)
+            if state is None:
+                state = states[device_id] = DeviceState(
+                    device_id,
+                    broadcaster=self.broadcaster_fn() if self.broadcaster_fn else None,
+                    feed=self.feed_fn() if self.feed_fn else None,
+                    trajectory=self.trajectory_fn() if self.trajectory_fn else None)
+                self.created += 1
+            if touch:
+                state.last_seen = time.monotonic()
+        self._maybe_sweep()
+        return state
+
+    def peek(self, device_id):
+        """
+        State device jika ada, tanpa membuat atau memperbarui waktu aktif
+        """
+        device_id = str(device_id)
+        lock, states = self._shard(device_id)
+        with lock:
+            return states.get(device_id)
+
+    def hold(self, device_id):
+        """
+        Tandai state dipakai viewer/stream jangka panjang; panggil release() setelah selesai
+        """
+        state = self.get(device_id, touch=False)
+        with state.lock:
+            state.holders += 1
+        return state
+
+    def release(self, state):
+        with state.lock:
+            state.holders -= 1
+            state.last_seen = time.monotonic()
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if self.idle_timeout_s is None or now < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = now + self.sweep_interval_s
+            self.sweep(now)
+        finally:
+            self._sweep_lock.release()
+
+    def sweep(self, now=None):
+        """
+        Buang device yang idle lebih dari idle_timeout_s. Return list device_id yang dibuang.
+        """
+        now = now if now is not None else time.monotonic()
+        removed = []
+        for lock, states in self._shards:
+            with lock:
+                for device_id, state in list(states.items()):
+                    if state.holders == 0 and now - state.last_seen > self.idle_timeout_s:
+                        del states[device_id]
+                        removed.append(device_id)
+        self.evicted += len(removed)
+        for device_id in removed:
+            print(f"Device {device_id} idle, state removed")
+            if self.on_evict:
+                self.on_evict(device_id)
+        return removed
+
+    def devices(self):
+        states = []
+        for lock, shard in self._shards:
+            with lock:
+                states.extend(shard.values())
+        return sorted(states, key=lambda s: s.last_seen, reverse=True)
+
+    def __len__(self):
+        return sum(len(states) for _, states in self._shards)
+
+    def stats(self):
+        devices = self.devices()
+        return {
+            'devices': len(devices),
+            'created': self.created,
+            'evicted': self.evicted,
+            'stale_frames': sum(s.stale for s in devices),
+            'missing_frames': sum(s.missing for s in devices),
+            'active': [s.summary() for s in devices[:20]]
+        }
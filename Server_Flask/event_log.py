@@ -0,0 +1,182 @@
+# event_log.py
+# Log terstruktur (JSON lines) ditulis di background: batch per ukuran/waktu, rotasi file,
+# dan event ke dashboard digabung per interval (bukan 1 emit per deteksi)
+import collections
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+class EventLogWriter:
+    """
+    log() hanya menambah record ke antrian (tanpa I/O di jalur request).
+    Thread background menulis batch ke file saat antrian >= batch_size atau
+    setiap flush_interval detik, merotasi file jika melebihi max_bytes atau
+    lebih tua dari rotate_interval_s, lalu memanggil emit_fn(records) paling
+    sering sekali per emit_interval detik.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, rotate_interval_s=None, backups=5,
+                 batch_size=64, flush_interval=1.0, emit_fn=None, emit_interval=0.25, max_pending=10000):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.rotate_interval_s = rotate_interval_s
+        self.backups = backups
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.emit_fn = emit_fn
+        self.emit_interval = emit_interval
+        self._pending = collections.deque(maxlen=max_pending)  # penuh: record terlama dibuang
+        self._outbox = []  # record yang belum di-emit ke dashboard
+        self._cond = threading.Condition()
+        self.logged = 0
+        self.written = 0
+        self.emitted = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self.dropped = 0
+
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        self._file = None
+        self._opened_at = None
+        self._last_emit = 0.0
+        self._flush_requested = False
+
+        self._thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+        self._thread.start()
+
+    def log(self, event, **fields):
+        """
+        Antrikan 1 record: {'ts', 'event', **fields}. Return record tersebut.
+        """
+        record = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': event}
+        record.update(fields)
+        with self._cond:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(record)
+            self.logged += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return record
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self, timeout=5.0):
+        """
+        Tunggu sampai semua record yang sudah di-log tertulis (untuk shutdown/tool)
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self.logged
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self.written + self.errors + self.dropped < target and time.monotonic() < deadline:
+                self._cond.wait(0.05)
+
+    def _wait_interval(self):
+        # Bangun untuk flush file atau emit, mana yang lebih dulu
+        if self.emit_fn is not None and self._outbox:
+            return max(0.0, min(self.flush_interval, self._last_emit + self.emit_interval - time.monotonic()))
+        return self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size or self._flush_requested,
+                                    self._wait_interval())
+                self._flush_requested = False
+                batch = list(self._pending)
+                self._pending.clear()
+
+            if batch:
+                self._write(batch)
+                if self.emit_fn is not None:
+                    self._outbox.extend(batch)
+            self._emit()
+
+    def _write(self, batch):
+        try:
+            if self._file is None:
+                self._open()
+            # Satu write() per file; batch dipecah hanya jika rotasi terjadi di tengah batch
+            chunk, size = [], self._file.tell()
+            for record in batch:
+                line = json.dumps(record, default=str) + '\n'
+                if self._should_rotate(size):
+                    self._file.write(''.join(chunk))
+                    chunk, size = [], self._rotate()
+                chunk.append(line)
+                size += len(line)
+            self._file.write(''.join(chunk))
+            self._file.flush()
+            self.batches += 1
+            with self._cond:
+                self.written += len(batch)
+                self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self.errors += len(batch)
+                self._cond.notify_all()
+            print(f"Event log error: {e}")
+            traceback.print_exc()
+
+    def _emit(self):
+        if self.emit_fn is None or not self._outbox:
+            return
+        now = time.monotonic()
+        if now - self._last_emit < self.emit_interval:
+            return
+        records, self._outbox = self._outbox, []
+        self._last_emit = now
+        try:
+            self.emit_fn(records)
+            self.emitted += len(records)
+        except Exception as e:
+            print(f"Event log emit error: {e}")
+
+    def _should_rotate(self, size):
+        if size == 0:
+            return False
+        if self.max_bytes is not None and size >= self.max_bytes:
+            return True
+        return self.rotate_interval_s is not None and time.time() - self._opened_at >= self.rotate_interval_s
+
+    def _rotate(self):
+        self._file.close()
+        # log.jsonl -> log.jsonl.1 -> ... -> log.jsonl.<backups> (yang terakhir dihapus)
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.path}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._open()
+        return 0
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._opened_at = time.time()
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queue_depth': self.queue_depth(),
+            'logged': self.logged,
+            'written': self.written,
+            'emitted': self.emitted,
+            'batches': self.batches,
+            'rotations': self.rotations,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
@@ -0,0 +1,27 @@
+# export_model.py
+# Export best.pt ke artifact backend CPU (TorchScript / ONNX / OpenVINO) sebelum deploy
+#   python export_model.py --format torchscript onnx openvino
+import argparse
+import time
+
+from config import MODEL_WEIGHTS, MODEL_HUB_DIR
+from model_loader import ARTIFACT_BACKENDS, MODEL_ARTIFACTS, load_hub_model, resolve_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export model YOLOv5 ke backend inference CPU')
+    parser.add_argument('--weights', default=MODEL_WEIGHTS, help='path checkpoint .pt')
+    parser.add_argument('--format', nargs='+', default=['torchscript'], choices=sorted(ARTIFACT_BACKENDS),
+                        help='backend yang di-export')
+    args = parser.parse_args()
+
+    model = load_hub_model(resolve_path(args.weights), resolve_path(MODEL_HUB_DIR))
+    for backend in args.format:
+        path = resolve_path(MODEL_ARTIFACTS[backend])
+        started = time.perf_counter()
+        ARTIFACT_BACKENDS[backend][1](model, path)
+        print(f"{backend}: {path} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
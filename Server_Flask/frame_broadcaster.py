@@ -0,0 +1,106 @@
+# frame_broadcaster.py
+# Broadcast frame JPEG ke viewer MJPEG: viewer hanya dibangunkan saat ada frame baru
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def encode_placeholder(text, size=(640, 480)):
+    """
+    JPEG placeholder (teks di layar hitam); cukup di-encode sekali saat startup
+    """
+    img = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    cv2.putText(img, text, (50, size[1] // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return cv2.imencode('.jpg', img)[1].tobytes()
+
+
+def multipart_chunk(jpeg, boundary=b'frame'):
+    return (b'--' + boundary + b'\r\nContent-Type: image/jpeg\r\nContent-Length: '
+            + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+
+class FrameBroadcaster:
+    """
+    Buffer frame berversi + condition variable. publish() menyimpan frame
+    terbaru (chunk multipart dibuat sekali untuk semua viewer) lalu
+    membangunkan viewer. Viewer yang lambat otomatis melewati frame lama.
+    """
+
+    def __init__(self, placeholder):
+        self._cond = threading.Condition()
+        self.version = 0
+        self.frame = None
+        self._chunk = None
+        self._encode_fn = None
+        self._placeholder_chunk = multipart_chunk(placeholder)
+        self.viewers = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def publish(self, jpeg=None, encode_fn=None):
+        """
+        Frame baru: bytes JPEG siap pakai, atau encode_fn() -> bytes yang baru
+        dipanggil saat frame pertama kali diminta (tanpa viewer = tanpa encode)
+        """
+        chunk = multipart_chunk(jpeg) if jpeg is not None else None
+        with self._cond:
+            self.version += 1
+            self.frame = jpeg
+            self._chunk = chunk
+            self._encode_fn = encode_fn
+            self._cond.notify_all()
+            return self.version
+
+    def _materialize(self):
+        # Dipanggil dengan lock dipegang
+        if self._encode_fn is not None:
+            self.frame = self._encode_fn()
+            self._chunk = multipart_chunk(self.frame)
+            self._encode_fn = None
+
+    def latest(self):
+        """
+        Return (version, bytes JPEG) frame terakhir; frame None jika belum ada
+        """
+        with self._cond:
+            self._materialize()
+            return self.version, self.frame
+
+    def _wait_chunk(self, after_version, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != after_version, timeout)
+            self._materialize()
+            if after_version >= 0 and self.version > after_version + 1:
+                self.frames_skipped += self.version - after_version - 1
+            self.frames_sent += 1
+            return self.version, self._chunk or self._placeholder_chunk
+
+    def mjpeg(self, max_fps=20, keepalive_s=5.0):
+        """
+        Generator multipart/x-mixed-replace untuk 1 viewer.
+        Maksimal max_fps; jika tidak ada frame baru, frame terakhir dikirim
+        ulang setiap keepalive_s supaya koneksi tidak dianggap mati.
+        """
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        last_version = -1
+        next_send = 0.0
+        with self._cond:
+            self.viewers += 1
+        try:
+            while True:
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)  # rate limit per viewer; frame di antaranya dilewati
+                last_version, chunk = self._wait_chunk(last_version, keepalive_s)
+                next_send = time.monotonic() + min_interval
+                yield chunk
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+    def stats(self):
+        with self._cond:
+            return {'version': self.version, 'viewers': self.viewers,
+                    'frames_sent': self.frames_sent, 'frames_skipped': self.frames_skipped}
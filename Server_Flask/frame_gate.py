@@ -0,0 +1,91 @@
+# frame_gate.py
+# Lewati inference untuk frame yang hampir sama dengan frame terakhir yang di-infer (per device)
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def frame_signature(image, size=(32, 24)):
+    """
+    Thumbnail grayscale kecil (INTER_AREA = rata-rata blok, tahan noise sensor)
+    """
+    if image.ndim == 3 and image.strides[-1] < 0:
+        image = image[..., ::-1]  # view RGB dari BGR: balik lagi (rata-rata channel tidak bergantung urutan)
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = small.mean(axis=2)
+    return small.astype(np.float32)
+
+
+def frame_difference(a, b):
+    """
+    Rata-rata selisih absolut piksel thumbnail (0-255)
+    """
+    return float(np.abs(a - b).mean())
+
+
+class SimilarityGate:
+    """
+    Simpan thumbnail + hasil deteksi frame terakhir yang di-infer per device.
+    Frame baru dengan selisih < threshold memakai hasil tersebut, kecuali
+    sudah max_reuse_frames kali berturut-turut atau hasilnya lebih tua dari
+    max_age_ms (inference paksa, supaya objek yang mendekat tetap terdeteksi).
+    """
+
+    def __init__(self, threshold=4.0, max_reuse_frames=10, max_age_ms=1000, size=(32, 24)):
+        self.threshold = threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.max_age_ms = max_age_ms
+        self.size = size
+        self._devices = {}  # key -> [signature, result, inferred_at, reused_count]
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.reused = 0
+        self.forced = 0
+
+    def check(self, key, image):
+        """
+        Return (signature, result). result bukan None = pakai hasil lama (tanpa inference);
+        jika None, jalankan inference lalu panggil store(key, signature, hasil).
+        """
+        if self.threshold is None:
+            return None, None
+        signature = frame_signature(image, self.size)
+        now = time.monotonic()
+        with self._lock:
+            self.checked += 1
+            state = self._devices.get(key)
+            if state is None:
+                return signature, None
+            last_signature, result, inferred_at, reused_count = state
+            if frame_difference(signature, last_signature) >= self.threshold:
+                return signature, None
+            if (self.max_reuse_frames is not None and reused_count >= self.max_reuse_frames) or \
+                    (self.max_age_ms is not None and (now - inferred_at) * 1000.0 >= self.max_age_ms):
+                self.forced += 1
+                return signature, None
+            state[3] += 1
+            self.reused += 1
+            return signature, result
+
+    def store(self, key, signature, result):
+        if signature is None:
+            return
+        with self._lock:
+            self._devices[key] = [signature, result, time.monotonic(), 0]
+
+    def forget(self, key):
+        with self._lock:
+            self._devices.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'devices': len(self._devices),
+                'checked': self.checked,
+                'reused': self.reused,
+                'forced': self.forced,
+                'reuse_ratio': round(self.reused / self.checked, 3) if self.checked else None
+            }
@@ -0,0 +1,136 @@
+# frame_sender.py
+# Kirim frame ke client Socket.IO sebagai attachment biner, FPS dan kualitas JPEG per client
+import threading
+import time
+
+
+class ClientState:
+    """
+    Status pengiriman 1 client. fps/quality naik pelan saat ack cepat,
+    turun cepat saat ack lambat atau client masih memproses frame sebelumnya.
+    """
+    __slots__ = ('sid', 'fps', 'quality', 'in_flight_since', 'next_due', 'rtt_ms',
+                 'sent', 'acked', 'skipped', 'timeouts')
+
+    def __init__(self, sid, fps, quality):
+        self.sid = sid
+        self.fps = fps
+        self.quality = quality
+        self.in_flight_since = None
+        self.next_due = 0.0
+        self.rtt_ms = None
+        self.sent = 0
+        self.acked = 0
+        self.skipped = 0
+        self.timeouts = 0
+
+    def snapshot(self):
+        return {'fps': round(self.fps, 2), 'quality': self.quality,
+                'rtt_ms': round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+                'sent': self.sent, 'acked': self.acked, 'skipped': self.skipped, 'timeouts': self.timeouts}
+
+
+class AdaptiveFrameSender:
+    """
+    Per client: maksimal 1 frame belum di-ack (backlog = frame dilewati),
+    interval kirim 1/fps. Ack RTT di bawah target_rtt_ms -> fps/quality naik,
+    di atasnya (atau timeout) -> turun. JPEG di-encode sekali per level
+    kualitas per frame; jika tidak ada client, tidak ada encode sama sekali.
+    """
+
+    def __init__(self, emit_fn, min_fps=1, max_fps=10, min_quality=30, max_quality=80,
+                 start_quality=60, target_rtt_ms=250, ack_timeout_s=5.0):
+        self.emit_fn = emit_fn  # emit_fn(sid, payload, callback)
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.start_quality = start_quality
+        self.target_rtt_ms = target_rtt_ms
+        self.ack_timeout_s = ack_timeout_s
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.encodes = 0
+
+    def add(self, sid):
+        with self._lock:
+            self._clients[sid] = ClientState(sid, self.max_fps / 2.0, self.start_quality)
+
+    def remove(self, sid):
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def _due_clients(self, now):
+        due = []
+        with self._lock:
+            for client in self._clients.values():
+                if client.in_flight_since is not None:
+                    if now - client.in_flight_since < self.ack_timeout_s:
+                        if now >= client.next_due:
+                            client.skipped += 1  # client masih sibuk: frame ini dilewati
+                        continue
+                    client.timeouts += 1
+                    client.in_flight_since = None
+                    self._slow_down(client)
+                if now >= client.next_due:
+                    client.in_flight_since = now
+                    client.next_due = now + 1.0 / client.fps
+                    client.sent += 1
+                    due.append((client.sid, client.quality))
+        return due
+
+    def send(self, encode_fn, payload):
+        """
+        encode_fn(quality) -> bytes JPEG. payload: data lain untuk event (tanpa gambar).
+        Return jumlah client yang dikirimi.
+        """
+        now = time.monotonic()
+        due = self._due_clients(now)
+        if not due:
+            return 0
+        self.frames += 1
+
+        encoded = {}
+        for sid, quality in due:
+            if quality not in encoded:
+                encoded[quality] = encode_fn(quality)
+                self.encodes += 1
+            self.emit_fn(sid, dict(payload, image=encoded[quality]), self._ack_callback(sid, now))
+        return len(due)
+
+    def _ack_callback(self, sid, sent_at):
+        def ack(*args):
+            rtt_ms = (time.monotonic() - sent_at) * 1000.0
+            with self._lock:
+                client = self._clients.get(sid)
+                if client is None or client.in_flight_since != sent_at:
+                    return
+                client.in_flight_since = None
+                client.acked += 1
+                client.rtt_ms = rtt_ms if client.rtt_ms is None else 0.8 * client.rtt_ms + 0.2 * rtt_ms
+                if client.rtt_ms > self.target_rtt_ms:
+                    self._slow_down(client)
+                else:
+                    self._speed_up(client)
+        return ack
+
+    def _slow_down(self, client):
+        client.fps = max(self.min_fps, client.fps * 0.7)
+        client.quality = max(self.min_quality, client.quality - 10)
+
+    def _speed_up(self, client):
+        # Tambah FPS dulu; kualitas naik setelah FPS maksimal
+        if client.fps < self.max_fps:
+            client.fps = min(self.max_fps, client.fps + 0.5)
+        else:
+            client.quality = min(self.max_quality, client.quality + 5)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': {sid: c.snapshot() for sid, c in self._clients.items()},
+                    'frames': self.frames, 'encodes': self.encodes}
@@ -0,0 +1,199 @@
+# image_catalog.py
+# Index gambar terklasifikasi di memori: dibangun sekali saat startup, lalu diperbarui per capture
+import bisect
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+NAME_PATTERN = re.compile(r'classified_(\d{8}_\d{6})(?:_\d+)?\.(?:jpg|jpeg|png)', re.IGNORECASE)
+
+
+def timestamp_from_name(name):
+    """
+    Epoch dari nama file classified_YYYYmmdd_HHMMSS[_seq].jpg, None jika tidak cocok
+    """
+    match = NAME_PATTERN.fullmatch(name)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').timestamp()
+
+
+def _newest_first(keys, lo, hi):
+    for i in range(hi - 1, lo - 1, -1):
+        yield keys[i]
+
+
+class ImageCatalog:
+    """
+    Entry diurutkan berdasarkan (waktu, nama); index per class berisi key yang
+    sama, sehingga filter waktu = bisect dan 1 halaman = O(log n + ukuran halaman).
+    Metadata deteksi disimpan di index_path (JSON lines, append per capture)
+    supaya tetap ada setelah restart; index dipadatkan sekali saat startup.
+    """
+
+    def __init__(self, folder, index_path):
+        self.folder = str(folder)
+        self.index_path = str(index_path)
+        self._lock = threading.Lock()
+        self._keys = []          # (ts, name), urut naik
+        self._entries = {}       # name -> entry
+        self._by_class = {}      # class -> [(ts, name)] urut naik
+        self._load()
+
+    def _load(self):
+        started = time.perf_counter()
+        metadata = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        metadata[entry['filename']] = entry
+                    except (ValueError, KeyError):
+                        continue
+
+        entries = []
+        for item in os.scandir(self.folder):
+            if not item.is_file() or not item.name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                continue
+            entry = metadata.get(item.name)
+            if entry is None:
+                # Gambar lama tanpa metadata: waktu dari nama file (atau mtime), class tidak diketahui
+                ts = timestamp_from_name(item.name) or item.stat().st_mtime
+                entry = self._make_entry(item.name, ts, None)
+            entries.append(entry)
+
+        with self._lock:
+            for entry in sorted(entries, key=lambda e: (e['ts'], e['filename'])):
+                self._insert(entry)
+
+        # Tulis ulang index: hanya file yang masih ada (entry eviction dibuang)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key in self._keys:
+                f.write(json.dumps(self._entries[key[1]]) + '\n')
+        os.replace(tmp_path, self.index_path)
+        print(f"Image catalog: {len(self._keys)} images indexed in {time.perf_counter() - started:.2f}s")
+
+    @staticmethod
+    def _make_entry(filename, ts, detections):
+        counts = None
+        if detections is not None:
+            counts = {}
+            for det in detections:
+                counts[det['class']] = counts.get(det['class'], 0) + 1
+        return {
+            'filename': filename,
+            'ts': ts,
+            'timestamp': datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'),
+            'count': sum(counts.values()) if counts is not None else None,
+            'classes': sorted(counts) if counts is not None else None,
+            'counts': counts
+        }
+
+    def _insert(self, entry):
+        # Dipanggil dengan lock dipegang; capture baru hampir selalu di akhir (append)
+        key = (entry['ts'], entry['filename'])
+        if entry['filename'] in self._entries:
+            self._remove(entry['filename'])
+        self._entries[entry['filename']] = entry
+        self._insort(self._keys, key)
+        for name in entry['classes'] or ():
+            self._insort(self._by_class.setdefault(name, []), key)
+
+    @staticmethod
+    def _insort(keys, key):
+        if not keys or keys[-1] < key:
+            keys.append(key)
+        else:
+            bisect.insort(keys, key)
+
+    @staticmethod
+    def _discard(keys, key):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def _remove(self, filename):
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return
+        key = (entry['ts'], filename)
+        self._discard(self._keys, key)
+        for name in entry['classes'] or ():
+            keys = self._by_class.get(name)
+            if keys is not None:
+                self._discard(keys, key)
+                if not keys:
+                    del self._by_class[name]
+
+    def add(self, filename, detections, ts=None):
+        """
+        Catat gambar baru (dipanggil setelah file ada di disk). detections: list dict 'class'
+        """
+        entry = self._make_entry(filename, ts if ts is not None else time.time(), detections)
+        with self._lock:
+            self._insert(entry)
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        return entry
+
+    def remove(self, filename):
+        """
+        Hapus dari catalog (callback retention ArchiveWriter.on_evict)
+        """
+        with self._lock:
+            self._remove(filename)
+
+    def query(self, start=None, end=None, classes=None, limit=20, offset=0):
+        """
+        Gambar terbaru lebih dulu. start/end: epoch (inklusif); classes: list nama class
+        (cocok jika salah satu terdeteksi). Return (entries, total); total None untuk
+        filter beberapa class (dihitung butuh merge seluruh hasil).
+        """
+        lo_key = (start if start is not None else float('-inf'), '')
+        hi_key = (end if end is not None else float('inf'), '\U0010ffff')
+        with self._lock:
+            if not classes:
+                lists = [self._keys]
+            else:
+                lists = [self._by_class.get(name, []) for name in dict.fromkeys(classes)]
+            ranges = [(keys, bisect.bisect_left(keys, lo_key), bisect.bisect_right(keys, hi_key)) for keys in lists]
+
+            if len(ranges) == 1:
+                keys, lo, hi = ranges[0]
+                total = hi - lo
+                stop = max(lo, hi - offset)
+                page = keys[max(lo, stop - limit):stop][::-1]
+            else:
+                # Merge beberapa index class dari yang terbaru; gambar dengan >1 class cocok hanya sekali
+                total = None
+                merged = heapq.merge(*(_newest_first(keys, lo, hi) for keys, lo, hi in ranges), reverse=True)
+                page, last, skipped = [], None, 0
+                for key in merged:
+                    if key == last:
+                        continue
+                    last = key
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    page.append(key)
+                    if len(page) >= limit:
+                        break
+            return [self._entries[name] for _, name in page], total
+
+    def latest(self, n=10):
+        with self._lock:
+            return [name for _, name in reversed(self._keys[-n:])]
+
+    def class_counts(self):
+        with self._lock:
+            return {name: len(keys) for name, keys in sorted(self._by_class.items())}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
@@ -0,0 +1,364 @@
+# inference_pool.py
+# Mode serving multi-proses: proses front-end (HTTP/Socket.IO) + N proses worker inference.
+# Frame dikirim lewat shared memory (bukan pickle), hasil deteksi (array kecil) lewat queue.
+# Modul ini sengaja tidak meng-import torch: thread CPU worker diatur sebelum torch dimuat.
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class PoolUnavailable(RuntimeError):
+    """
+    Tidak ada worker inference sehat yang bisa dipakai (semua gagal load / sibuk terlalu lama)
+    """
+
+
+def core_shares(workers, cores=None):
+    """
+    Bagi core yang boleh dipakai proses ini menjadi `workers` kelompok yang tidak tumpang tindih
+    (jika worker lebih banyak dari core, beberapa worker berbagi 1 core)
+    """
+    cores = sorted(cores if cores is not None else os.sched_getaffinity(0))
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    per_worker = len(cores) // workers
+    return [cores[i * per_worker:(i + 1) * per_worker] for i in range(workers)]
+
+
+def _worker_main(index, cores, loader_args, shm_name, tasks, results):
+    """
+    Entry point proses worker: pin ke core, batasi thread, load model, lalu layani task
+    """
+    threads = loader_args.pop('num_threads', None) or len(cores)
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    from model_loader import ModelLoader
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        loader = ModelLoader(num_threads=threads, **loader_args).start()
+        loader.join()  # termasuk export artifact jika belum ada (hanya worker pertama, lihat InferencePool)
+        if loader.state == 'ready' and loader.detector.backend != loader.backend and loader._artifact_fresh():
+            # Artifact baru saja di-export: pakai artifact, bukan model eager
+            loader = ModelLoader(num_threads=threads, **loader_args).start()
+            loader.join()
+        if loader.state != 'ready':
+            results.put(('failed', index, loader.error))
+            return
+        detector = loader.detector
+        results.put(('ready', index, {
+            'pid': os.getpid(), 'cores': cores, 'threads': threads, 'backend': detector.backend,
+            'names': detector.names, 'conf': detector.conf, 'iou': detector.iou, 'timings': loader.timings
+        }))
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, size, frames = task
+            try:
+                output = _predict_shared(detector, shm, frames, size)
+                results.put(('result', index, (task_id, [np.asarray(o) for o in output], None)))
+            except Exception as e:
+                traceback.print_exc()
+                results.put(('result', index, (task_id, None, f"{type(e).__name__}: {e}")))
+    finally:
+        shm.close()
+
+
+def _predict_shared(detector, shm, frames, size):
+    # View ke shm.buf hanya hidup selama fungsi ini (buffer ditimpa untuk task berikutnya)
+    images = [frame if isinstance(frame, np.ndarray) else
+              np.ndarray(frame[1], dtype=np.uint8, buffer=shm.buf, offset=frame[0])
+              for frame in frames]
+    return detector.predict(images, size=size)
+
+
+class PoolDetector:
+    """
+    Pengganti Detector di proses front-end: predict() dijalankan worker
+    """
+
+    def __init__(self, pool, info):
+        self.pool = pool
+        self.names = info['names']
+        self.conf = info['conf']
+        self.iou = info['iou']
+        self.backend = f"pool:{info['backend']}"
+
+    def predict(self, images, size=640):
+        return self.pool.predict(images, size)
+
+
+class InferencePool:
+    """
+    Interface sama dengan ModelLoader (state, detector, class_table, wait/join/status),
+    tetapi model ada di `workers` proses terpisah, masing-masing dengan bagian core sendiri.
+
+    Setiap worker punya 1 buffer shared memory; front-end menulis frame batch ke
+    buffer worker yang sedang idle lalu mengirim offset/shape saja. Hasil kembali
+    ke Future pemanggil (thread request atau worker stream yang menunggu).
+    Artifact model di-export sekali oleh worker pertama, worker lain memuat artifact
+    yang sama (read-only). Worker yang mati dijalankan ulang otomatis, kecuali worker
+    yang gagal load model (tidak akan berhasil jika diulang). predict() menunggu worker
+    idle maksimal acquire_timeout_s, lalu raise PoolUnavailable (route menjawab 503);
+    worker yang tidak menjawab dalam result_timeout_s dianggap macet dan dijalankan ulang.
+    """
+
+    def __init__(self, workers, weights, hub_dir, backend='auto', artifacts=None, conf=0.25, iou=0.45,
+                 warmup_size=640, num_threads=None, buffer_bytes=8 * 1024 * 1024, acquire_timeout_s=30.0,
+                 result_timeout_s=30.0):
+        self.workers = max(1, workers)
+        self.loader_args = {'weights': weights, 'hub_dir': hub_dir, 'backend': backend, 'artifacts': artifacts,
+                            'conf': conf, 'iou': iou, 'warmup_size': warmup_size, 'num_threads': num_threads}
+        self.buffer_bytes = buffer_bytes
+        self.acquire_timeout_s = acquire_timeout_s
+        self.result_timeout_s = result_timeout_s
+        self.shares = core_shares(self.workers)
+        self._ctx = mp.get_context('spawn')  # proses bersih: aman untuk torch/OpenMP, tanpa state Flask
+        self._results = self._ctx.Queue()
+        self._buffers = [shared_memory.SharedMemory(create=True, size=buffer_bytes) for _ in range(self.workers)]
+        self._procs = [None] * self.workers
+        self._tasks = [None] * self.workers
+        self._info = [None] * self.workers
+        self._in_flight = {}  # task_id -> (Future, worker)
+        self._idle = set()  # worker siap tanpa task; 1 worker = 1 batch (buffer shm tidak ditimpa)
+        self._idle_cond = threading.Condition()
+        self._load_failed = set()  # worker yang gagal load model: tidak dijalankan ulang
+        self._task_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()  # restart worker dari thread collect atau predict() yang timeout
+        self._ready = threading.Event()
+        self._closed = False
+
+        self.state = 'loading'
+        self.error = None
+        self.detector = None
+        self.class_table = None
+        self.timings = {}
+        self.backend = backend
+        self.tasks_done = 0
+        self.frames_shared = 0
+        self.frames_inline = 0
+        self.restarts = 0
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        # Worker pertama dulu (export artifact jika perlu), worker lain setelah ia siap
+        self._spawn(0)
+        threading.Thread(target=self._collect, name='inference-pool', daemon=True).start()
+        return self
+
+    def _spawn(self, index):
+        self._tasks[index] = self._ctx.Queue()
+        args = (index, self.shares[index], dict(self.loader_args), self._buffers[index].name,
+                self._tasks[index], self._results)
+        proc = self._ctx.Process(target=_worker_main, args=args, name=f'inference-{index}', daemon=True)
+        proc.start()
+        self._procs[index] = proc
+
+    def _collect(self):
+        next_check = time.monotonic() + 1.0
+        while not self._closed:
+            # Cek worker hidup tiap ~1 detik, juga saat hasil terus mengalir
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + 1.0
+            try:
+                kind, index, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            if kind == 'result':
+                task_id, output, error = payload
+                with self._lock:
+                    future, _ = self._in_flight.pop(task_id, (None, None))
+                    self.tasks_done += 1
+                if future is not None:
+                    if error is None:
+                        future.set_result(output)
+                    else:
+                        future.set_exception(RuntimeError(f"Inference worker {index}: {error}"))
+            elif kind == 'ready':
+                self._on_ready(index, payload)
+            elif kind == 'failed':
+                self._on_failed(index, payload)
+
+    def _on_ready(self, index, info):
+        self._info[index] = info
+        print(f"Inference worker {index} ready (pid {info['pid']}, cores {info['cores']}, "
+              f"{info['threads']} threads, {info['backend']})")
+        if self.detector is None:
+            from postprocess import class_name_table
+            self.detector = PoolDetector(self, info)
+            self.class_table = class_name_table(info['names'])
+            self.timings = dict(info['timings'], pool_ready_s=time.perf_counter() - self._started_at)
+            # Artifact sudah ada: worker lain tinggal memuatnya
+            for other in range(1, self.workers):
+                self._spawn(other)
+        self._release(index)
+        if all(self._info):
+            self.state = 'ready'
+            self._ready.set()
+
+    def _on_failed(self, index, error):
+        print(f"Inference worker {index} failed to load model, not restarting: {error}")
+        self._load_failed.add(index)
+        self._info[index] = None
+        self.error = error
+        # Worker pertama gagal = worker lain belum pernah dijalankan
+        if self.detector is None or len(self._load_failed) == self.workers:
+            self.state = 'failed'
+        elif self.state == 'ready':
+            self.state = 'degraded'
+        self._ready.set()
+        with self._idle_cond:
+            self._idle.discard(index)
+            self._idle_cond.notify_all()  # predict() yang menunggu langsung gagal jika pool mati
+
+    def _check_workers(self):
+        for index in range(self.workers):
+            with self._restart_lock:
+                proc = self._procs[index]
+                if proc is None or proc.is_alive() or self._closed or index in self._load_failed:
+                    continue
+                if self._info[index] is None:
+                    # Mati sebelum siap (crash saat load): diulang pun akan gagal lagi
+                    self._on_failed(index, f"exited with code {proc.exitcode} while loading")
+                    continue
+                self._restart(index, f"exited (code {proc.exitcode})")
+
+    def _restart(self, index, reason):
+        """
+        Gagalkan task worker ini lalu jalankan ulang prosesnya (dipanggil dengan _restart_lock)
+        """
+        print(f"Inference worker {index} {reason}, restarting")
+        with self._lock:
+            failed = [(task_id, future) for task_id, (future, worker) in self._in_flight.items() if worker == index]
+            for task_id, _ in failed:
+                del self._in_flight[task_id]
+        for _, future in failed:
+            future.set_exception(RuntimeError(f"Inference worker {index} {reason}"))
+        self._info[index] = None
+        with self._idle_cond:
+            self._idle.discard(index)
+        if self.state == 'ready':
+            self.state = 'degraded'
+        self.restarts += 1
+        self._spawn(index)
+
+    def _kill_hung(self, index, proc, task_id):
+        """
+        Worker tidak menjawab dalam result_timeout_s: hentikan dan jalankan ulang
+        (kecuali sudah dijalankan ulang oleh thread lain)
+        """
+        with self._restart_lock:
+            if self._procs[index] is not proc or self._closed:
+                return
+            with self._lock:
+                self._in_flight.pop(task_id, None)
+            proc.kill()
+            proc.join(5)
+            self._restart(index, f"did not answer within {self.result_timeout_s:g}s")
+
+    def _write_frames(self, index, images):
+        """
+        Salin frame ke shared memory worker; return deskripsi (offset, shape).
+        Frame yang tidak muat dikirim langsung (pickle) sebagai cadangan.
+        """
+        buf = self._buffers[index].buf
+        frames, offset, shared = [], 0, 0
+        for image in images:
+            image = np.asarray(image)
+            if image.dtype == np.uint8 and offset + image.nbytes <= self.buffer_bytes:
+                np.copyto(np.ndarray(image.shape, dtype=np.uint8, buffer=buf, offset=offset), image)
+                frames.append((offset, image.shape))
+                offset += image.nbytes
+                shared += 1
+            else:
+                frames.append(np.ascontiguousarray(image))
+        with self._lock:
+            self.frames_shared += shared
+            self.frames_inline += len(frames) - shared
+        return frames
+
+    def predict(self, images, size=640):
+        """
+        Jalankan 1 batch di worker yang idle (blocking sampai hasil kembali).
+        PoolUnavailable jika tidak ada worker idle dalam acquire_timeout_s, pool gagal,
+        atau worker tidak menjawab dalam result_timeout_s (worker dijalankan ulang).
+        """
+        with self._idle_cond:
+            self._idle_cond.wait_for(lambda: self._idle or self.state == 'failed', self.acquire_timeout_s)
+            if not self._idle:
+                raise PoolUnavailable(f"No inference worker available (pool {self.state})")
+            index = self._idle.pop()
+        try:
+            if self._info[index] is None:
+                raise RuntimeError(f"Inference worker {index} is not ready")
+            proc = self._procs[index]
+            frames = self._write_frames(index, images)
+            future = Future()
+            task_id = next(self._task_ids)
+            with self._lock:
+                self._in_flight[task_id] = (future, index)
+            self._tasks[index].put((task_id, size, frames))
+            try:
+                return future.result(timeout=self.result_timeout_s)
+            except FutureTimeout:
+                self._kill_hung(index, proc, task_id)
+                raise PoolUnavailable(f"Inference worker {index} did not answer within {self.result_timeout_s:g}s")
+        finally:
+            self._release(index)
+
+    def _release(self, index):
+        with self._idle_cond:
+            if self._info[index] is not None:
+                self._idle.add(index)
+                self._idle_cond.notify()
+
+    def wait(self, timeout=None):
+        self._ready.wait(timeout)
+        return self.state == 'ready'
+
+    def join(self, timeout=None):
+        # Export artifact dilakukan worker sebelum melapor siap
+        self.wait(timeout)
+
+    def close(self):
+        self._closed = True
+        for tasks in self._tasks:
+            if tasks is not None:
+                tasks.put(None)
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(5)
+        for shm in self._buffers:
+            shm.close()
+            shm.unlink()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'backend': self.detector.backend if self.detector else None,
+            'configured_backend': self.backend,
+            'error': self.error,
+            'timings': self.timings,
+            'workers': [info and {k: info[k] for k in ('pid', 'cores', 'threads', 'backend')} for info in self._info],
+            'tasks_done': self.tasks_done,
+            'frames_shared': self.frames_shared,
+            'frames_inline': self.frames_inline,
+            'restarts': self.restarts,
+            'load_failed': sorted(self._load_failed)
+        }
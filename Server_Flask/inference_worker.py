@@ -0,0 +1,141 @@
+# inference_worker.py
+# Worker inference di background + antrian frame "latest wins"
+import collections
+import itertools
+import threading
+import traceback
+
+
+class LatestFrameQueue:
+    """
+    Antrian frame terbatas (bounded). Jika penuh, frame paling lama dibuang.
+    get() selalu mengembalikan frame terbaru; frame yang lebih lama dibuang
+    karena sudah basi untuk kamera yang bergerak.
+    """
+
+    def __init__(self, maxsize=2):
+        self.maxsize = max(1, maxsize)
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def task_done(self, item):
+        pass  # Tidak ada state per device (antarmuka sama dengan PriorityFrameQueue)
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class PriorityFrameQueue:
+    """
+    Antrian frame per device ("latest wins" per device, bukan antar device).
+    get() mengambil frame terbaru dari device dengan priority_fn(device) tertinggi;
+    untuk prioritas yang sama, device yang frame-nya paling lama menunggu lebih dulu.
+    Satu device hanya diproses 1 worker sekaligus: device yang frame-nya sedang
+    diproses dilewati sampai task_done(item) dipanggil (hasil dan tracker tetap urut).
+    """
+
+    def __init__(self, maxsize=2, priority_fn=None, key='device'):
+        self.maxsize = max(1, maxsize)
+        self.priority_fn = priority_fn
+        self.key = key
+        self._slots = {}  # device -> deque [(urutan masuk, item)]
+        self._busy = set()  # device yang sedang diproses worker
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.prioritized = 0
+
+    def put(self, item):
+        with self._cond:
+            slot = self._slots.setdefault(item.get(self.key), collections.deque())
+            while len(slot) >= self.maxsize:
+                slot.popleft()
+                self.dropped += 1
+            slot.append((next(self._order), item))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            ready = lambda: [device for device in self._slots if device not in self._busy]
+            if not self._cond.wait_for(ready, timeout):
+                return None
+            ranked = [((self.priority_fn(device) if self.priority_fn else 0), -self._slots[device][0][0], device)
+                      for device in ready()]
+            best = max(ranked)
+            if best[0] > 0 and len(ranked) > 1 and best[1] != max(r[1] for r in ranked):
+                self.prioritized += 1  # device kritis melewati device yang menunggu lebih lama
+            slot = self._slots.pop(best[2])
+            self.dropped += len(slot) - 1
+            self._busy.add(best[2])
+            return slot[-1][1]
+
+    def task_done(self, item):
+        """
+        Frame dari get() selesai diproses: device boleh diambil worker lain lagi
+        """
+        with self._cond:
+            self._busy.discard(item.get(self.key))
+            self._cond.notify()
+
+    def qsize(self):
+        with self._cond:
+            return sum(len(slot) for slot in self._slots.values())
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Thread yang mengambil frame dari antrian dan memanggil handler(item)
+    """
+
+    def __init__(self, frame_queue, handler, name='inference-worker'):
+        super().__init__(name=name, daemon=True)
+        self.frame_queue = frame_queue
+        self.handler = handler
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            item = self.frame_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                self.handler(item)
+            except Exception as e:
+                print(f"Worker error: {e}")
+                traceback.print_exc()
+            finally:
+                self.frame_queue.task_done(item)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_workers(frame_queue, handler, count=1):
+    """
+    Jalankan sejumlah worker inference (pool kecil)
+    """
+    workers = []
+    for i in range(max(1, count)):
+        worker = InferenceWorker(frame_queue, handler, name=f'inference-worker-{i}')
+        worker.start()
+        workers.append(worker)
+    return workers
@@ -0,0 +1,90 @@
+# ingest.py
+# Decode JPEG sekali saja (OpenCV), dengan DCT scaling untuk frame besar
+import cv2
+import numpy as np
+
+# Marker SOF (Start Of Frame) yang menyimpan ukuran gambar
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Flag imdecode untuk reduced-size DCT decode (1/2, 1/4, 1/8)
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+class Frame:
+    """
+    Hasil ingest 1 frame. Semua stage berikutnya memakai buffer yang sama.
+      data  : bytes JPEG asli (untuk arsip, tanpa re-encode)
+      image : array BGR hasil decode (dipakai OpenCV: annotate, imencode)
+      scale : faktor koordinat frame -> resolusi asli kamera
+    """
+    __slots__ = ('data', 'image', 'scale', 'source_size')
+
+    def __init__(self, data, image, scale=1.0, source_size=None):
+        self.data = data
+        self.image = image
+        self.scale = scale
+        self.source_size = source_size or (image.shape[1], image.shape[0])
+
+    @property
+    def rgb(self):
+        # View RGB tanpa copy untuk input model
+        return self.image[..., ::-1]
+
+
+def jpeg_size(data):
+    """
+    Baca (width, height) dari header JPEG tanpa decode. None jika tidak ketemu.
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    n = len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0xD8 or marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker == 0xD9 or marker == 0xDA:  # EOI / SOS: data gambar mulai
+            return None
+        if marker in _SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + ((data[i + 2] << 8) | data[i + 3])
+    return None
+
+
+def decode_frame(data, max_width=None):
+    """
+    Decode JPEG langsung ke BGR. Jika lebar sumber > max_width, pakai
+    reduced DCT decode dengan faktor terbesar yang lebarnya tetap >= max_width.
+    """
+    flag = cv2.IMREAD_COLOR
+    size = jpeg_size(data)
+    if max_width and size:
+        for factor, reduced_flag in _REDUCED_FLAGS:
+            if size[0] // factor >= max_width:
+                flag = reduced_flag
+                break
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        raise ValueError("Invalid image data")
+
+    if size is None:
+        return Frame(data, image)
+    # max() supaya tetap benar jika orientasi EXIF memutar gambar
+    scale = max(size) / max(image.shape[:2])
+    return Frame(data, image, scale, size)
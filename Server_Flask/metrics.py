@@ -0,0 +1,239 @@
+# metrics.py
+# Statistik ringan (histogram) untuk tuning server
+import bisect
+import collections
+import contextlib
+import threading
+import time
+
+
+class Histogram:
+    """
+    Histogram dengan bucket tetap + jendela sampel terakhir untuk persentil
+    """
+
+    def __init__(self, name, buckets, window=1000):
+        self.name = name
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # bucket terakhir = +Inf
+        self._recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._recent.append(value)
+            self.count += 1
+            self.total += value
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._recent.clear()
+            self.count = 0
+            self.total = 0.0
+
+    def cumulative(self):
+        """
+        (bucket, jumlah kumulatif) termasuk +Inf, plus count dan total (format Prometheus)
+        """
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.total
+        running, pairs = 0, []
+        for bound, n in zip(self.buckets + [float('inf')], counts):
+            running += n
+            pairs.append((bound, running))
+        return pairs, count, total
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            counts = list(self._counts)
+            count, total = self.count, self.total
+
+        def percentile(p):
+            if not recent:
+                return None
+            return recent[min(len(recent) - 1, int(p / 100.0 * len(recent)))]
+
+        labels = [str(b) for b in self.buckets] + ['+Inf']
+        return {
+            'count': count,
+            'mean': total / count if count else None,
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'buckets': dict(zip(labels, counts))
+        }
+
+
+# Bucket latency (ms) untuk stage pipeline
+STAGE_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class StageTimers:
+    """
+    Histogram latency (ms) per stage pipeline: decode, preprocess, letterbox,
+    inference, nms, postprocess, annotate, encode, emit. Histogram dibuat saat
+    stage pertama kali dicatat.
+    """
+
+    def __init__(self, buckets=STAGE_BUCKETS_MS, window=1000):
+        self.buckets = buckets
+        self.window = window
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        hist = self._stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._stages.setdefault(stage, Histogram(stage, self.buckets, self.window))
+        return hist
+
+    def observe(self, stage, ms):
+        self.histogram(stage).observe(ms)
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(stage).observe((time.perf_counter() - started) * 1000.0)
+
+    def reset(self):
+        for hist in list(self._stages.values()):
+            hist.reset()
+
+    def histograms(self):
+        return dict(self._stages)
+
+    def snapshot(self):
+        return {stage: hist.snapshot() for stage, hist in list(self._stages.items())}
+
+
+# Dipakai bersama oleh detector dan kedua server (lihat /stats dan benchmark.py)
+stage_timers = StageTimers()
+
+
+class Counter:
+    """
+    Counter monotonic (thread-safe). fn opsional untuk counter yang sudah
+    dihitung di tempat lain (mis. LatestFrameQueue.dropped).
+    """
+
+    def __init__(self, name, help='', fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def get(self):
+        return self.fn() if self.fn else self.value
+
+
+class Gauge:
+    """
+    Nilai sesaat; diambil dari fn() saat /metrics dibaca (tanpa biaya di hot path)
+    """
+
+    def __init__(self, name, help='', fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.fn() if self.fn else self.value
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Kumpulan counter, gauge, dan histogram yang dirender sebagai
+    Prometheus text exposition format (endpoint /metrics)
+    """
+
+    def __init__(self, prefix='smartcane'):
+        self.prefix = prefix
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = []  # (name, help, histogram, scale)
+        self._lock = threading.Lock()
+
+    def counter(self, name, help='', fn=None):
+        with self._lock:
+            return self._counters.setdefault(name, Counter(name, help, fn))
+
+    def gauge(self, name, help='', fn=None):
+        with self._lock:
+            return self._gauges.setdefault(name, Gauge(name, help, fn))
+
+    def histogram(self, name, help, histogram, scale=1.0):
+        """
+        Daftarkan Histogram yang sudah ada. scale mengubah satuan, mis. 0.001 untuk ms -> detik
+        """
+        with self._lock:
+            self._histograms.append((name, help, histogram, scale))
+
+    def _render_histogram(self, lines, name, histogram, scale, labels=''):
+        pairs, count, total = histogram.cumulative()
+        sep = ',' if labels else ''
+        for bound, running in pairs:
+            le = _format_value(bound * scale if bound != float('inf') else bound)
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {running}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {_format_value(total * scale)}')
+        lines.append(f'{name}_count{suffix} {count}')
+
+    def render(self, stages=None):
+        """
+        stages: StageTimers opsional, dirender sebagai 1 histogram dengan label stage
+        """
+        lines = []
+        for counter in list(self._counters.values()):
+            name = f'{self.prefix}_{counter.name}_total'
+            lines += [f'# HELP {name} {counter.help}', f'# TYPE {name} counter', f'{name} {counter.get()}']
+        for gauge in list(self._gauges.values()):
+            name = f'{self.prefix}_{gauge.name}'
+            try:
+                value = gauge.get()
+            except Exception:
+                continue
+            lines += [f'# HELP {name} {gauge.help}', f'# TYPE {name} gauge', f'{name} {_format_value(value)}']
+        for hist_name, help, histogram, scale in list(self._histograms):
+            name = f'{self.prefix}_{hist_name}'
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} histogram']
+            self._render_histogram(lines, name, histogram, scale)
+        if stages is not None:
+            name = f'{self.prefix}_stage_duration_seconds'
+            lines += [f'# HELP {name} Latency per stage pipeline', f'# TYPE {name} histogram']
+            for stage, histogram in sorted(stages.histograms().items()):
+                self._render_histogram(lines, name, histogram, 0.001, f'stage="{stage}"')
+        return '\n'.join(lines) + '\n'
+
+
+# Content-Type Prometheus text format
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Registry per proses server (lihat /metrics)
+registry = MetricsRegistry()
@@ -0,0 +1,276 @@
+# model_loader.py
+# Load model YOLOv5 di background: cache offline, artifact backend (TorchScript/ONNX/OpenVINO), warm-up
+import contextlib
+import copy
+import json
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from detector import EagerDetector, TorchScriptDetector, OnnxDetector, OpenVinoDetector
+from config import (MODEL_TORCHSCRIPT, MODEL_ONNX, MODEL_ONNX_INT8, MODEL_OPENVINO,
+                    QUANT_CALIBRATION_DIR, QUANT_CALIBRATION_IMAGES)
+from postprocess import class_name_table
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HUB_REPO = 'ultralytics/yolov5'
+
+
+def resolve_path(path):
+    """
+    Path relatif dianggap relatif terhadap folder Server_Flask
+    """
+    if path is None:
+        return None
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
+@contextlib.contextmanager
+def full_checkpoint_load():
+    """
+    torch>=2.6 default weights_only=True; checkpoint YOLOv5 butuh unpickle penuh
+    """
+    import torch
+    original = torch.load
+
+    def patched(*args, **kwargs):
+        kwargs.setdefault('weights_only', False)
+        return original(*args, **kwargs)
+
+    torch.load = patched
+    try:
+        yield
+    finally:
+        torch.load = original
+
+
+def load_hub_model(weights, hub_dir):
+    """
+    Load model eager. Urutan: cache lokal torch.hub -> download sekali ke cache -> paket yolov5
+    """
+    import torch
+    torch.hub.set_dir(hub_dir)
+    local_repo = os.path.join(hub_dir, 'ultralytics_yolov5_master')
+
+    with full_checkpoint_load():
+        try:
+            if os.path.isdir(local_repo):
+                print(f"Loading YOLOv5 from local hub cache: {local_repo}")
+                return torch.hub.load(local_repo, 'custom', path=weights, source='local')
+            print("Local hub cache not found, downloading YOLOv5 code once...")
+            return torch.hub.load(HUB_REPO, 'custom', path=weights,
+                                  force_reload=False, skip_validation=True, trust_repo=True)
+        except Exception as e:
+            print(f"torch.hub load failed: {e}")
+            print("Trying yolov5 package...")
+            import yolov5
+            return yolov5.load(weights)
+
+
+def _export_module(model):
+    """
+    Salinan DetectionModel (float, eval) dengan Detect layer siap export shape dinamis
+    """
+    inner = model.model.model if hasattr(model.model, 'model') else model.model
+    inner = copy.deepcopy(inner).float().eval()
+    detect = inner.model[-1]
+    detect.inplace = False
+    detect.export = True
+    detect.dynamic = True  # grid dihitung dari shape input -> bisa dipakai untuk ukuran apa saja
+    meta = {'stride': int(max(inner.stride)), 'names': {int(k): v for k, v in dict(model.names).items()}}
+    return inner, meta
+
+
+def export_torchscript(model, path):
+    """
+    Simpan DetectionModel sebagai TorchScript (shape dinamis) + metadata class
+    """
+    import torch
+    inner, meta = _export_module(model)
+    with torch.no_grad():
+        traced = torch.jit.trace(inner, torch.zeros(1, 3, 640, 640), strict=False)
+    tmp_path = path + '.tmp'
+    traced.save(tmp_path, _extra_files={'config.txt': json.dumps(meta)})
+    os.replace(tmp_path, path)
+
+
+def export_onnx(model, path, opset=17):
+    """
+    Export ke ONNX (batch, tinggi, lebar dinamis) + metadata class di model
+    """
+    import onnx
+    import torch
+    inner, meta = _export_module(model)
+    tmp_path = path + '.tmp'
+    with torch.no_grad():
+        torch.onnx.export(inner, torch.zeros(1, 3, 640, 640), tmp_path, opset_version=opset,
+                          input_names=['images'], output_names=['output0'], dynamo=False,
+                          dynamic_axes={'images': {0: 'batch', 2: 'height', 3: 'width'},
+                                        'output0': {0: 'batch', 1: 'anchors'}})
+    onnx_model = onnx.load(tmp_path)
+    for key, value in (('stride', str(meta['stride'])), ('names', json.dumps(meta['names']))):
+        onnx_model.metadata_props.add(key=key, value=value)
+    onnx.save(onnx_model, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def export_openvino(model, path, onnx_path=None):
+    """
+    Export ke OpenVINO IR (.xml/.bin) lewat ONNX; metadata di file .json sebelahnya
+    """
+    import openvino as ov
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    onnx_path = onnx_path or os.path.splitext(path)[0] + '.onnx'
+    if not os.path.exists(onnx_path):
+        export_onnx(model, onnx_path)
+    ov.save_model(ov.convert_model(onnx_path), path)
+    _, meta = _export_module(model)
+    with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+        json.dump(meta, f)
+
+
+def export_onnx_int8(model, path, onnx_path=None):
+    """
+    Export ke ONNX INT8 (kuantisasi statis, kalibrasi dari QUANT_CALIBRATION_DIR)
+    """
+    from quantize import quantize_onnx
+    onnx_path = onnx_path or resolve_path(MODEL_ONNX)
+    if not os.path.exists(onnx_path):
+        export_onnx(model, onnx_path)
+    quantize_onnx(onnx_path, path, resolve_path(QUANT_CALIBRATION_DIR), QUANT_CALIBRATION_IMAGES)
+
+
+# Path artifact per backend (dari config.py)
+MODEL_ARTIFACTS = {'torchscript': MODEL_TORCHSCRIPT, 'onnx': MODEL_ONNX, 'onnx-int8': MODEL_ONNX_INT8,
+                   'openvino': MODEL_OPENVINO}
+
+# Backend yang butuh artifact hasil export: (class detector, fungsi export)
+ARTIFACT_BACKENDS = {
+    'torchscript': (TorchScriptDetector, export_torchscript),
+    'onnx': (OnnxDetector, export_onnx),
+    'onnx-int8': (OnnxDetector, export_onnx_int8),
+    'openvino': (OpenVinoDetector, export_openvino),
+}
+
+
+class ModelLoader:
+    """
+    Load detector di thread background. state: loading -> ready / failed.
+    Server bisa langsung menjawab request (mis. /health) selama model dimuat.
+
+    backend: 'auto' (TorchScript jika artifact ada), 'torch', 'torchscript', 'onnx', 'onnx-int8', 'openvino'.
+    Jika artifact backend belum ada, server memakai model eager dulu lalu
+    meng-export artifact di background untuk restart berikutnya.
+    """
+
+    def __init__(self, weights, hub_dir, backend='auto', artifacts=None, conf=0.25, iou=0.45,
+                 warmup_size=640, num_threads=None):
+        self.weights = resolve_path(weights)
+        self.hub_dir = resolve_path(hub_dir)
+        self.backend = 'torchscript' if backend == 'auto' else backend
+        self.artifacts = {name: resolve_path(path) for name, path in (artifacts or {}).items() if path}
+        self.conf = conf
+        self.iou = iou
+        self.warmup_size = warmup_size
+        self.num_threads = num_threads
+
+        if self.backend != 'torch' and self.backend not in ARTIFACT_BACKENDS:
+            raise ValueError(f"Unknown model backend: {backend}")
+
+        self.state = 'loading'
+        self.error = None
+        self.detector = None
+        self.class_table = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """
+        Tunggu sampai model ready/failed. Return True jika ready.
+        """
+        self._ready.wait(timeout)
+        return self.state == 'ready'
+
+    def join(self, timeout=None):
+        """
+        Tunggu thread loader selesai, termasuk export artifact di background
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _artifact_path(self):
+        return self.artifacts.get(self.backend)
+
+    def _artifact_fresh(self):
+        path = self._artifact_path()
+        return (path is not None and os.path.exists(path)
+                and os.path.getmtime(path) >= os.path.getmtime(self.weights))
+
+    def _load_detector(self):
+        """
+        Return (detector, eager_model). eager_model != None berarti artifact perlu di-export.
+        """
+        if self.backend in ARTIFACT_BACKENDS and self._artifact_fresh():
+            detector_cls = ARTIFACT_BACKENDS[self.backend][0]
+            print(f"Loading {self.backend} artifact: {self._artifact_path()}")
+            return detector_cls(self._artifact_path(), self.conf, self.iou, self.num_threads), None
+
+        print(f"Loading model from: {self.weights}")
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        eager_model = load_hub_model(self.weights, self.hub_dir)
+        return EagerDetector(eager_model, self.conf, self.iou), eager_model
+
+    def _run(self):
+        started = time.perf_counter()
+        eager_model = None
+        try:
+            if not os.path.exists(self.weights):
+                raise FileNotFoundError(f"Model file not found: {self.weights}")
+            detector, eager_model = self._load_detector()
+            self.timings['load_s'] = time.perf_counter() - started
+
+            # Warm-up: inisialisasi lazy (alokasi, kernel) dibayar di sini, bukan oleh frame pertama
+            warmup_started = time.perf_counter()
+            detector.predict([np.zeros((480, 640, 3), dtype=np.uint8)], size=self.warmup_size)
+            self.timings['warmup_s'] = time.perf_counter() - warmup_started
+
+            self.detector = detector
+            self.class_table = class_name_table(detector.names)
+            self.state = 'ready'
+            print(f"YOLOv5 model ready ({detector.backend}) in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"Error loading YOLOv5 model: {e}")
+            traceback.print_exc()
+        finally:
+            self._ready.set()
+
+        # Buat artifact untuk restart berikutnya (server sudah melayani request)
+        path = self._artifact_path()
+        if eager_model is not None and self.backend in ARTIFACT_BACKENDS and path:
+            try:
+                ARTIFACT_BACKENDS[self.backend][1](eager_model, path)
+                print(f"{self.backend} artifact saved: {path}")
+            except Exception as e:
+                print(f"{self.backend} export failed: {e}")
+
+    def status(self):
+        return {
+            'state': self.state,
+            'backend': self.detector.backend if self.detector else None,
+            'configured_backend': self.backend,
+            'error': self.error,
+            'timings': self.timings
+        }
@@ -0,0 +1,67 @@
+# postprocess.py
+# Post-processing hasil YOLOv5 secara vektor (tanpa pandas / iterrows)
+import numpy as np
+
+
+def class_name_table(names):
+    """
+    Ubah dict/list nama class jadi array untuk lookup vektor (index = class id)
+    """
+    if isinstance(names, dict):
+        size = max(names) + 1 if names else 0
+        table = np.array([f'class_{i}' for i in range(size)], dtype=object)
+        for class_id, name in names.items():
+            table[class_id] = name
+        return table
+    return np.array(list(names), dtype=object)
+
+
+def filter_predictions(pred, conf_threshold=0.0, scale=1.0):
+    """
+    Filter confidence dan rescale koordinat seluruh prediksi sekaligus.
+    pred: tensor/array (N, 6) -> x1, y1, x2, y2, confidence, class_id
+    Return array float64 (M, 6) dengan format yang sama.
+    """
+    if hasattr(pred, 'cpu'):
+        pred = pred.cpu().numpy()
+    dets = np.asarray(pred, dtype=np.float64).reshape(-1, 6)
+    dets = dets[dets[:, 4] > conf_threshold]
+    if scale != 1.0:
+        dets[:, :4] *= scale
+    return dets
+
+
+def lookup_class_names(class_ids, table):
+    """
+    Map class id -> nama class dalam satu langkah
+    """
+    class_ids = np.asarray(class_ids, dtype=np.int64)
+    if len(table) == 0:
+        return np.array([f'class_{i}' for i in class_ids], dtype=object)
+    names = table[np.clip(class_ids, 0, len(table) - 1)]
+    unknown = class_ids >= len(table)
+    if unknown.any():
+        names[unknown] = [f'class_{i}' for i in class_ids[unknown]]
+    return names
+
+
+def detections_to_list(dets, table, bbox_format='list', confidence_digits=None):
+    """
+    Bangun payload JSON dari array deteksi (tanpa loop per elemen tensor)
+    bbox_format: 'list' -> [x1, y1, x2, y2] integer, 'dict' -> {x1, y1, x2, y2} float
+    """
+    if len(dets) == 0:
+        return []
+    names = lookup_class_names(dets[:, 5], table).tolist()
+    confidences = dets[:, 4]
+    if confidence_digits is not None:
+        confidences = np.round(confidences, confidence_digits)
+    confidences = confidences.tolist()
+
+    if bbox_format == 'dict':
+        boxes = [dict(zip(('x1', 'y1', 'x2', 'y2'), box)) for box in dets[:, :4].tolist()]
+    else:
+        boxes = dets[:, :4].astype(np.int64).tolist()
+
+    return [{'class': name, 'confidence': conf, 'bbox': box}
+            for name, conf, box in zip(names, confidences, boxes)]
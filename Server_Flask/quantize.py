@@ -0,0 +1,98 @@
+# quantize.py
+# Kuantisasi INT8 statis (ONNX Runtime) dengan kalibrasi dari gambar arsip (uploads/)
+import glob
+import json
+import os
+
+import cv2
+import numpy as np
+
+from detector import letterbox
+
+
+class CalibrationReader:
+    """
+    CalibrationDataReader ONNX Runtime: frame arsip yang sudah di-letterbox
+    dengan pre-processing yang sama seperti inference (RGB, float 0-1, BCHW)
+    """
+
+    def __init__(self, input_name, image_paths, size=640):
+        self.input_name = input_name
+        self.image_paths = list(image_paths)
+        self.size = size
+        self._index = 0
+
+    def get_next(self):
+        while self._index < len(self.image_paths):
+            path = self.image_paths[self._index]
+            self._index += 1
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            # Shape tetap (size x size): kalibrator histogram butuh shape yang sama untuk semua frame
+            batch = letterbox(image[..., ::-1], (self.size, self.size))[None].transpose((0, 3, 1, 2))
+            return {self.input_name: np.ascontiguousarray(batch, dtype=np.float32) / 255.0}
+        return None
+
+    def rewind(self):
+        self._index = 0
+
+
+def calibration_images(folder, limit=64):
+    """
+    Ambil maksimal `limit` JPEG tersebar merata dari folder (urut nama)
+    """
+    paths = sorted(glob.glob(os.path.join(folder, '*.jpg')) + glob.glob(os.path.join(folder, '*.jpeg')))
+    if len(paths) > limit:
+        paths = [paths[i] for i in np.linspace(0, len(paths) - 1, limit).astype(int)]
+    return paths
+
+
+def _float_nodes(model):
+    """
+    Node yang tetap float: layer pertama (input gambar mentah) dan Detect layer
+    (decode grid/anchor) selain Conv -- paling sensitif terhadap error kuantisasi
+    """
+    layers = sorted({node.name.split('/')[1] for node in model.graph.node
+                     if node.name.startswith('/model.')}, key=lambda p: int(p.split('.')[1]))
+    first, head = f'/{layers[0]}/', f'/{layers[-1]}/'
+    return [node.name for node in model.graph.node
+            if node.name.startswith(first) or (node.name.startswith(head) and node.op_type != 'Conv')]
+
+
+def quantize_onnx(fp32_path, int8_path, calibration_dir, limit=64, size=640):
+    """
+    Model ONNX FP32 -> INT8 (QDQ, bobot per-channel). Metadata class/stride ikut disalin.
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    model = onnx.load(fp32_path)
+    meta = {prop.key: prop.value for prop in model.metadata_props}
+    paths = calibration_images(calibration_dir, limit)
+    if not paths:
+        raise FileNotFoundError(f"No calibration images in {calibration_dir}")
+
+    prep_path = int8_path + '.prep'
+    tmp_path = int8_path + '.tmp'
+    try:
+        quant_pre_process(fp32_path, prep_path, skip_symbolic_shape=True)
+        reader = CalibrationReader(model.graph.input[0].name, paths, size)
+        quantize_static(prep_path, tmp_path, reader, quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        per_channel=True, calibrate_method=CalibrationMethod.MinMax,
+                        nodes_to_exclude=_float_nodes(model))
+        quantized = onnx.load(tmp_path)
+        del quantized.metadata_props[:]
+        for key, value in meta.items():
+            quantized.metadata_props.add(key=key, value=value)
+        quantized.metadata_props.add(key='quantization', value=json.dumps(
+            {'type': 'int8-static', 'calibration_images': len(paths)}))
+        onnx.save(quantized, tmp_path)
+        os.replace(tmp_path, int8_path)
+    finally:
+        for path in (prep_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return len(paths)
@@ -0,0 +1,94 @@
+# resolution_controller.py
+# Latency budget: turunkan ukuran inference saat server tertinggal, naikkan lagi saat ada ruang
+import collections
+import threading
+import time
+
+import numpy as np
+
+
+class ResolutionController:
+    """
+    Mengamati latency inference (antrian batch + forward pass) dan kedalaman
+    antrian. Jika p90 jendela terakhir melebihi budget_ms atau antrian rata-rata
+    melebihi queue_limit, ukuran turun 1 level (640 -> 512 -> 416 -> 320).
+    Ukuran naik 1 level jika perkiraan latency di ukuran lebih besar (skala luas
+    gambar) masih di bawah budget dengan margin dan antrian kosong.
+    Jendela dikosongkan setiap perubahan supaya keputusan berikutnya memakai
+    latency dari ukuran yang baru.
+    """
+
+    def __init__(self, sizes=(640, 512, 416, 320), budget_ms=150, window=12, queue_limit=4,
+                 queue_depth_fn=None, min_interval_s=2.0, up_margin=0.8, history=20):
+        self.sizes = sorted(sizes, reverse=True)
+        self.budget_ms = budget_ms
+        self.window = max(1, window)
+        self.queue_limit = queue_limit
+        self.queue_depth_fn = queue_depth_fn
+        self.min_interval_s = min_interval_s
+        self.up_margin = up_margin
+        self.level = 0
+        self._latencies = collections.deque(maxlen=self.window)
+        self._depths = collections.deque(maxlen=self.window)
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.changes = 0
+        self.history = collections.deque(maxlen=history)
+
+    @property
+    def size(self):
+        return self.sizes[self.level]
+
+    def observe(self, latency_ms):
+        """
+        Catat latency 1 inference; return ukuran inference (mungkin sudah berubah)
+        """
+        if self.budget_ms is None:
+            return self.size
+        depth = self.queue_depth_fn() if self.queue_depth_fn else 0
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self._depths.append(depth)
+            if len(self._latencies) < self.window or time.monotonic() - self._changed_at < self.min_interval_s:
+                return self.size
+
+            p90 = float(np.percentile(self._latencies, 90))
+            queue = float(np.mean(self._depths))
+            if self.level < len(self.sizes) - 1 and (p90 > self.budget_ms or queue > self.queue_limit):
+                reason = 'latency' if p90 > self.budget_ms else 'queue'
+                self._change(1, reason, p90, queue)
+            elif self.level > 0 and queue < 1:
+                # Biaya inference ~ luas gambar: perkirakan p90 di ukuran yang lebih besar
+                predicted = p90 * (self.sizes[self.level - 1] / self.size) ** 2
+                if predicted < self.budget_ms * self.up_margin:
+                    self._change(-1, 'headroom', p90, queue)
+            return self.size
+
+    def _change(self, step, reason, p90, queue):
+        # Dipanggil dengan lock dipegang
+        old = self.size
+        self.level += step
+        self.changes += 1
+        self._latencies.clear()
+        self._depths.clear()
+        self._changed_at = time.monotonic()
+        self.history.append({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'from': old,
+            'to': self.size,
+            'reason': reason,
+            'p90_ms': round(p90, 1),
+            'queue_depth': round(queue, 2)
+        })
+        print(f"Inference size {old} -> {self.size} ({reason}, p90={p90:.0f} ms, queue={queue:.1f})")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'sizes': self.sizes,
+                'budget_ms': self.budget_ms,
+                'window_p90_ms': round(float(np.percentile(self._latencies, 90)), 1) if self._latencies else None,
+                'changes': self.changes,
+                'history': list(self.history)
+            }
@@ -0,0 +1,59 @@
+# serve.py
+# Entry point produksi: 1 proses front-end (HTTP/Socket.IO) + N proses worker inference
+#   python serve.py --workers 2
+# Front-end dijalankan gunicorn (worker gthread, 1 proses: Socket.IO butuh state di 1 proses).
+# Tanpa gunicorn terpasang, server Werkzeug dipakai dengan peringatan (hanya untuk pengembangan).
+# Top-level sengaja ringan: proses worker (spawn) meng-import ulang modul ini sebagai __mp_main__.
+import argparse
+import importlib.util
+
+import config
+
+
+def run_gunicorn(host, port, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class SmartCaneApplication(BaseApplication):
+        def load_config(self):
+            # 1 proses gunicorn; paralelisme inference ada di proses worker InferencePool
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', 1)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', threads)
+            # Long-poll /get_detection dan MJPEG/SSE menahan koneksi lebih lama dari default 30 detik
+            self.cfg.set('timeout', 0)
+
+        def load(self):
+            # Di-import di proses worker gunicorn (setelah fork), bukan di master
+            import server_socketio
+            return server_socketio.app
+
+    SmartCaneApplication().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jalankan Smart Cane server dengan worker inference multi-proses')
+    parser.add_argument('--workers', type=int, default=config.SERVING_WORKERS or 2,
+                        help='jumlah proses worker inference (0 = model di proses server)')
+    parser.add_argument('--threads', type=int, default=config.SERVING_THREADS,
+                        help='thread HTTP gunicorn (1 per koneksi aktif)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT)
+    args = parser.parse_args()
+
+    # Harus di-set sebelum server_socketio di-import (config dibaca saat import)
+    config.SERVING_WORKERS = max(0, args.workers)
+
+    print(f"Starting Smart Cane server on {args.host}:{args.port} ({config.SERVING_WORKERS} inference workers)")
+    if importlib.util.find_spec('gunicorn') is None:
+        print("gunicorn not installed: falling back to the Werkzeug development server "
+              "(not for production, pip install gunicorn)")
+        import server_socketio
+        server_socketio.socketio.run(server_socketio.app, host=args.host, port=args.port,
+                                     debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
+        return
+    run_gunicorn(args.host, args.port, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,56 @@
 # server_socketio.py
 from flask import Flask, request, jsonify, render_template, send_from_directory, Response
 from flask_socketio import SocketIO, emit
-from PIL import Image
-import os, io
+import os
 import cv2
 import numpy as np
 from datetime import datetime
-import base64
-import threading
 import time
-import torch
 import pathlib
 import sys
-import queue
+import itertools
+import json
+import math
 
+from config import (INFERENCE_WORKERS, FRAME_QUEUE_SIZE, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, DECODE_MAX_WIDTH,
+                    ARCHIVE_MAX_AGE_DAYS, ARCHIVE_MAX_MB, MODEL_WEIGHTS, MODEL_HUB_DIR, MODEL_BACKEND,
+                    MODEL_WARMUP_SIZE, MODEL_NUM_THREADS, VIDEO_FEED_MAX_FPS, VIDEO_FEED_KEEPALIVE_S,
+                    SOCKET_FRAME_MIN_FPS, SOCKET_FRAME_MAX_FPS, SOCKET_JPEG_QUALITY_MIN, SOCKET_JPEG_QUALITY_MAX,
+                    SOCKET_TARGET_RTT_MS, EVENT_LOG_FILE, EVENT_LOG_MAX_MB, EVENT_LOG_ROTATE_HOURS,
+                    EVENT_LOG_BACKUPS, EVENT_LOG_FLUSH_S, EVENT_LOG_EMIT_MS, IMAGE_CATALOG_INDEX, IMAGES_PAGE_MAX,
+                    SIMILARITY_GATE_THRESHOLD, SIMILARITY_GATE_MAX_FRAMES, SIMILARITY_GATE_MAX_AGE_MS,
+                    TRACKER_DETECT_INTERVAL, TRACKER_IOU_THRESHOLD, TRACKER_MAX_AGE_FRAMES, TRACKER_MIN_HITS,
+                    INFERENCE_SIZES, LATENCY_BUDGET_MS, LATENCY_WINDOW, LATENCY_QUEUE_LIMIT, LATENCY_MIN_INTERVAL_S,
+                    SERVING_WORKERS, SERVING_FRAME_BUFFER_MB, SERVING_ACQUIRE_TIMEOUT_S,
+                    SERVING_RESULT_TIMEOUT_S, SERVER_PORT,
+                    STREAM_MAX_FRAME_KB, DEVICE_STATE_SHARDS, DEVICE_IDLE_TIMEOUT_S, CRITICAL_CLASSES,
+                    CRITICAL_MIN_CONFIDENCE, CRITICAL_ALERT_COOLDOWN_S, CRITICAL_PRIORITY_S, TRAJECTORY_CAPACITY,
+                    TRAJECTORY_MAX_GAP_S, LOCATION_BATCH_MAX, LOCATION_EMIT_MS, DETECTION_LONGPOLL_MAX_S)
+from archive import ArchiveWriter, sequence_start
+from inference_worker import PriorityFrameQueue, start_workers
+from batch_scheduler import BatchScheduler
+from frame_broadcaster import FrameBroadcaster, encode_placeholder
+from frame_gate import SimilarityGate
+from tracker import DeviceTrackers
+from resolution_controller import ResolutionController
+from frame_sender import AdaptiveFrameSender
+from event_log import EventLogWriter
+from image_catalog import ImageCatalog
+from ingest import decode_frame
+from stream_ingest import STREAM_ACK_MIMETYPE, STREAM_CONTENT_TYPE, StreamFormatError, read_frames
+from device_state import DeviceStateStore
+from detection_feed import DetectionFeed
+from compact import COMPACT_MIMETYPE, wants_compact
+from alerts import CriticalAlerts
+from trajectory import Trajectory, CoalescedEmitter, split_segments, douglas_peucker
+from model_loader import ModelLoader, MODEL_ARTIFACTS
+from inference_pool import InferencePool, PoolUnavailable
+from postprocess import class_name_table, filter_predictions, detections_to_list
+from metrics import stage_timers, registry, PROMETHEUS_CONTENT_TYPE
 
-frame_queue = queue.Queue(maxsize=2)  # Buffer maksimal 2 frame
-processing = False
+
+# Frame terbaru tiap cane diproses berikutnya; cane yang baru melihat hazard kritis dilayani lebih dulu
+frame_queue = PriorityFrameQueue(maxsize=FRAME_QUEUE_SIZE, priority_fn=lambda device: critical_alerts.priority(device))
 
 # Temporary fix for PosixPath issue on Windows
 if sys.platform.startswith('win'):
@@ -31,52 +65,55 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 # Folders
 UPLOAD_FOLDER = 'uploads'
 CLASSIFIED_FOLDER = 'classified_images'
-LOG_FILE = 'log.txt'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(CLASSIFIED_FOLDER, exist_ok=True)
 
-# Global variables untuk streaming
-latest_frame = None
-latest_detection_frame = None
-frame_lock = threading.Lock()
+# Arsip gambar: ditulis di background, retention berdasarkan umur/ukuran
+ARCHIVE_MAX_AGE_S = ARCHIVE_MAX_AGE_DAYS * 86400 if ARCHIVE_MAX_AGE_DAYS else None
+ARCHIVE_MAX_BYTES = ARCHIVE_MAX_MB * 1024 * 1024 if ARCHIVE_MAX_MB else None
+upload_archive = ArchiveWriter(UPLOAD_FOLDER, max_age_s=ARCHIVE_MAX_AGE_S, max_bytes=ARCHIVE_MAX_BYTES)
+classified_archive = ArchiveWriter(CLASSIFIED_FOLDER, max_age_s=ARCHIVE_MAX_AGE_S, max_bytes=ARCHIVE_MAX_BYTES)
+capture_seq = itertools.count(sequence_start(CLASSIFIED_FOLDER, r'classified_\d{8}_\d{6}_(\d+)\.jpg'))
 
-# Last known location (untuk GPS nanti, tidak untuk ESP32-CAM)
-last_location = {"latitude": None, "longitude": None}
+# Catalog gambar terklasifikasi: scan folder sekali, lalu diperbarui saat capture ditulis/dihapus
+image_catalog = ImageCatalog(CLASSIFIED_FOLDER, IMAGE_CATALOG_INDEX)
+classified_archive.on_evict = image_catalog.remove
 
-# Load YOLOv5 Models
-print("Loading YOLOv5 model...")
-try:
-    # Alternative method to load YOLOv5 model
-    model_path = r'C:\Users\ADVAN\Documents\Arduino\Smartcane\Smart_cane_project\Server_Flask\models\best.pt'
-    
-    # Verify model file exists
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model file not found: {model_path}")
-    
-    print(f"Loading model from: {model_path}")
-    
-    # Load model using torch.hub with simpler approach
-    model = torch.hub.load('ultralytics/yolov5', 'custom', 
-                          path=model_path,
-                          force_reload=True,
-                          skip_validation=True)
-    model.conf = 0.5  # Confidence threshold
-    print("YOLOv5 model loaded successfully!")
-    
-except Exception as e:
-    print(f"Error loading YOLOv5 model: {e}")
-    print("Trying alternative loading method...")
-    
-    try:
-        # Alternative: Direct PyTorch load
-        model = torch.load(model_path, map_location='cpu')
-        if hasattr(model, 'model'):
-            model = model.model
-        model.conf = 0.5
-        print("YOLOv5 model loaded via alternative method!")
-    except Exception as e2:
-        print(f"Alternative loading also failed: {e2}")
-        model = None
+# Frame terbaru dari semua cane untuk viewer MJPEG tanpa ?device= (frame per cane ada di devices)
+WAITING_FRAME = encode_placeholder("Waiting for ESP32-CAM...")
+NO_DETECTION_FRAME = encode_placeholder("No detection yet")
+frame_broadcaster = FrameBroadcaster(WAITING_FRAME)
+
+# Frame ke dashboard via Socket.IO: attachment biner, FPS/kualitas per client (ack).
+# Hanya client yang mengirim 'subscribe_video' (dashboard), bukan cane atau client lain
+frame_sender = AdaptiveFrameSender(
+    lambda sid, payload, callback: socketio.emit('video_frame', payload, to=sid, callback=callback),
+    min_fps=SOCKET_FRAME_MIN_FPS, max_fps=SOCKET_FRAME_MAX_FPS, min_quality=SOCKET_JPEG_QUALITY_MIN,
+    max_quality=SOCKET_JPEG_QUALITY_MAX, target_rtt_ms=SOCKET_TARGET_RTT_MS)
+
+# Log JSON lines: ditulis per batch di background, dashboard menerima 'new_logs' per interval
+event_log = EventLogWriter(
+    EVENT_LOG_FILE,
+    max_bytes=EVENT_LOG_MAX_MB * 1024 * 1024 if EVENT_LOG_MAX_MB else None,
+    rotate_interval_s=EVENT_LOG_ROTATE_HOURS * 3600 if EVENT_LOG_ROTATE_HOURS else None,
+    backups=EVENT_LOG_BACKUPS, flush_interval=EVENT_LOG_FLUSH_S,
+    emit_fn=lambda records: socketio.emit('new_logs', {'logs': records}),
+    emit_interval=EVENT_LOG_EMIT_MS / 1000.0)
+
+# Load YOLOv5 model di background (cache lokal + artifact TorchScript + warm-up).
+# Server langsung bisa menjawab request; status ada di /health.
+# Serving multi-proses (serve.py): model di proses worker terpisah. Mode dev
+# (python server_socketio.py) selalu 1 proses, karena proses spawn meng-import ulang __main__.
+serving_workers = SERVING_WORKERS if __name__ not in ('__main__', '__mp_main__') else 0
+if serving_workers:
+    model_loader = InferencePool(serving_workers, MODEL_WEIGHTS, MODEL_HUB_DIR, MODEL_BACKEND, MODEL_ARTIFACTS,
+                                 conf=0.5, warmup_size=MODEL_WARMUP_SIZE, num_threads=MODEL_NUM_THREADS,
+                                 buffer_bytes=SERVING_FRAME_BUFFER_MB * 1024 * 1024,
+                                 acquire_timeout_s=SERVING_ACQUIRE_TIMEOUT_S,
+                                 result_timeout_s=SERVING_RESULT_TIMEOUT_S).start()
+else:
+    model_loader = ModelLoader(MODEL_WEIGHTS, MODEL_HUB_DIR, MODEL_BACKEND, MODEL_ARTIFACTS,
+                               conf=0.5, warmup_size=MODEL_WARMUP_SIZE, num_threads=MODEL_NUM_THREADS).start()
 
 # Class names sesuai dengan model Anda
 class_names = {
@@ -91,94 +128,371 @@ class_names = {
     8: 'ta',  # meja
     9: 've'   # kendaraan
 }
+class_name_lookup = class_name_table(class_names)
+class_ids = {name: class_id for class_id, name in class_names.items()}
 
-def detect_objects_yolov5(image_array):
+def run_model_batch(images, size):
     """
-    Deteksi objek menggunakan YOLOv5 - OPTIMIZED VERSION
+    Satu forward pass untuk beberapa gambar sekaligus (dipanggil BatchScheduler)
     """
-    if model is None:
-        return False, 0, image_array, []
+    return model_loader.detector.predict(images, size=size)
+
+# 1 batch berjalan per proses worker (mode 1 proses: 1 batch sekaligus)
+batcher = BatchScheduler(run_model_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                         concurrency=max(1, serving_workers))
+
+# Cane yang diam mengirim scene yang sama: pakai deteksi terakhir jika frame hampir identik
+similarity_gate = SimilarityGate(SIMILARITY_GATE_THRESHOLD, max_reuse_frames=SIMILARITY_GATE_MAX_FRAMES,
+                                 max_age_ms=SIMILARITY_GATE_MAX_AGE_MS)
+
+# Tracker per device: track_id stabil, model hanya setiap TRACKER_DETECT_INTERVAL frame
+trackers = DeviceTrackers(TRACKER_DETECT_INTERVAL, iou_threshold=TRACKER_IOU_THRESHOLD,
+                          max_age=TRACKER_MAX_AGE_FRAMES, min_hits=TRACKER_MIN_HITS)
+
+def forget_device(device):
+    # Cane idle dibuang dari store: state tracker, gate, dan alert-nya ikut dibuang
+    similarity_gate.forget(device)
+    trackers.forget(device)
+    critical_alerts.forget(device)
+
+# State per cane (hasil terakhir, frame, feed long-poll, lokasi, sequence): tanpa lock global, cane idle dibuang
+devices = DeviceStateStore(DEVICE_STATE_SHARDS, idle_timeout_s=DEVICE_IDLE_TIMEOUT_S,
+                           broadcaster_fn=lambda: FrameBroadcaster(WAITING_FRAME),
+                           feed_fn=lambda: DetectionFeed({"object": "none", "all": []}),
+                           trajectory_fn=lambda: Trajectory(TRAJECTORY_CAPACITY), on_evict=forget_device)
+
+# Lokasi ke dashboard: maksimal 1 'new_location' per cane per LOCATION_EMIT_MS
+location_emitter = CoalescedEmitter(lambda payload: socketio.emit('new_location', payload),
+                                    interval=LOCATION_EMIT_MS / 1000.0)
+
+def publish_alert(alert):
+    # Jalur cepat: cane yang long-poll /get_detection langsung dibangunkan (sebelum anotasi/hasil
+    # lengkap), response POST per frame berikutnya, dan dashboard (Socket.IO)
+    state = devices.get(alert['device'], touch=False)
+    state.feed.publish_alert(alert)
+    state.set_alert(alert)
+    socketio.emit('critical_alert', alert)
+
+critical_alerts = CriticalAlerts(CRITICAL_CLASSES, min_confidence=CRITICAL_MIN_CONFIDENCE,
+                                 cooldown_s=CRITICAL_ALERT_COOLDOWN_S, priority_s=CRITICAL_PRIORITY_S,
+                                 publish_fn=publish_alert)
+
+# Ukuran inference stream mengikuti latency budget (capture /upload_image selalu ukuran terbesar)
+MAX_INFERENCE_SIZE = max(INFERENCE_SIZES)
+resolution = ResolutionController(INFERENCE_SIZES, budget_ms=LATENCY_BUDGET_MS, window=LATENCY_WINDOW,
+                                  queue_limit=LATENCY_QUEUE_LIMIT, min_interval_s=LATENCY_MIN_INTERVAL_S,
+                                  queue_depth_fn=lambda: frame_queue.qsize() + batcher.queue_depth())
+
+# Metrics untuk /metrics (Prometheus): counter di hot path hanya increment
+frames_received = registry.counter('frames_received', 'Frame stream yang diterima (POST /, /stream, Socket.IO)')
+frames_processed = registry.counter('frames_processed', 'Frame stream yang selesai diproses worker')
+frames_failed = registry.counter('frames_failed', 'Frame stream yang gagal diproses')
+registry.counter('frames_skipped', 'Frame stream yang dibuang karena worker masih sibuk (latest wins)',
+                 fn=lambda: frame_queue.dropped)
+# Counter proses (bukan jumlah state.stale): device yang di-evict tidak menurunkan nilainya
+frames_stale = registry.counter('frames_stale', 'Frame stream yang datang terlambat (sequence lebih lama) dan dibuang')
+registry.gauge('devices_active', 'Cane dengan state di memori', fn=lambda: len(devices))
+registry.counter('location_updates_emitted', 'Update new_location ke dashboard (digabung per cane)',
+                 fn=lambda: location_emitter.emitted)
+registry.counter('critical_alerts', 'Alert hazard kritis yang dikirim (jalur cepat)', fn=lambda: critical_alerts.alerts)
+registry.counter('frames_prioritized', 'Frame cane kritis yang diproses mendahului cane lain',
+                 fn=lambda: frame_queue.prioritized)
+captures_received = registry.counter('captures_received', 'Gambar yang diterima POST /upload_image')
+captures_failed = registry.counter('captures_failed', 'Gambar /upload_image yang gagal diproses')
+registry.counter('inference_gate_checked', 'Frame stream yang diperiksa gate kemiripan',
+                 fn=lambda: similarity_gate.checked)
+registry.counter('inference_gate_reused', 'Frame stream yang memakai deteksi sebelumnya (forward pass dihemat)',
+                 fn=lambda: similarity_gate.reused)
+registry.counter('inference_gate_forced', 'Inference paksa karena batas frame/umur hasil lama',
+                 fn=lambda: similarity_gate.forced)
+registry.counter('tracker_detected_frames', 'Frame stream yang dijalankan detector (atau gate)',
+                 fn=lambda: trackers.detected_frames)
+registry.counter('tracker_tracked_frames', 'Frame stream yang hanya memakai posisi prediksi tracker',
+                 fn=lambda: trackers.tracked_frames)
+registry.counter('tracker_new_hazards', 'Track baru yang terkonfirmasi (hazard baru)', fn=lambda: trackers.new_tracks)
+registry.gauge('inference_size', 'Ukuran inference stream saat ini (piksel)', fn=lambda: resolution.size)
+registry.counter('inference_size_changes', 'Perubahan ukuran inference oleh latency budget',
+                 fn=lambda: resolution.changes)
+registry.gauge('frame_queue_depth', 'Frame stream yang menunggu worker', fn=frame_queue.qsize)
+registry.gauge('model_queue_depth', 'Gambar yang menunggu batch inference', fn=batcher.queue_depth)
+registry.gauge('socketio_clients', 'Client Socket.IO yang berlangganan video_frame', fn=frame_sender.client_count)
+registry.gauge('video_feed_viewers', 'Viewer MJPEG /video_feed yang terhubung', fn=lambda: frame_broadcaster.viewers)
+registry.gauge('model_ready', '1 jika model siap', fn=lambda: int(model_loader.state == 'ready'))
+registry.gauge('archive_queue_depth', 'File arsip yang menunggu ditulis',
+               fn=lambda: upload_archive.queue_depth() + classified_archive.queue_depth())
+registry.gauge('log_queue_depth', 'Record log yang menunggu ditulis', fn=event_log.queue_depth)
+registry.histogram('batch_size', 'Jumlah gambar per batch inference', batcher.batch_size_hist)
+registry.histogram('batch_queue_wait_seconds', 'Waktu tunggu gambar sebelum batch dijalankan',
+                   batcher.queue_wait_hist, scale=0.001)
+
+def run_detection(detector, image_array, size=MAX_INFERENCE_SIZE, priority=0):
+    """
+    Resize + inference + filter. Return array (N, 6) dengan bbox dalam piksel image_array.
+    priority > 0: masuk batch lebih dulu
+    """
+    # OPTIMASI: Resize image untuk processing lebih cepat
+    original_height, original_width = image_array.shape[:2]
     
-    try:
-        # OPTIMASI: Resize image untuk processing lebih cepat
-        original_height, original_width = image_array.shape[:2]
-        
+    with stage_timers.time('preprocess'):
         # Untuk kamera bergerak, gunakan resolusi lebih kecil
-        if original_width > 640:
-            scale_factor = 640 / original_width
-            new_width = 640
+        if original_width > size:
+            scale_factor = size / original_width
+            new_width = size
             new_height = int(original_height * scale_factor)
             resized_image = cv2.resize(image_array, (new_width, new_height))
         else:
             resized_image = image_array
         
-        # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(resized_image, cv2.COLOR_BGR2RGB)
-        
-        # Perform detection
-        results = model(image_rgb)
-        
-        # Get detections
-        detections = results.pandas().xyxy[0]
+        # View BGR -> RGB tanpa copy (model sudah melakukan letterbox sendiri)
+        image_rgb = resized_image[..., ::-1]
+    
+    # Perform detection (digabung dengan frame device lain oleh batcher)
+    pred = batcher.infer(image_rgb, size=size, priority=priority)
+    
+    with stage_timers.time('postprocess'):
+        # Filter + scale coordinates back to frame size dalam satu langkah
+        return filter_predictions(pred, detector.conf, original_width / resized_image.shape[1])
+
+def stream_detections(detector, image_array, device, size, alert_fn=None):
+    """
+    Stream: model dijalankan setiap TRACKER_DETECT_INTERVAL frame (atau hasil lama
+    dipakai ulang oleh similarity_gate); frame di antaranya memakai posisi prediksi
+    tracker. Frame detect mengembalikan deteksi mentah (konfirmasi track hanya
+    untuk flag 'new'); alert_fn(dets) dipanggil sebelum tracker.
+    Return (array (M, 7) + track_id, list track_id yang baru terkonfirmasi)
+    """
+    if not trackers.should_detect(device):
+        with stage_timers.time('track'):
+            return trackers.predict(device), []
+    
+    with stage_timers.time('gate'):
+        signature, dets = similarity_gate.check(device, image_array)
+    if dets is None:
+        started = time.perf_counter()
+        dets = run_detection(detector, image_array, size, priority=critical_alerts.priority(device))
+        resolution.observe((time.perf_counter() - started) * 1000.0)
+        similarity_gate.store(device, signature, dets)
+    if alert_fn:
+        alert_fn(dets)
+    with stage_timers.time('track'):
+        return trackers.update(device, dets)
+
+def detect_objects_yolov5(image_array, source_scale=1.0, device=None, size=MAX_INFERENCE_SIZE, alert_fn=None):
+    """
+    Deteksi objek menggunakan YOLOv5 - OPTIMIZED VERSION
+    image_array (BGR) dianotasi langsung tanpa copy; bbox dikembalikan dalam
+    resolusi asli kamera (image_array * source_scale).
+    device: jika diisi (stream), deteksi lewat tracker device tersebut; setiap
+    deteksi mendapat 'track_id' dan 'new' (True saat hazard pertama kali muncul).
+    size: ukuran inference (stream: dari latency budget)
+    alert_fn(dets): jalur cepat hazard kritis, dipanggil sebelum anotasi
+    """
+    detector = model_loader.detector
+    if detector is None:
+        return False, 0, image_array, []
+    
+    try:
+        if device is not None:
+            dets, new_ids = stream_detections(detector, image_array, device, size, alert_fn)
+        else:
+            dets, new_ids = run_detection(detector, image_array, size), []
+            if alert_fn:
+                alert_fn(dets)
         
-        # Annotate original image (bukan resized)
-        annotated_image = image_array.copy()
-        detection_count = 0
-        detections_list = []
+        with stage_timers.time('postprocess'):
+            boxes = dets[:, :4].astype(np.int64).tolist()
+            
+            # Payload memakai resolusi asli kamera (copy: dets bisa dipakai ulang gate/tracker)
+            payload = dets[:, :6].copy()
+            payload[:, :4] = np.clip(payload[:, :4] * source_scale, 0, None)
+            detections_list = detections_to_list(payload, class_name_lookup)
+            if dets.shape[1] > 6:
+                for det, track_id in zip(detections_list, dets[:, 6].astype(np.int64).tolist()):
+                    det['track_id'] = track_id
+                    det['new'] = track_id in new_ids
         
-        for _, detection in detections.iterrows():
-            if detection['confidence'] > model.conf:
-                detection_count += 1
-                
-                # Scale coordinates back to original size jika di-resize
-                if original_width > 640:
-                    x1 = int(detection['xmin'] / scale_factor)
-                    y1 = int(detection['ymin'] / scale_factor)
-                    x2 = int(detection['xmax'] / scale_factor)
-                    y2 = int(detection['ymax'] / scale_factor)
-                else:
-                    x1, y1, x2, y2 = int(detection['xmin']), int(detection['ymin']), int(detection['xmax']), int(detection['ymax'])
-                
-                # Get class name
-                class_id = detection['class']
-                class_name = class_names.get(class_id, f'class_{class_id}')
-                confidence = detection['confidence']
-                
-                # OPTIMASI: Hanya draw bounding box untuk confidence tinggi
-                if confidence > 0.5:
-                    color = (0, 255, 0)  # Green
-                    cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 2)
-                    
-                    # Draw label (hanya untuk confidence tinggi)
-                    if confidence > 0.7:
-                        label = f"{class_name} {confidence:.2f}"
-                        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-                        cv2.rectangle(annotated_image, (x1, y1 - label_size[1] - 10), (x1 + label_size[0], y1), color, -1)
-                        cv2.putText(annotated_image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+        # Annotate frame langsung (buffer dipakai bersama, tanpa copy)
+        annotated_image = image_array
+        color = (0, 255, 0)  # Green
+        with stage_timers.time('annotate'):
+            for (x1, y1, x2, y2), det in zip(boxes, detections_list):
+                confidence = det['confidence']
+                cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 2)
                 
-                detections_list.append({
-                    'class': class_name,
-                    'confidence': float(confidence),
-                    'bbox': [x1, y1, x2, y2]
-                })
+                # Draw label (hanya untuk confidence tinggi)
+                if confidence > 0.7:
+                    label = f"{det['class']} {confidence:.2f}"
+                    label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+                    cv2.rectangle(annotated_image, (x1, y1 - label_size[1] - 10), (x1 + label_size[0], y1), color, -1)
+                    cv2.putText(annotated_image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
         
+        detection_count = len(detections_list)
         return detection_count > 0, detection_count, annotated_image, detections_list
         
+    except PoolUnavailable:
+        # Bukan "tidak ada deteksi": pemanggil menjawab 503 / menghitung frame gagal
+        raise
     except Exception as e:
         print(f"Detection error: {e}")
         return False, 0, image_array, []
 
-def write_log(text):
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    line = f"[{ts}] {text}"
-    with open(LOG_FILE, 'a') as f:
-        f.write(line + "\n")
-    socketio.emit('new_log', {'log': line})
+def write_log(event, **fields):
+    # Hanya masuk antrian; file dan emit dashboard ditangani thread event_log
+    with stage_timers.time('log'):
+        event_log.log(event, **fields)
+
+def detection_fields(detections):
+    return {
+        'classes': [d['class'] for d in detections],
+        'confidences': [round(d['confidence'], 3) for d in detections]
+    }
+
+def process_stream_frame(job):
+    """
+    Dijalankan oleh worker inference: decode, deteksi, encode, emit, log
+    """
+    try:
+        # Decode sekali (reduced DCT decode untuk frame lebar)
+        with stage_timers.time('decode'):
+            frame = decode_frame(job['image_bytes'], max_width=DECODE_MAX_WIDTH)
+
+        # Deteksi objek dengan YOLOv5 (ukuran inference mengikuti latency budget);
+        # hazard kritis langsung dikirim dari dalam deteksi, sebelum anotasi
+        inference_size = resolution.size
+        alerts = []
+
+        def alert_fn(dets):
+            alerts.extend(critical_alerts.check(job['device'], dets, class_name_lookup,
+                                                received_at=job['received_at'], scale=frame.scale))
+
+        with stage_timers.time('detect'):
+            detected, count, annotated_image, detections = detect_objects_yolov5(frame.image, frame.scale,
+                                                                                  device=job['device'],
+                                                                                  size=inference_size,
+                                                                                  alert_fn=alert_fn)
+
+        # Encode JPEG hanya jika ada yang melihat, maksimal sekali per kualitas
+        jpeg_cache = {}
+
+        def encode(quality):
+            if quality not in jpeg_cache:
+                with stage_timers.time('encode'):
+                    jpeg_cache[quality] = cv2.imencode('.jpg', annotated_image,
+                                                       [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+            return jpeg_cache[quality]
+
+        # Frame baru untuk viewer /video_feed dan /latest_detection (encode saat diminta, sekali
+        # untuk viewer semua cane dan viewer cane ini)
+        state = devices.get(job['device'])
+        frame_broadcaster.publish(encode_fn=lambda: encode(60))
+        state.broadcaster.publish(encode_fn=lambda: encode(60))
+        state.set_result({
+            'frame_id': job['frame_id'],
+            'detected': detected,
+            'count': count,
+            'detections': detections,
+            'inference_size': inference_size
+        })
+        # Feed long-poll cane ini (format sama dengan apps.py); seq naik jika class berubah
+        state.feed.publish({
+            'object': detections[0]['class'] if detections else 'none',
+            'confidence': detections[0]['confidence'] if detections else None,
+            'all': detections,
+            'frame_id': job['frame_id']
+        }, key=tuple(sorted(d['class'] for d in detections)),
+            dets=[[*d['bbox'], d['confidence'], class_ids[d['class']]] for d in detections])
+
+        # Kirim via Socket.IO (biner) ke client yang sudah siap menerima frame berikutnya
+        with stage_timers.time('emit'):
+            frame_sender.send(encode, {
+                'frame_id': job['frame_id'],
+                'device': job['device'],
+                'timestamp': datetime.now().strftime('%H:%M:%S'),
+                'detected': detected,
+                'count': count,
+                'detections': detections,
+                'inference_size': inference_size
+            })
+
+        # Latency frame dari diterima HTTP sampai hasil tersedia
+        latency_ms = (time.time() - job['received_at']) * 1000.0
+
+        # Hazard baru (track baru) dilog dan dikirim sekali, bukan setiap frame objek terlihat
+        new_hazards = [d for d in detections if d.get('new')]
+        if new_hazards:
+            write_log('hazard', device=job['device'], frame_id=job['frame_id'],
+                      track_ids=[d['track_id'] for d in new_hazards],
+                      latency_ms=round(latency_ms, 1), **detection_fields(new_hazards))
+            socketio.emit('new_hazard', {'device': job['device'], 'frame_id': job['frame_id'],
+                                         'detections': new_hazards})
+
+        for alert in alerts:
+            write_log('alert', device=alert['device'], frame_id=job['frame_id'], hazard=alert['class'],
+                      confidence=alert['confidence'], latency_ms=round((alert['time'] - job['received_at']) * 1000.0, 1))
+
+        stage_timers.observe('end_to_end', latency_ms)
+        frames_processed.inc()
+
+    except Exception as e:
+        frames_failed.inc()
+        print(f"Stream error: {e}")
+        write_log('error', source='stream', device=job.get('device'), message=str(e))
 
 # ========== ENDPOINT UTAMA UNTUK DASHBOARD DAN STREAMING ==========
-# Tambahkan di bagian global variables (setelah frame_lock)
-processing = False
-frame_counter = 0
+def request_device():
+    # Identitas cane: header X-Device-ID, atau alamat IP jika firmware tidak mengirimnya
+    return request.headers.get('X-Device-ID') or request.remote_addr
+
+frame_counter = itertools.count(1)
+EMPTY_RESULT = {'frame_id': None, 'detected': False, 'count': 0, 'detections': [], 'inference_size': None}
+
+def enqueue_frame(image_bytes, device, seq=None, boot_id=None):
+    """
+    Masukkan 1 frame stream ke antrian; worker inference yang memproses. Jika worker
+    tertinggal, frame lama dibuang dan frame terbaru diproses berikutnya.
+    Return frame_id, atau None jika frame lebih lama dari frame terakhir device ini
+    (boot_id baru = device restart, sequence mulai lagi).
+    """
+    frames_received.inc()
+    if not devices.get(device).accept_seq(seq, boot_id):
+        frames_stale.inc()
+        return None
+    frame_id = next(frame_counter)
+    frame_queue.put({
+        'frame_id': frame_id,
+        'image_bytes': image_bytes,
+        'device': device,
+        'seq': seq,
+        'received_at': time.time()
+    })
+    return frame_id
+
+def latest_response(device, frame_id):
+    # Hasil deteksi terakhir cane ini yang sudah selesai diproses
+    state = devices.get(device)
+    result = state.result() or EMPTY_RESULT
+    alert = state.take_alert()
+    response = {
+        "success": True,
+        "queued": frame_id is not None,
+        "frame_id": frame_id,
+        "result_frame_id": result['frame_id'],
+        "detected": result['detected'],
+        "count": result['count'],
+        "detections": result['detections'],
+        "inference_size": result['inference_size']
+    }
+    if alert is not None:
+        response["alert"] = alert
+    return response
+
+def header_seq():
+    seq = request.headers.get('X-Frame-Seq', type=int)
+    return seq if seq is not None and seq >= 0 else None
+
+def header_boot_id():
+    # ID acak per boot firmware: sequence dari boot baru tidak dianggap frame terlambat
+    return request.headers.get('X-Boot-ID') or None
 
 @app.route('/', methods=['GET', 'POST'])
 def root():
@@ -186,12 +500,6 @@ def root():
         return render_template('dashboard.html')
     
     # POST request - Handle streaming dari ESP32-CAM
-    global latest_frame, latest_detection_frame, processing, frame_counter
-    
-    # PERUBAHAN 1: Skip frame jika masih processing
-    if processing:
-        return jsonify({"success": True, "skipped": True}), 200
-    
     if 'image' not in request.files:
         return jsonify({"success": False, "message": "No image file"}), 400
     
@@ -199,57 +507,54 @@ def root():
     if file.filename == '':
         return jsonify({"success": False, "message": "Empty filename"}), 400
     
-    try:
-        processing = True  # PERUBAHAN 2: Set flag processing
-        frame_counter += 1
-        
-        # Baca dan proses frame
-        image_bytes = file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        image_array = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Deteksi objek dengan YOLOv5
-        detected, count, annotated_image, detections = detect_objects_yolov5(image_array)
-        
-        # PERUBAHAN 3: Kurangi quality encoding untuk speed
-        with frame_lock:
-            _, buffer = cv2.imencode('.jpg', annotated_image, [cv2.IMWRITE_JPEG_QUALITY, 60])  # 80 -> 60
-            latest_frame = buffer.tobytes()
-            
-            # Simpan juga frame deteksi terakhir untuk Latest Detection
-            latest_detection_frame = latest_frame  # PERUBAHAN 4: Reuse buffer
-        
-        # PERUBAHAN 5: Kirim via Socket.IO hanya setiap 2 frame (reduce overhead)
-        if frame_counter % 2 == 0:
-            jpg_as_text = base64.b64encode(buffer).decode('utf-8')
-            
-            socketio.emit('video_frame', {
-                'image_data': f'data:image/jpeg;base64,{jpg_as_text}',
-                'timestamp': datetime.now().strftime('%H:%M:%S'),
-                'detected': detected,
-                'count': count,
-                'detections': detections
-            })
-        
-        # PERUBAHAN 6: Log hanya jika ada deteksi (reduce I/O)
-        if detected:
-            detection_text = ", ".join([f"{d['class']}({d['confidence']:.2f})" for d in detections])
-            write_log(f"Detected: {detection_text}")
-        
-        return jsonify({
-            "success": True, 
-            "detected": detected, 
-            "count": count,
-            "detections": detections
-        })
-        
-    except Exception as e:
-        print(f"Stream error: {e}")
-        write_log(f"Stream error: {e}")
-        return jsonify({"success": False, "message": str(e)}), 500
-    
-    finally:
-        processing = False  # PERUBAHAN 7: Reset flag di finally block
+    device = request_device()
+    frame_id = enqueue_frame(file.read(), device, header_seq(), header_boot_id())
+    return jsonify(latest_response(device, frame_id))
+
+@app.route('/stream', methods=['POST'])
+def stream_ingest():
+    """
+    Ingest ESP32-CAM tanpa multipart:
+      - application/x-jpeg-stream (default firmware): body chunked berisi banyak frame
+        [seq][len][jpeg], 1 koneksi untuk seluruh sesi. Response (application/x-ndjson)
+        dikirim bersamaan di koneksi yang sama: 1 baris JSON per frame (ack + hasil
+        terakhir + alert), baris terakhir ringkasan saat client menutup stream.
+        Koneksi baru memulai urutan sequence baru.
+      - image/jpeg: 1 frame per POST (keep-alive), header X-Frame-Seq opsional;
+        response = ack + hasil terakhir + alert
+    Device dari header X-Device-ID; X-Boot-ID (acak per boot) menandai device restart.
+    """
+    device = request_device()
+    max_bytes = STREAM_MAX_FRAME_KB * 1024
+    if request.mimetype != STREAM_CONTENT_TYPE:
+        if request.content_length and request.content_length > max_bytes:
+            return jsonify({"success": False, "message": "Frame too large"}), 413
+        data = request.get_data(cache=False)
+        if not data:
+            return jsonify({"success": False, "message": "Empty body"}), 400
+        return jsonify(latest_response(device, enqueue_frame(data, device, header_seq(), header_boot_id())))
+
+    # Koneksi stream baru = sesi baru: sequence dari sesi/boot sebelumnya tidak dipakai
+    devices.get(device).reset_seq(header_boot_id())
+    stream = request.stream
+
+    def generate():
+        # Body dibaca sambil response dikirim: ack frame langsung sampai ke kamera
+        queued = stale = 0
+        try:
+            for seq, data in read_frames(stream, max_bytes):
+                frame_id = enqueue_frame(data, device, seq)
+                if frame_id is None:
+                    stale += 1
+                else:
+                    queued += 1
+                yield json.dumps(latest_response(device, frame_id)) + '\n'
+        except StreamFormatError as e:
+            write_log('error', source='stream', device=device, message=str(e))
+            yield json.dumps({"success": False, "message": str(e), "frames": queued, "stale": stale}) + '\n'
+            return
+        yield json.dumps({"success": True, "done": True, "frames": queued, "stale": stale}) + '\n'
+    return Response(generate(), mimetype=STREAM_ACK_MIMETYPE)
 
 @app.route('/classified/<path:filename>')
 def classified_file(filename):
@@ -258,39 +563,69 @@ def classified_file(filename):
 # Endpoint MJPEG stream untuk browser
 @app.route('/video_feed')
 def video_feed():
+    # Viewer hanya dibangunkan saat ada frame baru; ?fps= untuk koneksi lambat,
+    # ?device= hanya frame cane tersebut (tanpa device: frame terbaru semua cane)
+    fps = min(request.args.get('fps', default=VIDEO_FEED_MAX_FPS, type=float), VIDEO_FEED_MAX_FPS)
+    device = request.args.get('device')
+    if not device:
+        return Response(frame_broadcaster.mjpeg(max_fps=fps, keepalive_s=VIDEO_FEED_KEEPALIVE_S),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+
+    # State cane tidak dibuang selama viewer ini terhubung
+    state = devices.hold(device)
+
     def generate():
-        while True:
-            with frame_lock:
-                if latest_frame is not None:
-                    frame = latest_frame
-                else:
-                    # Frame placeholder jika belum ada frame
-                    img = np.zeros((480, 640, 3), dtype=np.uint8)
-                    cv2.putText(img, "Waiting for ESP32-CAM...", (50, 240), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                    _, buffer = cv2.imencode('.jpg', img)
-                    frame = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(0.05)  # ~20 FPS
-    
-    return Response(generate(),
-                   mimetype='multipart/x-mixed-replace; boundary=frame')
+        try:
+            yield from state.broadcaster.mjpeg(max_fps=fps, keepalive_s=VIDEO_FEED_KEEPALIVE_S)
+        finally:
+            devices.release(state)
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-# Endpoint untuk mendapatkan frame deteksi terakhir (Latest Detection)
+# Endpoint untuk mendapatkan frame deteksi terakhir (Latest Detection), ?device= per cane
 @app.route('/latest_detection')
 def latest_detection():
-    with frame_lock:
-        if latest_detection_frame is not None:
-            return Response(latest_detection_frame, mimetype='image/jpeg')
+    device = request.args.get('device')
+    state = devices.peek(device) if device else None
+    if device and state is None:
+        return Response(NO_DETECTION_FRAME, mimetype='image/jpeg')
+    _, frame = (state.broadcaster if state else frame_broadcaster).latest()
+    return Response(frame if frame is not None else NO_DETECTION_FRAME, mimetype='image/jpeg')
+
+# Deteksi terakhir 1 cane (?device= atau X-Device-ID/IP pengirim).
+# Long-poll (sama dengan apps.py): ?since=<seq>&wait=<detik> / If-None-Match, dijawab begitu ada
+# deteksi atau alert hazard kritis baru (304 jika timeout); Accept biner -> payload compact.py
+@app.route('/get_detection')
+def get_detection():
+    device = request.args.get('device') or request_device()
+    compact = wants_compact(request)
+    if 'since' in request.args or 'wait' in request.args or request.if_none_match or compact:
+        feed = devices.get(device, touch=False).feed
+        since = request.args.get('since', type=int)
+        if since is None:
+            since = feed.since_from_etags(request.if_none_match)
+        wait = min(request.args.get('wait', default=0.0, type=float), DETECTION_LONGPOLL_MAX_S)
+        fmt = 'compact' if compact else 'json'
+        seq, body = feed.wait(since, wait, fmt) if since is not None and wait > 0 else feed.current(fmt)
+        if seq == since:
+            response = Response(status=304)
         else:
-            # Return placeholder image
-            img = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(img, "No detection yet", (50, 240), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            _, buffer = cv2.imencode('.jpg', img)
-            return Response(buffer.tobytes(), mimetype='image/jpeg')
+            response = Response(body, mimetype=COMPACT_MIMETYPE if compact else 'application/json')
+        response.set_etag(feed.etag(seq))
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        return response
+
+    state = devices.peek(device)
+    if state is None:
+        return jsonify({"success": False, "message": f"Unknown device {device}"}), 404
+    result = dict(state.result() or EMPTY_RESULT)
+    result.update(success=True, device=device, location=state.location, last_seq=state.last_seq,
+                  seq=state.feed.seq, alert=state.feed.last_alert())
+    return jsonify(result)
+
+@app.route('/devices')
+def list_devices():
+    return jsonify({'devices': [state.summary() for state in devices.devices()]})
 
 # Endpoint upload_image untuk single image capture
 @app.route('/upload_image', methods=['POST'])
@@ -303,78 +638,277 @@ def upload_image():
     file = request.files['image']
     if file.filename == '':
         return jsonify({"success": False, "message": "Empty filename"}), 400
+    captures_received.inc()
+    received_at = time.time()
     try:
         image_bytes = file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        image_array = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # Full decode untuk capture tunggal (hasil klasifikasi disimpan resolusi penuh)
+        with stage_timers.time('decode'):
+            frame = decode_frame(image_bytes)
 
+        # Nama unik: timestamp + nomor urut monotonic (tidak bentrok dalam 1 detik)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        original_path = os.path.join(UPLOAD_FOLDER, f'original_{timestamp}.jpg')
-        classified_path = os.path.join(CLASSIFIED_FOLDER, f'classified_{timestamp}.jpg')
+        name_suffix = f'{timestamp}_{next(capture_seq):06d}.jpg'
+        classified_name = f'classified_{name_suffix}'
 
-        # Save original
-        Image.fromarray(cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)).save(original_path)
+        # Save original (bytes JPEG asli, ditulis di background)
+        upload_archive.write(f'original_{name_suffix}', image_bytes)
 
-        # Detect dengan YOLOv5
-        detected, count, annotated, detections = detect_objects_yolov5(image_array)
+        # Detect dengan YOLOv5 (hazard kritis langsung di-alert, sebelum anotasi/simpan)
+        device = request_device()
+        with stage_timers.time('detect'):
+            detected, count, annotated, detections = detect_objects_yolov5(
+                frame.image, alert_fn=lambda dets: critical_alerts.check(device, dets, class_name_lookup,
+                                                                         received_at=received_at))
 
-        # Save annotated result
-        cv2.imwrite(classified_path, annotated)
+        # Log (dashboard menerima lewat 'new_logs')
+        write_log('capture', device=device, file=classified_name, count=count,
+                  latency_ms=round((time.time() - received_at) * 1000.0, 1), **detection_fields(detections))
 
-        # Log and emit to dashboard
-        detection_text = ", ".join([f"{d['class']}({d['confidence']:.2f})" for d in detections]) if detected else "None"
-        log_msg = f"YOLOv5 Detection: {detected} | Count: {count} | Objects: {detection_text}"
-        write_log(log_msg)
-
-        # Emit event dengan metadata
-        socketio.emit('new_image', {
-            'filename': os.path.basename(classified_path),
+        # Save annotated result; event dikirim setelah file ada di disk
+        new_image_event = {
+            'filename': classified_name,
             'timestamp': timestamp,
             'detected': detected,
             'count': count,
             'detections': detections
-        })
+        }
+        with stage_timers.time('encode'):
+            _, buffer = cv2.imencode('.jpg', annotated)
+        def on_written(name):
+            image_catalog.add(name, detections, ts=received_at)
+            socketio.emit('new_image', new_image_event)
+
+        classified_archive.write(classified_name, buffer.tobytes(), callback=on_written)
 
         return jsonify({
             "success": True, 
             "detected": detected, 
             "count": count, 
-            "file": os.path.basename(classified_path),
+            "file": classified_name,
             "detections": detections
         })
+    except PoolUnavailable as e:
+        captures_failed.inc()
+        write_log('error', source='upload_image', device=request_device(), message=str(e))
+        return jsonify({"success": False, "message": str(e)}), 503
     except Exception as e:
-        write_log(f"Error processing image: {e}")
+        captures_failed.inc()
+        write_log('error', source='upload_image', device=request_device(), message=str(e))
         return jsonify({"success": False, "message": str(e)}), 500
 
-# Endpoint untuk update location (untuk GPS nanti)
+def parse_time_arg(name):
+    """
+    Query waktu: epoch detik atau ISO 8601 (2024-05-01, 2024-05-01T08:30:00)
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+# Daftar gambar terklasifikasi dari catalog: ?limit=&offset=&start=&end=&class=po,st
+@app.route('/images')
+def images():
+    try:
+        start = parse_time_arg('start')
+        end = parse_time_arg('end')
+    except ValueError:
+        return jsonify({"success": False, "message": "start/end must be epoch seconds or ISO 8601"}), 400
+    limit = max(1, min(request.args.get('limit', default=20, type=int), IMAGES_PAGE_MAX))
+    offset = max(0, request.args.get('offset', default=0, type=int))
+    classes = [c for arg in request.args.getlist('class') for c in arg.split(',') if c]
+
+    entries, total = image_catalog.query(start=start, end=end, classes=classes, limit=limit, offset=offset)
+    return jsonify({
+        'images': [dict(entry, url=f"/classified/{entry['filename']}") for entry in entries],
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'next_offset': offset + len(entries) if (offset + len(entries) < total if total is not None
+                                                 else len(entries) == limit) else None
+    })
+
+# Gallery dashboard: 10 gambar terbaru
+@app.route('/api/gallery')
+def api_gallery():
+    return jsonify({'files': image_catalog.latest(10)})
+
+# Status model: loading / ready / failed
+@app.route('/health')
+def health():
+    status = model_loader.status()
+    return jsonify({
+        'status': 'ok' if status['state'] == 'ready' else status['state'],
+        'model': status
+    }), 200 if status['state'] == 'ready' else 503
+
+# Statistik batching, antrian frame, dan latency per stage (untuk tuning throughput vs latency)
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'batching': batcher.stats(),
+        'frame_queue': {'depth': frame_queue.qsize(), 'dropped': frame_queue.dropped},
+        'similarity_gate': similarity_gate.stats(),
+        'tracker': trackers.stats(),
+        'devices': devices.stats(),
+        'alerts': critical_alerts.stats(),
+        'locations': location_emitter.stats(),
+        'resolution': resolution.stats(),
+        'video_feed': frame_broadcaster.stats(),
+        'socketio_frames': frame_sender.stats(),
+        'event_log': event_log.stats(),
+        'stages': stage_timers.snapshot(),
+        'archive': {'uploads': upload_archive.stats(), 'classified': classified_archive.stats()},
+        'image_catalog': {'images': len(image_catalog), 'classes': image_catalog.class_counts()}
+    })
+
+# Metrics format Prometheus: counter, gauge, dan histogram latency per stage
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(stage_timers), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def parse_fixes(items, received_at):
+    """
+    Fix GPS dari JSON -> array (N, 3) ts, lat, lon. Setiap fix: {"latitude", "longitude"}
+    dengan "ts" (epoch) atau "age_ms" (umur fix saat dikirim, tanpa jam di device),
+    atau [ts, lat, lon]. Fix yang tidak valid dibuang.
+    """
+    rows = []
+    for item in items:
+        try:
+            if isinstance(item, dict):
+                lat = float(item.get('latitude', item.get('lat')))
+                lon = float(item.get('longitude', item.get('lon')))
+                ts = float(item['ts']) if 'ts' in item else received_at - float(item.get('age_ms', 0)) / 1000.0
+            else:
+                ts, lat, lon = (float(v) for v in item)
+        except (TypeError, ValueError, KeyError):
+            continue
+        if math.isfinite(ts) and -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0:
+            rows.append((ts, lat, lon))
+    return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+def store_fixes(device, fixes):
+    """
+    Simpan fix ke jejak cane; lokasi terakhir diperbarui dan dikirim ke dashboard (digabung)
+    """
+    state = devices.get(device)
+    stored = state.trajectory.extend(fixes)
+    last = state.trajectory.last()
+    if last is None:
+        return stored, None
+    location = {'latitude': float(last[1]), 'longitude': float(last[2]),
+                'time': datetime.fromtimestamp(last[0]).strftime('%Y-%m-%d %H:%M:%S')}
+    state.set_location(location)
+    if stored:
+        location_emitter.push(device, dict(location, device=device), points=stored)
+    return stored, location
+
+# Endpoint untuk update location (1 fix per request)
 @app.route('/send_location', methods=['POST'])
 def send_location():
-    global last_location
-    data = request.get_json()
+    data = request.get_json(silent=True)
     if not data or 'latitude' not in data or 'longitude' not in data:
         return jsonify({"success": False, "message": "Latitude and longitude required"}), 400
-    lat = float(data['latitude'])
-    lon = float(data['longitude'])
-    last_location = {'latitude': lat, 'longitude': lon}
-    write_log(f"Location updated: {last_location}")
+    fixes = parse_fixes([data], time.time())
+    if not len(fixes):
+        return jsonify({"success": False, "message": "Invalid latitude/longitude"}), 400
+    device = request_device()
+    _, location = store_fixes(device, fixes)
+    write_log('location', device=device, latitude=location['latitude'], longitude=location['longitude'])
+    return jsonify({"success": True, "location": location})
+
+# Batch fix GPS: {"fixes": [{"latitude", "longitude", "ts" | "age_ms"}, ...]} atau [[ts, lat, lon], ...]
+@app.route('/send_locations', methods=['POST'])
+def send_locations():
+    received_at = time.time()
+    data = request.get_json(silent=True)
+    items = data.get('fixes') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "fixes array required"}), 400
+    if len(items) > LOCATION_BATCH_MAX:
+        return jsonify({"success": False, "message": f"At most {LOCATION_BATCH_MAX} fixes per request"}), 413
+    fixes = parse_fixes(items, received_at)
+    device = request_device()
+    stored, location = store_fixes(device, fixes)
+    # 1 baris log per batch, bukan per fix
+    write_log('location_batch', device=device, received=len(items), stored=stored,
+              **({'latitude': location['latitude'], 'longitude': location['longitude']} if location else {}))
+    return jsonify({"success": True, "received": len(items), "stored": stored, "location": location})
+
+# Jejak GPS: ?device=&start=&end=&epsilon_m= (Douglas-Peucker, meter)&max_gap_s= (potong segmen)
+@app.route('/trajectory')
+def trajectory():
+    try:
+        start = parse_time_arg('start')
+        end = parse_time_arg('end')
+    except ValueError:
+        return jsonify({"success": False, "message": "start/end must be epoch seconds or ISO 8601"}), 400
+    device = request.args.get('device')
+    if device:
+        state = devices.peek(device)
+    else:
+        # Tanpa device: cane yang terakhir mengirim lokasi
+        state = next((s for s in devices.devices() if s.location), None)
+    if state is None:
+        return jsonify({"success": False, "message": f"Unknown device {device}" if device else "No locations yet"}), 404
 
-    # Emit location update to dashboard
-    socketio.emit('new_location', {'latitude': lat, 'longitude': lon, 'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+    epsilon_m = max(0.0, request.args.get('epsilon_m', default=0.0, type=float))
+    max_gap_s = request.args.get('max_gap_s', default=TRAJECTORY_MAX_GAP_S, type=float)
+    points = state.trajectory.points(start, end)
+    segments = [douglas_peucker(segment, epsilon_m) for segment in split_segments(points, max_gap_s)]
+    return jsonify({
+        "success": True,
+        "device": state.device_id,
+        "points": len(points),
+        "returned": sum(len(segment) for segment in segments),
+        "segments": [[[round(ts, 3), round(lat, 7), round(lon, 7)] for ts, lat, lon in segment.tolist()]
+                     for segment in segments]
+    })
 
-    return jsonify({"success": True, "location": last_location})
+# Jalankan worker inference untuk stream ESP32-CAM
+# Thread stream minimal sebanyak proses worker, supaya semua worker bisa terpakai
+inference_workers = start_workers(frame_queue, process_stream_frame, count=max(INFERENCE_WORKERS, serving_workers))
 
 # Socket.IO event handlers
 @socketio.on('connect')
 def handle_connect():
     print('Client connected')
-    # Send initial state: latest files and last_location
-    files = sorted([f for f in os.listdir(CLASSIFIED_FOLDER) if f.lower().endswith(('.jpg','.png'))], reverse=True)[:10]
-    emit('initial', {'files': files, 'last_location': last_location})
+    # Send initial state: latest files (dari catalog, tanpa scan folder) and lokasi cane yang terakhir aktif
+    last_location = next((state.location for state in devices.devices() if state.location),
+                         {"latitude": None, "longitude": None})
+    emit('initial', {'files': image_catalog.latest(10), 'last_location': last_location})
+
+@socketio.on('subscribe_video')
+def handle_subscribe_video():
+    # Dashboard minta frame 'video_frame' (dikirim ulang setiap reconnect)
+    frame_sender.add(request.sid)
+
+@socketio.on('stream_frame')
+def handle_stream_frame(data):
+    """
+    Frame lewat WebSocket (Socket.IO, biner): {'image': bytes, 'seq': int, 'device': str, 'boot': str}.
+    Ack callback berisi hasil deteksi terakhir.
+    """
+    image = data.get('image') if isinstance(data, dict) else None
+    if not isinstance(image, (bytes, bytearray)) or not image or len(image) > STREAM_MAX_FRAME_KB * 1024:
+        return {"success": False, "message": "Invalid frame"}
+    seq = data.get('seq')
+    device = str(data.get('device') or request.remote_addr)
+    boot_id = data.get('boot')
+    frame_id = enqueue_frame(bytes(image), device, seq if isinstance(seq, int) and seq >= 0 else None,
+                             str(boot_id) if boot_id is not None else None)
+    return latest_response(device, frame_id)
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    frame_sender.remove(request.sid)
     print('Client disconnected')
 
 if __name__ == '__main__':
-    print("Starting Flask-SocketIO server on 0.0.0.0:5050")
-    socketio.run(app, host='0.0.0.0', port=5050, debug=True)
\ No newline at end of file
+    print(f"Starting Flask-SocketIO server on 0.0.0.0:{SERVER_PORT}")
+    # Tanpa reloader: reloader menjalankan modul ini 2x (model di-load 2x di memori)
+    socketio.run(app, host='0.0.0.0', port=SERVER_PORT, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,48 @@
+# stream_ingest.py
+# Ingest stream ESP32-CAM lewat 1 koneksi persisten: frame JPEG berurutan dengan prefix panjang.
+# Server membalas di koneksi yang sama selagi body masih dikirim (HTTP/1.1 full-duplex,
+# Werkzeug threaded dan gunicorn): 1 baris JSON ack per frame, dipakai kamera sebagai backpressure.
+import struct
+
+# Header per frame: sequence number (uint32) + panjang JPEG (uint32), big-endian
+FRAME_HEADER = struct.Struct('>II')
+STREAM_CONTENT_TYPE = 'application/x-jpeg-stream'
+STREAM_ACK_MIMETYPE = 'application/x-ndjson'
+
+
+class StreamFormatError(ValueError):
+    pass
+
+
+def _read_exact(stream, n):
+    """
+    Baca tepat n byte (chunked input bisa mengembalikan lebih sedikit). None jika stream selesai.
+    """
+    parts, remaining = [], n
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == n:
+                return None
+            raise StreamFormatError(f"stream ended inside a frame ({n - remaining}/{n} bytes)")
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return parts[0] if len(parts) == 1 else b''.join(parts)
+
+
+def read_frames(stream, max_frame_bytes):
+    """
+    Generator (seq, jpeg_bytes) dari body stream; berhenti saat client menutup stream.
+    Format: [seq:uint32][len:uint32][jpeg:len] berulang.
+    """
+    while True:
+        header = _read_exact(stream, FRAME_HEADER.size)
+        if header is None:
+            return
+        seq, length = FRAME_HEADER.unpack(header)
+        if length == 0 or length > max_frame_bytes:
+            raise StreamFormatError(f"invalid frame length {length}")
+        data = _read_exact(stream, length)
+        if data is None:
+            raise StreamFormatError("stream ended before frame data")
+        yield seq, data
@@ -0,0 +1,64 @@
+# test_annotation_cache.py
+import threading
+
+from annotation_cache import AnnotationCache
+
+
+def test_renders_once_and_drops_original_bytes():
+    calls = []
+    cache = AnnotationCache(lambda data, dets: calls.append(data) or data + b'!', maxsize=2)
+    cache.put(1, b'jpeg', [])
+    assert cache.get_jpeg(1) == b'jpeg!'
+    assert cache.get_jpeg(1) == b'jpeg!'
+    assert calls == [b'jpeg']
+    assert cache.stats()['renders'] == 1 and cache.stats()['hits'] == 1
+
+
+def test_evicted_frame_returns_none():
+    cache = AnnotationCache(lambda data, dets: data, maxsize=2)
+    for frame_id in range(3):
+        cache.put(frame_id, b'x', [])
+    assert cache.get_jpeg(0) is None
+    assert cache.get_jpeg(2) == b'x'
+
+
+def test_concurrent_requests_share_one_render():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def render(data, dets):
+        calls.append(data)
+        started.set()
+        release.wait(5)
+        return b'annotated'
+
+    cache = AnnotationCache(render)
+    cache.put(1, b'jpeg', [])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_jpeg(1))) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [b'annotated'] * 4 and len(calls) == 1
+
+
+def test_failed_render_is_retried_by_next_request():
+    attempts = []
+
+    def render(data, dets):
+        attempts.append(data)
+        if len(attempts) == 1:
+            raise ValueError('decode failed')
+        return b'ok'
+
+    cache = AnnotationCache(render)
+    cache.put(1, b'jpeg', [])
+    try:
+        cache.get_jpeg(1)
+    except ValueError:
+        pass
+    assert cache.get_jpeg(1) == b'ok'
@@ -0,0 +1,65 @@
+# test_batch_scheduler.py
+import time
+
+from batch_scheduler import BatchScheduler
+
+
+def recording_scheduler(**kwargs):
+    batches = []
+
+    def infer(images, size):
+        batches.append((list(images), size))
+        return [f'{image}@{size}' for image in images]
+
+    return BatchScheduler(infer, **kwargs), batches
+
+
+def test_full_batch_flushes_before_deadline():
+    scheduler, batches = recording_scheduler(max_batch_size=3, max_wait_ms=5000)
+    started = time.perf_counter()
+    futures = [scheduler.submit(i) for i in range(3)]
+    assert [f.result(timeout=2) for f in futures] == ['0@640', '1@640', '2@640']
+    assert time.perf_counter() - started < 2
+    assert batches == [([0, 1, 2], 640)]
+
+
+def test_partial_batch_flushes_at_deadline():
+    scheduler, batches = recording_scheduler(max_batch_size=8, max_wait_ms=50)
+    started = time.perf_counter()
+    futures = [scheduler.submit(i) for i in range(2)]
+    assert [f.result(timeout=2) for f in futures] == ['0@640', '1@640']
+    assert time.perf_counter() - started >= 0.045
+    assert batches == [([0, 1], 640)]
+    assert scheduler.stats()['batch_size']['count'] == 1
+
+
+def test_only_same_size_images_share_a_batch():
+    scheduler, batches = recording_scheduler(max_batch_size=4, max_wait_ms=30)
+    futures = [scheduler.submit('a', size=640), scheduler.submit('b', size=320), scheduler.submit('c', size=640)]
+    assert [f.result(timeout=2) for f in futures] == ['a@640', 'b@320', 'c@640']
+    assert sorted(batches, key=lambda b: -b[1]) == [(['a', 'c'], 640), (['b'], 320)]
+
+
+def test_priority_image_goes_first():
+    scheduler, batches = recording_scheduler(max_batch_size=2, max_wait_ms=30)
+    with scheduler._cond:  # thread scheduler belum bisa mengambil antrian
+        low = [scheduler.submit(i) for i in range(2)]
+        high = scheduler.submit('kritis', priority=1)
+    assert high.result(timeout=2) == 'kritis@640'
+    assert batches[0][0] == ['kritis', 0]
+    assert [f.result(timeout=2) for f in low] == ['0@640', '1@640']
+
+
+def test_error_fails_every_future_in_batch():
+    def infer(images, size):
+        raise RuntimeError('model gagal')
+
+    scheduler = BatchScheduler(infer, max_batch_size=2, max_wait_ms=5000)
+    futures = [scheduler.submit(i) for i in range(2)]
+    for future in futures:
+        try:
+            future.result(timeout=2)
+        except RuntimeError as e:
+            assert str(e) == 'model gagal'
+        else:
+            raise AssertionError('error not propagated')
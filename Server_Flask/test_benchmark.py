@@ -0,0 +1,31 @@
+# test_benchmark.py
+from types import SimpleNamespace
+
+from benchmark import stage_summary, summarize, wait_stream_drained
+
+
+def test_summarize_percentiles():
+    assert summarize([]) is None
+    summary = summarize(list(range(1, 101)))
+    assert summary['count'] == 100
+    assert summary['mean'] == 50.5
+    assert summary['p50'] == 50.5
+    assert summary['p99'] == 99.01
+
+
+def test_stage_summary_skips_empty_stages_and_buckets():
+    snapshot = {
+        'detect': {'count': 2, 'mean': 12.34567, 'buckets': [1, 1]},
+        'encode': {'count': 0, 'mean': 0.0, 'buckets': []},
+    }
+    assert stage_summary(snapshot) == {'detect': {'count': 2, 'mean': 12.346}}
+
+
+def test_wait_stream_drained_reads_per_device_results():
+    def server(*results):
+        states = [SimpleNamespace(result=lambda r=r: r) for r in results]
+        return SimpleNamespace(devices=SimpleNamespace(devices=lambda: states))
+
+    assert wait_stream_drained(server(None, {'frame_id': 7}), 7, timeout=1)
+    assert not wait_stream_drained(server({'frame_id': 3}), 7, timeout=0.05)
+    assert not wait_stream_drained(server(None), 0, timeout=0.05)
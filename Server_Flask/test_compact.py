@@ -0,0 +1,44 @@
+# test_compact.py
+import numpy as np
+
+from compact import ALERT_NONE, COMPACT_VERSION, decode_detections, encode_detections
+
+
+def test_roundtrip_quantizes_confidence_and_boxes():
+    dets = np.array([[10.4, 20.6, 300.2, 400.9, 0.91, 6],
+                     [0, 0, 5, 5, 0.25, 9]])
+    data = encode_detections(dets, seq=42)
+    assert len(data) == 7 + 10 * 2
+    assert data[0] == COMPACT_VERSION
+
+    seq, decoded, alert = decode_detections(data)
+    assert seq == 42
+    assert alert is None
+    assert decoded[:, :4].tolist() == [[10, 21, 300, 401], [0, 0, 5, 5]]
+    assert decoded[:, 5].tolist() == [6, 9]
+    assert np.allclose(decoded[:, 4], dets[:, 4], atol=1 / 255)
+
+
+def test_alert_class_in_header():
+    data = encode_detections([], seq=1, alert_class=7)
+    assert data[6] == 7
+    assert decode_detections(data)[2] == 7
+    assert encode_detections([], seq=1)[6] == ALERT_NONE
+
+
+def test_clamps_out_of_range_values_and_wraps_seq():
+    dets = np.array([[-5, 70000, 10, 10, 1.5, 1]])
+    seq, decoded, _ = decode_detections(encode_detections(dets, seq=2 ** 32 + 3))
+    assert seq == 3
+    assert decoded[0, :4].tolist() == [0, 65535, 10, 10]
+    assert decoded[0, 4] == 1.0
+
+
+def test_rejects_other_version():
+    data = bytearray(encode_detections([], seq=1))
+    data[0] = 1
+    try:
+        decode_detections(bytes(data))
+    except ValueError:
+        return
+    raise AssertionError("version 1 payload accepted")
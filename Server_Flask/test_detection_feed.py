@@ -0,0 +1,92 @@
+# test_detection_feed.py
+import json
+import threading
+import time
+
+import numpy as np
+
+from compact import decode_detections
+from detection_feed import DetectionFeed
+
+
+def make_feed():
+    return DetectionFeed({"object": "none", "all": []})
+
+
+def test_seq_only_changes_with_key():
+    feed = make_feed()
+    assert feed.publish({"object": "po"}, key=("po",)) is True
+    assert feed.publish({"object": "po"}, key=("po",)) is False
+    assert feed.publish({"object": "st"}, key=("st",)) is True
+    assert feed.seq == 2
+    assert feed.stats()['published'] == 3
+
+
+def test_same_key_still_updates_body():
+    feed = make_feed()
+    feed.publish({"object": "po", "confidence": 0.5}, key=("po",),
+                 dets=np.array([[0, 0, 10, 10, 0.5, 6]]))
+    feed.publish({"object": "po", "confidence": 0.9}, key=("po",),
+                 dets=np.array([[5, 5, 20, 20, 0.9, 6]]))
+
+    seq, body = feed.current()
+    assert seq == 1
+    assert json.loads(body)['confidence'] == 0.9
+
+    seq, payload, alert = decode_detections(feed.current('compact')[1])
+    assert seq == 1
+    assert payload[0, :4].tolist() == [5, 5, 20, 20]
+    assert alert is None
+
+
+def test_alert_wakes_waiters_and_stays_in_body_for_ttl():
+    feed = DetectionFeed({"object": "none", "all": []}, alert_ttl_s=0.2)
+    feed.publish({"object": "ta"}, key=("ta",), dets=np.array([[0, 0, 10, 10, 0.8, 8]]))
+    alert = {'device': 'cane', 'class': 'po', 'class_id': 6, 'confidence': 0.9}
+    assert feed.publish_alert(alert) == 2
+
+    seq, body = feed.wait(since=1, timeout=0)
+    assert seq == 2
+    assert json.loads(body)['alert']['class'] == 'po'
+    assert json.loads(body)['object'] == 'ta'
+    assert decode_detections(feed.current('compact')[1])[2] == 6
+
+    # Hasil lengkap dengan class yang sama: seq tetap, alert tetap terlihat
+    feed.publish({"object": "ta"}, key=("ta",), dets=np.array([[1, 1, 11, 11, 0.8, 8]]))
+    assert json.loads(feed.current()[1])['alert']['class'] == 'po'
+
+    # Hasil lengkap yang menyusul (seq naik) tetap membawa alert selama alert_ttl_s
+    feed.publish({"object": "po"}, key=("po",))
+    body = json.loads(feed.current()[1])
+    assert body['seq'] == 3 and body['alert_seq'] == 2
+
+    time.sleep(0.25)
+    feed.publish({"object": "st"}, key=("st",))
+    assert 'alert' not in json.loads(feed.current()[1])
+    assert feed.last_alert() == alert
+
+
+def test_etag_roundtrip_and_other_epoch():
+    feed = make_feed()
+    feed.publish({"object": "po"}, key=("po",))
+    etag = feed.etag(feed.seq)
+    assert feed.parse_etag_seq(f'"{etag}"') == 1
+    assert feed.parse_etag_seq('0-1') is None
+    assert feed.since_from_etags(['bogus', etag]) == 1
+
+
+def test_wait_times_out_and_wakes_on_change():
+    feed = make_feed()
+    assert feed.wait(since=0, timeout=0.05)[0] == 0
+
+    timer = threading.Timer(0.05, feed.publish, args=({"object": "ve"},), kwargs={'key': ("ve",)})
+    timer.start()
+    seq, body = feed.wait(since=0, timeout=5)
+    timer.join()
+    assert seq == 1
+    assert json.loads(body)['object'] == 've'
+
+
+def test_wait_returns_immediately_for_seq_from_before_restart():
+    feed = make_feed()
+    assert feed.wait(since=99, timeout=5)[0] == 0
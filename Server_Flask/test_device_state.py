@@ -0,0 +1,43 @@
+# test_device_state.py
+from device_state import DeviceState, DeviceStateStore
+
+
+def test_accept_seq_drops_late_frames_and_counts_gaps():
+    state = DeviceState('cane')
+    assert state.accept_seq(1)
+    assert state.accept_seq(4)
+    assert not state.accept_seq(3)
+    assert not state.accept_seq(4)
+    assert state.accept_seq(None)
+    assert (state.frames, state.stale, state.missing, state.last_seq) == (3, 2, 2, 4)
+
+
+def test_new_boot_id_restarts_sequence():
+    state = DeviceState('cane')
+    for seq in range(50):
+        assert state.accept_seq(seq, boot_id='a')
+    # Restart sebelum 1000 frame: sequence kecil tetap diterima
+    assert state.accept_seq(0, boot_id='b')
+    assert state.accept_seq(1, boot_id='b')
+    assert not state.accept_seq(1, boot_id='b')
+    assert state.restarts == 1
+
+
+def test_reset_seq_starts_new_stream_session():
+    state = DeviceState('cane')
+    assert state.accept_seq(10)
+    state.reset_seq()
+    assert state.accept_seq(0)
+    assert state.stale == 0
+
+
+def test_store_sweeps_idle_devices_but_not_held_ones():
+    evicted = []
+    store = DeviceStateStore(shards=4, idle_timeout_s=10, on_evict=evicted.append)
+    store.get('a')
+    held = store.hold('b')
+    assert sorted(store.sweep(now=held.last_seen + 60)) == ['a']
+    assert evicted == ['a']
+    assert store.peek('a') is None
+    store.release(held)
+    assert store.sweep(now=held.last_seen + 60) == ['b']
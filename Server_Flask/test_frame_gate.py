@@ -0,0 +1,47 @@
+# test_frame_gate.py
+import time
+
+import numpy as np
+
+from frame_gate import SimilarityGate, frame_difference, frame_signature
+
+
+def gray(value, shape=(240, 320, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_signature_ignores_channel_order():
+    image = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    assert frame_signature(image).shape == (24, 32)
+    assert frame_difference(frame_signature(image), frame_signature(image[..., ::-1])) < 1e-3
+
+
+def test_hit_below_threshold_miss_at_threshold():
+    gate = SimilarityGate(threshold=4.0, max_reuse_frames=None, max_age_ms=None)
+    signature, result = gate.check('a', gray(100))
+    assert result is None
+    gate.store('a', signature, 'dets')
+    assert gate.check('a', gray(103))[1] == 'dets'  # selisih 3 < 4
+    assert gate.check('a', gray(104))[1] is None  # selisih 4 = threshold: inference
+    assert gate.check('b', gray(100))[1] is None  # device lain tidak berbagi hasil
+    assert gate.stats()['reused'] == 1
+
+
+def test_reuse_limit_and_max_age_force_inference():
+    gate = SimilarityGate(threshold=4.0, max_reuse_frames=2, max_age_ms=None)
+    gate.store('a', gate.check('a', gray(100))[0], 'dets')
+    assert [gate.check('a', gray(100))[1] for _ in range(3)] == ['dets', 'dets', None]
+
+    gate = SimilarityGate(threshold=4.0, max_reuse_frames=None, max_age_ms=20)
+    gate.store('a', gate.check('a', gray(100))[0], 'dets')
+    time.sleep(0.03)
+    assert gate.check('a', gray(100))[1] is None
+    assert gate.stats()['forced'] == 1
+
+
+def test_disabled_gate_and_forget():
+    assert SimilarityGate(threshold=None).check('a', gray(100)) == (None, None)
+    gate = SimilarityGate()
+    gate.store('a', gate.check('a', gray(100))[0], 'dets')
+    gate.forget('a')
+    assert gate.check('a', gray(100))[1] is None
@@ -0,0 +1,62 @@
+# test_image_catalog.py
+import os
+from datetime import datetime
+
+from image_catalog import ImageCatalog, timestamp_from_name
+
+
+def make_catalog(tmp_path, names=()):
+    folder = tmp_path / 'classified'
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_bytes(b'jpeg')
+    return ImageCatalog(folder, tmp_path / 'index.jsonl'), folder
+
+
+def test_timestamp_from_name():
+    ts = timestamp_from_name('classified_20240501_083000_000007.jpg')
+    assert ts == datetime(2024, 5, 1, 8, 30).timestamp()
+    assert timestamp_from_name('original_20240501_083000.jpg') is None
+
+
+def test_startup_scan_uses_file_names(tmp_path):
+    catalog, _ = make_catalog(tmp_path, ['classified_20240501_083000.jpg', 'classified_20240501_090000.jpg',
+                                         'notes.txt'])
+    assert len(catalog) == 2
+    assert catalog.latest(1) == ['classified_20240501_090000.jpg']
+
+
+def test_query_pages_newest_first_with_time_and_class_filters(tmp_path):
+    catalog, _ = make_catalog(tmp_path)
+    for i, classes in enumerate([['po'], ['st'], ['po', 'st'], [], ['ve']]):
+        catalog.add(f'img_{i}.jpg', [{'class': c} for c in classes], ts=100 + i)
+
+    entries, total = catalog.query(limit=2)
+    assert [e['filename'] for e in entries] == ['img_4.jpg', 'img_3.jpg'] and total == 5
+    entries, _ = catalog.query(limit=2, offset=2)
+    assert [e['filename'] for e in entries] == ['img_2.jpg', 'img_1.jpg']
+
+    entries, total = catalog.query(start=101, end=103)
+    assert [e['filename'] for e in entries] == ['img_3.jpg', 'img_2.jpg', 'img_1.jpg'] and total == 3
+
+    entries, total = catalog.query(classes=['po'])
+    assert [e['filename'] for e in entries] == ['img_2.jpg', 'img_0.jpg'] and total == 2
+    # Beberapa class: gambar dengan 2 class cocok muncul sekali
+    entries, total = catalog.query(classes=['po', 'st'])
+    assert [e['filename'] for e in entries] == ['img_2.jpg', 'img_1.jpg', 'img_0.jpg'] and total is None
+    assert catalog.class_counts() == {'po': 2, 'st': 2, 've': 1}
+
+
+def test_metadata_survives_restart_and_remove(tmp_path):
+    catalog, folder = make_catalog(tmp_path, ['classified_20240501_083000.jpg'])
+    (folder / 'classified_20240501_083001.jpg').write_bytes(b'jpeg')
+    catalog.add('classified_20240501_083001.jpg', [{'class': 'po'}, {'class': 'po'}], ts=5)
+    catalog.remove('classified_20240501_083000.jpg')
+    assert len(catalog) == 1
+
+    reloaded = ImageCatalog(folder, tmp_path / 'index.jsonl')
+    entry = reloaded.query(classes=['po'])[0][0]
+    assert entry['counts'] == {'po': 2} and entry['ts'] == 5
+    # File yang dihapus dari disk tidak ikut dimuat lagi
+    os.remove(folder / 'classified_20240501_083001.jpg')
+    assert len(ImageCatalog(folder, tmp_path / 'index.jsonl')) == 1
@@ -0,0 +1,76 @@
+# test_inference_worker.py
+import threading
+
+from inference_worker import LatestFrameQueue, PriorityFrameQueue, start_workers
+
+
+def frame(device, n):
+    return {'device': device, 'n': n}
+
+
+def test_latest_frame_queue_returns_newest():
+    queue = LatestFrameQueue(maxsize=2)
+    for n in range(3):
+        queue.put(n)
+    assert queue.get(timeout=0) == 2
+    assert queue.dropped == 2
+    assert queue.get(timeout=0) is None
+
+
+def test_latest_wins_per_device_oldest_device_first():
+    queue = PriorityFrameQueue(maxsize=2)
+    queue.put(frame('a', 1))
+    queue.put(frame('b', 1))
+    queue.put(frame('a', 2))
+    queue.put(frame('a', 3))  # frame a1 dibuang (maxsize)
+    assert queue.qsize() == 3
+    # b1 menunggu lebih lama dari a2 (frame tertua a yang tersisa)
+    assert queue.get(timeout=0) == frame('b', 1)
+    assert queue.get(timeout=0) == frame('a', 3)
+    assert queue.dropped == 2
+
+
+def test_priority_device_goes_first():
+    queue = PriorityFrameQueue(priority_fn=lambda device: 1 if device == 'b' else 0)
+    queue.put(frame('a', 1))
+    queue.put(frame('b', 1))
+    assert queue.get(timeout=0)['device'] == 'b'
+    assert queue.prioritized == 1
+
+
+def test_busy_device_skipped_until_task_done():
+    queue = PriorityFrameQueue()
+    queue.put(frame('a', 1))
+    first = queue.get(timeout=0)
+    queue.put(frame('a', 2))
+    queue.put(frame('b', 1))
+    assert queue.get(timeout=0) == frame('b', 1)
+    assert queue.get(timeout=0) is None  # a masih diproses
+    queue.task_done(first)
+    assert queue.get(timeout=0) == frame('a', 2)
+
+
+def test_workers_never_process_one_device_concurrently():
+    queue = PriorityFrameQueue(maxsize=100)
+    active, overlaps, handled = set(), [], []
+    lock = threading.Lock()
+
+    def handler(item):
+        with lock:
+            if item['device'] in active:
+                overlaps.append(item)
+            active.add(item['device'])
+        threading.Event().wait(0.005)
+        with lock:
+            active.discard(item['device'])
+            handled.append(item)
+
+    workers = start_workers(queue, handler, count=4)
+    for n in range(20):
+        queue.put(frame('a' if n % 2 else 'b', n))
+        threading.Event().wait(0.002)
+    while queue.qsize() or len(active):
+        threading.Event().wait(0.01)
+    for worker in workers:
+        worker.stop()
+    assert overlaps == [] and handled
@@ -0,0 +1,52 @@
+# test_resolution_controller.py
+from resolution_controller import ResolutionController
+
+
+def controller(**kwargs):
+    args = dict(sizes=(640, 512, 416, 320), budget_ms=150, window=3, min_interval_s=0, up_margin=0.8)
+    args.update(kwargs)
+    return ResolutionController(**args)
+
+
+def feed(ctrl, latency_ms, frames=3):
+    for _ in range(frames):
+        size = ctrl.observe(latency_ms)
+    return size
+
+
+def test_steps_down_when_p90_over_budget():
+    ctrl = controller()
+    assert feed(ctrl, 200, frames=2) == 640  # jendela belum penuh
+    assert feed(ctrl, 200, frames=1) == 512
+    assert feed(ctrl, 200) == 416
+    assert feed(ctrl, 200) == 320
+    assert feed(ctrl, 200) == 320  # ukuran terkecil
+    assert [h['reason'] for h in ctrl.history] == ['latency'] * 3
+
+
+def test_steps_up_only_with_headroom():
+    ctrl = controller()
+    feed(ctrl, 200)
+    assert ctrl.size == 512
+    # 110 ms di 512 ~ 172 ms di 640: di atas 0.8 * budget, tetap 512
+    assert feed(ctrl, 110) == 512
+    # 70 ms di 512 ~ 109 ms di 640: naik lagi
+    assert feed(ctrl, 70) == 640
+    assert ctrl.history[-1]['reason'] == 'headroom'
+
+
+def test_queue_depth_steps_down_and_blocks_step_up():
+    depth = [5]
+    ctrl = controller(queue_limit=4, queue_depth_fn=lambda: depth[0])
+    assert feed(ctrl, 10) == 512
+    assert ctrl.history[-1]['reason'] == 'queue'
+    depth[0] = 2
+    assert feed(ctrl, 10) == 512  # antrian belum kosong: tidak naik
+    depth[0] = 0
+    assert feed(ctrl, 10) == 640
+
+
+def test_min_interval_and_disabled_budget():
+    ctrl = controller(min_interval_s=60)
+    assert feed(ctrl, 500, frames=10) == 640
+    assert controller(budget_ms=None).observe(10_000) == 640
@@ -0,0 +1,65 @@
+# test_tracker.py
+import numpy as np
+
+from tracker import DeviceTrackers, Tracker, greedy_match, iou_matrix
+
+
+def det(x, y, conf=0.9, class_id=3, size=40):
+    return [x, y, x + size, y + size, conf, class_id]
+
+
+def test_iou_and_greedy_match():
+    a = np.array([[0, 0, 10, 10], [100, 100, 110, 110]], dtype=float)
+    b = np.array([[100, 100, 110, 110], [5, 0, 15, 10]], dtype=float)
+    iou = iou_matrix(a, b)
+    assert iou[1, 0] == 1.0 and round(iou[0, 1], 3) == 0.333
+    assert greedy_match(iou, 0.3) == [(1, 0), (0, 1)]
+    assert greedy_match(iou, 0.5) == [(1, 0)]
+
+
+def test_first_detection_is_returned_before_confirmation():
+    tracker = Tracker(min_hits=2)
+    out, new_ids = tracker.update([det(10, 10)])
+    # Deteksi mentah langsung keluar, tapi belum dianggap hazard baru
+    assert out[:, :6].tolist() == [det(10, 10)]
+    assert new_ids == []
+    # Frame prediksi tetap menampilkan track yang terlihat di deteksi terakhir
+    assert tracker.predict()[:, 6].tolist() == out[:, 6].tolist()
+
+
+def test_track_id_persists_and_confirms_once():
+    tracker = Tracker(min_hits=2)
+    first, _ = tracker.update([det(10, 10)])
+    tracker.predict()
+    second, new_ids = tracker.update([det(14, 12, conf=0.8)])
+    track_id = int(first[0, 6])
+    assert second[:, 6].tolist() == [track_id] and new_ids == [track_id]
+    assert second[0, 4] == 0.8
+    _, new_ids = tracker.update([det(16, 14)])
+    assert new_ids == []
+
+
+def test_other_class_or_far_box_starts_new_track():
+    tracker = Tracker()
+    first, _ = tracker.update([det(10, 10)])
+    out, _ = tracker.update([det(10, 10, class_id=5), det(300, 300)])
+    assert len(set(out[:, 6].tolist()) | set(first[:, 6].tolist())) == 3
+
+
+def test_lost_track_expires_after_max_age():
+    tracker = Tracker(max_age=2)
+    tracker.update([det(10, 10)])
+    tracker.update([])
+    assert len(tracker.predict()) == 0
+    tracker.predict()
+    tracker.predict()
+    assert tracker.tracks == []
+
+
+def test_device_trackers_detect_interval():
+    trackers = DeviceTrackers(detect_interval=3)
+    assert [trackers.should_detect('a') for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert trackers.should_detect('b')
+    trackers.update('a', [det(10, 10)])
+    assert len(trackers.predict('a')) == 1
+    assert trackers.stats()['model_skip_ratio'] == 0.5
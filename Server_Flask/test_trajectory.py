@@ -0,0 +1,77 @@
+# test_trajectory.py
+import threading
+
+import numpy as np
+
+from trajectory import CoalescedEmitter, Trajectory, douglas_peucker, split_segments
+
+
+def fixes(timestamps, lat=-6.2, lon=106.8):
+    return [[ts, lat, lon] for ts in timestamps]
+
+
+def test_extend_sorts_and_drops_old_or_duplicate_fixes():
+    track = Trajectory(10)
+    assert track.extend(fixes([3, 1, 2, 2])) == 3
+    assert track.extend(fixes([2, 3])) == 0  # batch dikirim ulang
+    assert track.extend(fixes([4])) == 1
+    assert track.points()[:, 0].tolist() == [1, 2, 3, 4]
+    assert (track.received, track.rejected) == (7, 3)
+
+
+def test_ring_buffer_keeps_latest_fixes_in_order():
+    track = Trajectory(5)
+    track.extend(fixes(range(8)))
+    track.extend(fixes([8, 9, 10]))
+    assert len(track) == 5
+    assert track.points()[:, 0].tolist() == [6, 7, 8, 9, 10]
+    assert track.last()[0] == 10
+
+
+def test_points_time_range_is_inclusive():
+    track = Trajectory(10)
+    track.extend(fixes(range(10)))
+    assert track.points(start=3, end=5)[:, 0].tolist() == [3, 4, 5]
+    assert len(track.points(start=20)) == 0
+    assert Trajectory(4).last() is None
+
+
+def test_split_segments_at_gaps():
+    points = np.array(fixes([0, 1, 2, 100, 101, 300]))
+    segments = split_segments(points, max_gap_s=60)
+    assert [s[:, 0].tolist() for s in segments] == [[0, 1, 2], [100, 101], [300]]
+    assert split_segments(points[:0], 60) == []
+
+
+def test_douglas_peucker_keeps_corners_and_drops_straight_points():
+    # Garis lurus ke timur ~11 m per titik, lalu belok ke utara
+    east = [[i, 0.0, i * 1e-4] for i in range(10)]
+    north = [[10 + i, (i + 1) * 1e-4, 9e-4] for i in range(10)]
+    points = np.array(east + north)
+    simplified = douglas_peucker(points, epsilon_m=1.0)
+    assert simplified[:, 0].tolist() == [0, 9, 19]
+    assert len(douglas_peucker(points, 0)) == len(points)
+
+
+def test_douglas_peucker_keeps_points_beyond_epsilon():
+    points = np.array([[0, 0.0, 0.0], [1, 1e-4, 5e-5], [2, 0.0, 1e-4]])  # titik tengah ~11 m ke utara
+    assert len(douglas_peucker(points, epsilon_m=5.0)) == 3
+    assert len(douglas_peucker(points, epsilon_m=20.0)) == 2
+
+
+def test_coalesced_emitter_merges_updates_per_key():
+    emitted = []
+    done = threading.Event()
+
+    def emit(payload):
+        emitted.append(payload)
+        if len(emitted) == 2:
+            done.set()
+
+    emitter = CoalescedEmitter(emit, interval=0.1)
+    emitter.push('a', {'lat': 1}, points=2)
+    emitter.push('a', {'lat': 2}, points=3)
+    emitter.push('b', {'lat': 9})
+    assert done.wait(5)
+    assert sorted(emitted, key=lambda p: p['lat']) == [{'lat': 2, 'points': 5}, {'lat': 9, 'points': 1}]
+    assert emitter.stats()['pushed'] == 3
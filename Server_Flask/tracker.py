@@ -0,0 +1,221 @@
+# tracker.py
+# Multi-object tracker ringan (SORT: Kalman kecepatan konstan + asosiasi IoU) per device.
+# Detector cukup dijalankan setiap N frame; di antaranya posisi box diprediksi tracker.
+import threading
+
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """
+    IoU semua pasangan box a (N, 4) x b (M, 4), format x1, y1, x2, y2
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(iou, threshold):
+    """
+    Pasangkan (baris, kolom) dari IoU tertinggi; cukup untuk jumlah objek per frame yang kecil
+    """
+    matches = []
+    if iou.size == 0:
+        return matches
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(-iou, axis=None):
+        row, col = divmod(int(flat), iou.shape[1])
+        if iou[row, col] < threshold:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((row, col))
+    return matches
+
+
+# Kalman kecepatan konstan, state [cx, cy, w, h, vx, vy, vw, vh], ukuran [cx, cy, w, h] (1 langkah = 1 frame)
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001, 0.0001])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+
+class Track:
+    __slots__ = ('track_id', 'class_id', 'confidence', 'x', 'P', 'hits', 'time_since_update', 'confirmed')
+
+    def __init__(self, track_id, det):
+        x1, y1, x2, y2 = det[:4]
+        self.track_id = track_id
+        self.class_id = int(det[5])
+        self.confidence = float(det[4])
+        self.x = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0, 0, 0, 0], dtype=np.float64)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0, 1000.0])
+        self.hits = 1
+        self.time_since_update = 0
+        self.confirmed = False
+
+    def predict(self):
+        if self.x[2] + self.x[6] <= 0 or self.x[3] + self.x[7] <= 0:
+            self.x[6:] = 0  # box tidak boleh mengecil sampai lebar/tinggi negatif
+        self.x = _F @ self.x
+        self.P = _F @ self.P @ _F.T + _Q
+        self.time_since_update += 1
+
+    def update(self, det):
+        x1, y1, x2, y2 = det[:4]
+        z = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        S = _H @ self.P @ _H.T + _R
+        K = self.P @ _H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - _H @ self.x)
+        self.P = (np.eye(8) - K @ _H) @ self.P
+        self.confidence = float(det[4])
+        self.hits += 1
+        self.time_since_update = 0
+
+    def box(self):
+        cx, cy, w, h = self.x[:4]
+        return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+
+class Tracker:
+    """
+    Tracker 1 device. Output selalu berisi semua deteksi terakhir (tidak menunggu
+    konfirmasi); konfirmasi (min_hits deteksi yang cocok) hanya menandai hazard
+    baru. Track dihapus jika tidak cocok dengan deteksi selama lebih dari max_age frame.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=6, min_hits=2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self._visible = []  # track dari deteksi terakhir, urut sesuai deteksi
+        self._next_id = 1
+
+    def _predict(self):
+        for track in self.tracks:
+            track.predict()
+        self.tracks = [t for t in self.tracks if t.time_since_update <= self.max_age]
+
+    def predict(self):
+        """
+        Frame tanpa deteksi: maju 1 langkah. Return array (M, 7) posisi prediksi
+        track yang terlihat pada deteksi terakhir
+        """
+        self._predict()
+        return self.output()
+
+    def update(self, dets):
+        """
+        Frame dengan deteksi (N, 6) x1, y1, x2, y2, confidence, class_id.
+        Return (array (N, 7) deteksi mentah + track_id, list track_id yang baru terkonfirmasi)
+        """
+        self._predict()
+        dets = np.asarray(dets, dtype=np.float64).reshape(-1, 6)
+        boxes = np.array([t.box() for t in self.tracks]).reshape(-1, 4)
+        iou = iou_matrix(boxes, dets[:, :4])
+        # Box hanya dipasangkan dengan track class yang sama
+        if iou.size:
+            same_class = np.array([t.class_id for t in self.tracks])[:, None] == dets[None, :, 5].astype(int)
+            iou = np.where(same_class, iou, 0.0)
+
+        visible = [None] * len(dets)
+        for row, col in greedy_match(iou, self.iou_threshold):
+            self.tracks[row].update(dets[col])
+            visible[col] = self.tracks[row]
+        for col in range(len(dets)):
+            if visible[col] is None:
+                visible[col] = Track(self._next_id, dets[col])
+                self.tracks.append(visible[col])
+                self._next_id += 1
+        self._visible = visible
+
+        new_ids = []
+        for track in self.tracks:
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                new_ids.append(track.track_id)
+        # Box deteksi apa adanya (bukan hasil filter Kalman), track_id dari track pasangannya
+        rows = [list(det[:6]) + [track.track_id] for det, track in zip(dets, visible)]
+        return np.array(rows, dtype=np.float64).reshape(-1, 7), new_ids
+
+    def output(self):
+        rows = [t.box() + [t.confidence, t.class_id, t.track_id] for t in self._visible
+                if t.time_since_update <= self.max_age]
+        return np.array(rows, dtype=np.float64).reshape(-1, 7)
+
+
+class DeviceTrackers:
+    """
+    Tracker per device + jadwal detect: model dijalankan setiap detect_interval
+    frame, frame di antaranya memakai posisi prediksi (detect_interval=1 = tiap frame)
+    """
+
+    def __init__(self, detect_interval=3, iou_threshold=0.3, max_age=6, min_hits=2):
+        self.detect_interval = max(1, detect_interval)
+        self.tracker_args = {'iou_threshold': iou_threshold, 'max_age': max_age, 'min_hits': min_hits}
+        self._trackers = {}  # device -> [Tracker, frame sejak detect terakhir, lock]
+        self._lock = threading.Lock()
+        self.detected_frames = 0
+        self.tracked_frames = 0
+        self.new_tracks = 0
+
+    def _get(self, device):
+        with self._lock:
+            state = self._trackers.get(device)
+            if state is None:
+                state = self._trackers[device] = [Tracker(**self.tracker_args), None, threading.Lock()]
+            return state
+
+    def should_detect(self, device):
+        """
+        True jika frame ini perlu inference (frame pertama atau sudah detect_interval frame)
+        """
+        state = self._get(device)
+        with state[2]:
+            due = state[1] is None or state[1] + 1 >= self.detect_interval
+            state[1] = 0 if due else state[1] + 1
+            return due
+
+    def update(self, device, dets):
+        state = self._get(device)
+        with state[2]:
+            tracks, new_ids = state[0].update(dets)
+        with self._lock:
+            self.detected_frames += 1
+            self.new_tracks += len(new_ids)
+        return tracks, new_ids
+
+    def predict(self, device):
+        state = self._get(device)
+        with state[2]:
+            tracks = state[0].predict()
+        with self._lock:
+            self.tracked_frames += 1
+        return tracks
+
+    def forget(self, device):
+        with self._lock:
+            self._trackers.pop(device, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.detected_frames + self.tracked_frames
+            return {
+                'devices': len(self._trackers),
+                'active_tracks': sum(len(s[0].tracks) for s in self._trackers.values()),
+                'detected_frames': self.detected_frames,
+                'tracked_frames': self.tracked_frames,
+                'new_tracks': self.new_tracks,
+                'model_skip_ratio': round(self.tracked_frames / total, 3) if total else None
+            }
@@ -0,0 +1,182 @@
+# trajectory.py
+# Jejak GPS per cane: ring buffer array (memori tetap), potong per segmen, downsampling Douglas-Peucker
+import math
+import threading
+import time
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+class Trajectory:
+    """
+    Ring buffer (capacity, 3) float64: ts (epoch), latitude, longitude.
+    Fix baru menimpa fix paling lama saat penuh; fix yang tidak lebih baru dari
+    fix terakhir dibuang (batch yang dikirim ulang / urutan tertukar).
+    """
+
+    def __init__(self, capacity=3600):
+        self.capacity = max(2, capacity)
+        self._data = np.zeros((self.capacity, 3), dtype=np.float64)
+        self._head = 0   # index tulis berikutnya
+        self._count = 0
+        self._lock = threading.Lock()
+        self.received = 0
+        self.rejected = 0
+
+    def extend(self, fixes):
+        """
+        fixes: array (N, 3) ts, lat, lon (boleh tidak urut). Return jumlah fix yang disimpan.
+        """
+        fixes = np.asarray(fixes, dtype=np.float64).reshape(-1, 3)
+        fixes = fixes[np.argsort(fixes[:, 0], kind='stable')]
+        offered = len(fixes)
+        with self._lock:
+            if self._count:
+                fixes = fixes[fixes[:, 0] > self._data[(self._head - 1) % self.capacity, 0]]
+            if len(fixes):
+                # Buang duplikat timestamp dalam batch yang sama
+                fixes = fixes[np.concatenate(([True], np.diff(fixes[:, 0]) > 0))]
+            self.received += offered
+            self.rejected += offered - len(fixes)
+            fixes = fixes[-self.capacity:]  # batch lebih besar dari buffer: hanya yang terbaru
+            n = len(fixes)
+            if n:
+                end = self._head + n
+                if end <= self.capacity:
+                    self._data[self._head:end] = fixes
+                else:
+                    split = self.capacity - self._head
+                    self._data[self._head:] = fixes[:split]
+                    self._data[:n - split] = fixes[split:]
+                self._head = end % self.capacity
+                self._count = min(self.capacity, self._count + n)
+            return n
+
+    def points(self, start=None, end=None):
+        """
+        Fix urut waktu (copy), opsional dibatasi start/end (epoch, inklusif)
+        """
+        with self._lock:
+            if self._count < self.capacity:
+                data = self._data[:self._count].copy()
+            else:
+                data = np.concatenate((self._data[self._head:], self._data[:self._head]))
+        if start is not None:
+            data = data[np.searchsorted(data[:, 0], start, side='left'):]
+        if end is not None:
+            data = data[:np.searchsorted(data[:, 0], end, side='right')]
+        return data
+
+    def last(self):
+        with self._lock:
+            if not self._count:
+                return None
+            return self._data[(self._head - 1) % self.capacity].copy()
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+
+def split_segments(points, max_gap_s=60):
+    """
+    Potong jejak di celah waktu > max_gap_s (GPS hilang / cane mati): list array (M, 3)
+    """
+    if len(points) == 0:
+        return []
+    if max_gap_s is None:
+        return [points]
+    cuts = np.flatnonzero(np.diff(points[:, 0]) > max_gap_s) + 1
+    return np.split(points, cuts)
+
+
+def _to_meters(points):
+    # Proyeksi equirectangular lokal: cukup akurat untuk jarak beberapa km
+    lat0 = math.radians(float(points[:, 1].mean()))
+    x = np.radians(points[:, 2]) * math.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(points[:, 1]) * EARTH_RADIUS_M
+    return np.column_stack((x, y))
+
+
+def douglas_peucker(points, epsilon_m):
+    """
+    Sederhanakan 1 segmen (M, 3): titik dibuang jika jaraknya ke garis penyederhanaan
+    <= epsilon_m meter. Iteratif (tanpa rekursi), jarak dihitung vektor per sub-segmen.
+    """
+    n = len(points)
+    if n < 3 or not epsilon_m or epsilon_m <= 0:
+        return points
+    xy = _to_meters(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        inner = xy[first + 1:last]
+        ab = b - a
+        length = math.hypot(ab[0], ab[1])
+        if length == 0:
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            # Jarak ke segmen (bukan garis tak hingga): titik di luar ujung diukur ke ujungnya
+            t = np.clip(((inner - a) @ ab) / (length * length), 0.0, 1.0)
+            proj = a + t[:, None] * ab
+            dist = np.hypot(inner[:, 0] - proj[:, 0], inner[:, 1] - proj[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > epsilon_m:
+            index = first + 1 + i
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return points[keep]
+
+
+class CoalescedEmitter:
+    """
+    Kumpulkan update per key (mis. device) dan kirim maksimal 1 per key setiap
+    interval detik lewat emit_fn(payload); update di antaranya digabung (yang terbaru
+    dipakai, jumlah fix dijumlahkan).
+    """
+
+    def __init__(self, emit_fn, interval=1.0):
+        self.emit_fn = emit_fn
+        self.interval = interval
+        self._pending = {}
+        self._cond = threading.Condition()
+        self.pushed = 0
+        self.emitted = 0
+        self._thread = threading.Thread(target=self._run, name='location-emitter', daemon=True)
+        self._thread.start()
+
+    def push(self, key, payload, points=1):
+        with self._cond:
+            previous = self._pending.get(key)
+            payload = dict(payload, points=points + (previous['points'] if previous else 0))
+            self._pending[key] = payload
+            self.pushed += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+            # Tunggu interval supaya update yang datang berdekatan digabung
+            time.sleep(self.interval)
+            with self._cond:
+                batch = list(self._pending.values())
+                self._pending.clear()
+            for payload in batch:
+                try:
+                    self.emit_fn(payload)
+                    self.emitted += 1
+                except Exception as e:
+                    print(f"Location emit error: {e}")
+
+    def stats(self):
+        with self._cond:
+            return {'pushed': self.pushed, 'emitted': self.emitted, 'pending': len(self._pending)}
@@ -13,6 +13,8 @@ const char* password = "YOUR_WIFI_PASSWORD"; // Ganti dengan password WiFi Anda
 // Konfigurasi Server
 // ===========================
 const char* serverName = "http://10.12.248.254:5050/stream"; // Ganti dengan IP server Flask Anda
+const char* serverHost = "10.12.248.254";                     // Host/port yang sama, untuk koneksi stream persisten
+const uint16_t serverPort = 5050;
 
 // ===========================
 // Konfigurasi Kamera
@@ -39,6 +41,25 @@ const char* serverName = "http://10.12.248.254:5050/stream"; // Ganti dengan IP
 unsigned long lastCaptureTime = 0;
 const int captureInterval = 100; // 100ms = 10 FPS
 
+// Default: 1 POST chunked ke /stream untuk seluruh sesi, setiap frame = [seq][len][jpeg] (big-endian).
+// Server membalas di koneksi yang sama: 1 baris JSON per frame (ack + hasil terakhir + alert).
+// Maksimal STREAM_MAX_PENDING frame belum di-ack (backpressure); jika ack tidak datang,
+// koneksi ditutup dan frame dikirim sebagai POST image/jpeg biasa.
+// USE_PERSISTENT_STREAM 0: selalu 1 POST image/jpeg per frame (keep-alive).
+#define USE_PERSISTENT_STREAM 1
+#define STREAM_MAX_PENDING 2        // gunicorn baru membalas frame N saat frame N+1 mulai dikirim
+#define STREAM_ACK_TIMEOUT_MS 3000
+WiFiClient streamClient;
+HTTPClient postClient;
+bool streamOpen = false;
+uint32_t streamPending = 0;  // frame terkirim yang belum di-ack
+String ackLine;
+uint32_t frameSeq = 0;
+// ID cane di server: samakan dengan CANE_ID di firmware tongkat (Kode_Arduino_Ide/esp32.ino)
+#define CANE_ID "cane-01"
+String deviceId = CANE_ID;  // kosong = MAC ESP32-CAM ini
+String bootId;  // acak per boot: server tahu frameSeq mulai lagi dari 0 setelah restart
+
 void setup() {
   Serial.begin(115200);
   Serial.setDebugOutput(true);
@@ -145,14 +166,123 @@ void loop() {
   esp_camera_fb_return(fb);
 }
 
+bool openStream() {
+  if (!streamClient.connect(serverHost, serverPort)) {
+    return false;
+  }
+  streamClient.setNoDelay(true);
+  streamPending = 0;
+  ackLine = "";
+  streamClient.printf("POST /stream HTTP/1.1\r\n"
+                      "Host: %s:%u\r\n"
+                      "Content-Type: application/x-jpeg-stream\r\n"
+                      "X-Device-ID: %s\r\n"
+                      "X-Boot-ID: %s\r\n"
+                      "Transfer-Encoding: chunked\r\n\r\n",
+                      serverHost, serverPort, deviceId.c_str(), bootId.c_str());
+  Serial.println("Stream connection opened");
+  return true;
+}
+
+// Baca ack yang sudah datang (header HTTP dan ukuran chunk dilewati, hanya baris JSON).
+// false jika stream ditolak, ditutup server, atau koneksi putus.
+bool readStreamAcks() {
+  while (streamClient.available()) {
+    char c = streamClient.read();
+    if (c != '\n') {
+      if (ackLine.length() < 1024) {
+        ackLine += c;
+      }
+      continue;
+    }
+    ackLine.trim();
+    bool ok = true;
+    if (ackLine.startsWith("HTTP/") && ackLine.indexOf(" 200") < 0) {
+      Serial.printf("Stream rejected: %s\n", ackLine.c_str());
+      ok = false;
+    } else if (ackLine.startsWith("{")) {
+      if (streamPending > 0) {
+        streamPending--;
+      }
+      if (ackLine.indexOf("\"success\": false") >= 0 || ackLine.indexOf("\"done\"") >= 0) {
+        Serial.printf("Stream closed by server: %s\n", ackLine.c_str());
+        ok = false;
+      } else if (ackLine.indexOf("\"alert\"") >= 0) {
+        Serial.printf("Server ack: %s\n", ackLine.c_str());
+      }
+    }
+    ackLine = "";
+    if (!ok) {
+      return false;
+    }
+  }
+  return streamClient.connected();
+}
+
+bool writeStreamFrame(camera_fb_t *fb, uint32_t seq) {
+  // Tunggu ack jika sudah STREAM_MAX_PENDING frame di jalan (server lambat = kamera ikut menunggu)
+  unsigned long waitStart = millis();
+  while (true) {
+    if (!readStreamAcks()) {
+      return false;
+    }
+    if (streamPending < STREAM_MAX_PENDING) {
+      break;
+    }
+    if (millis() - waitStart > STREAM_ACK_TIMEOUT_MS) {
+      Serial.println("Stream ack timeout");
+      return false;
+    }
+    delay(1);
+  }
+  uint8_t header[8] = {
+    (uint8_t)(seq >> 24), (uint8_t)(seq >> 16), (uint8_t)(seq >> 8), (uint8_t)seq,
+    (uint8_t)(fb->len >> 24), (uint8_t)(fb->len >> 16), (uint8_t)(fb->len >> 8), (uint8_t)fb->len
+  };
+  streamClient.printf("%X\r\n", (unsigned int)(sizeof(header) + fb->len));
+  bool ok = streamClient.write(header, sizeof(header)) == sizeof(header);
+  ok = ok && streamClient.write(fb->buf, fb->len) == fb->len;
+  ok = ok && streamClient.print("\r\n") == 2;
+  if (ok) {
+    streamPending++;
+  }
+  return ok;
+}
+
 bool sendFrameToServer(camera_fb_t *fb) {
   if (WiFi.status() != WL_CONNECTED) {
     return false;
   }
+  if (deviceId.length() == 0) {
+    deviceId = WiFi.macAddress();
+  }
+  if (bootId.length() == 0) {
+    bootId = String(esp_random(), HEX);
+  }
+  uint32_t seq = frameSeq++;
 
-  HTTPClient http;
+#if USE_PERSISTENT_STREAM
+  if (!streamOpen) {
+    streamOpen = openStream();
+  }
+  if (streamOpen) {
+    if (writeStreamFrame(fb, seq)) {
+      return true;
+    }
+    Serial.println("Stream connection lost - fallback to single POST");
+    streamClient.stop();
+    streamOpen = false;
+  }
+#endif
+
+  // Koneksi dipakai ulang antar frame (keep-alive) jika server mendukung
+  HTTPClient &http = postClient;
+  http.setReuse(true);
   http.begin(serverName);
   http.addHeader("Content-Type", "image/jpeg");
+  http.addHeader("X-Device-ID", deviceId);
+  http.addHeader("X-Frame-Seq", String(seq));
+  http.addHeader("X-Boot-ID", bootId);
   
   int httpResponseCode = http.POST(fb->buf, fb->len);
   